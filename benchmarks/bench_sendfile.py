@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Compare server CPU time per GB downloaded with and without os.sendfile
+"""
+import argparse
+import base64
+import http.client
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'file_server.py')
+PASSWORD = 'bench'
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"server did not start on port {port}")
+
+
+def download(port, name, repeat):
+    """Download a file repeat times, discarding the body; return bytes read"""
+    auth = base64.b64encode(f"admin:{PASSWORD}".encode()).decode()
+    total = 0
+    for _ in range(repeat):
+        conn = http.client.HTTPConnection('127.0.0.1', port)
+        conn.request('GET', '/' + name, headers={'Authorization': f'Basic {auth}'})
+        resp = conn.getresponse()
+        while True:
+            chunk = resp.read(1024 * 1024)
+            if not chunk:
+                break
+            total += len(chunk)
+        conn.close()
+    return total
+
+
+def run(directory, name, mode, sendfile, repeat):
+    """Start a server, download, stop it and return its CPU usage"""
+    port = free_port()
+    cmd = [sys.executable, SERVER, '-p', str(port), '-d', directory,
+           '--password', PASSWORD, '--mode', mode, '--no-warm-up']
+    if not sendfile:
+        cmd.append('--no-sendfile')
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_port(port)
+        start = time.time()
+        total = download(port, name, repeat)
+        elapsed = time.time() - start
+    finally:
+        proc.send_signal(signal.SIGTERM)
+    _, _, usage = os.wait4(proc.pid, 0)
+    proc.returncode = 0
+    gb = total / 1e9
+    cpu = usage.ru_utime + usage.ru_stime
+    return {
+        'mode': mode,
+        'sendfile': sendfile,
+        'bytes': total,
+        'seconds': round(elapsed, 3),
+        'throughput_mb_s': round(total / 1e6 / elapsed, 1),
+        'server_cpu_s': round(cpu, 3),
+        'server_cpu_s_per_gb': round(cpu / gb, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark sendfile vs user-space copy downloads')
+    parser.add_argument('--size-mb', type=int, default=256, help='Size of the test file (default: 256)')
+    parser.add_argument('--repeat', type=int, default=4, help='Downloads per run (default: 4)')
+    parser.add_argument('--modes', default='pool,async', help='Server modes to test (default: pool,async)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        name = 'payload.bin'
+        with open(os.path.join(directory, name), 'wb') as f:
+            block = os.urandom(1024 * 1024)
+            for _ in range(args.size_mb):
+                f.write(block)
+        results = []
+        for mode in args.modes.split(','):
+            for sendfile in (True, False):
+                result = run(directory, name, mode, sendfile, args.repeat)
+                results.append(result)
+                print(f"{mode:>8} sendfile={str(sendfile):<5} "
+                      f"{result['throughput_mb_s']:>8} MB/s  "
+                      f"{result['server_cpu_s_per_gb']:>6} CPU s/GB", file=sys.stderr)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
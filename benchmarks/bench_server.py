@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""
+Load-test the server on synthetic directories and write the results as JSON
+
+For each directory size it starts a fresh server and measures listing and
+/api/files latency, upload throughput for each upload size and download
+throughput with N concurrent clients, plus the server's peak RSS. Pass an
+earlier result file with --compare to flag regressions.
+"""
+import argparse
+import base64
+import http.client
+import json
+import os
+import platform
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'file_server.py')
+PASSWORD = 'bench'
+AUTH = {'Authorization': 'Basic ' + base64.b64encode(f"admin:{PASSWORD}".encode()).decode()}
+BLOCK = os.urandom(1024 * 1024)
+SMALL_FILE_SIZES = (0, 100, 1024, 4 * 1024, 16 * 1024, 64 * 1024)
+
+# 비교할 지표와 방향 (True: 클수록 좋음)
+COMPARED = {
+    'listing_ms.p50': False,
+    'listing_ms.p95': False,
+    'api_files_cold_ms': False,
+    'api_files_ms.p50': False,
+    'api_files_ms.p95': False,
+    'upload_mb_s': True,
+    'download_mb_s': True,
+    'peak_rss_mb': False,
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"server did not start on port {port}")
+
+
+def parse_size(text):
+    """'4K', '1M', '2G' or plain bytes"""
+    text = text.strip().upper()
+    for suffix, factor in (('K', 1024), ('M', 1024 ** 2), ('G', 1024 ** 3)):
+        if text.endswith(suffix):
+            return int(float(text[:-1]) * factor)
+    return int(text)
+
+
+def format_size(size):
+    for suffix, factor in (('G', 1024 ** 3), ('M', 1024 ** 2), ('K', 1024)):
+        if size >= factor and size % factor == 0:
+            return f"{size // factor}{suffix}"
+    return str(size)
+
+
+def percentiles(samples):
+    """p50/p95/p99/mean/max of a list of milliseconds"""
+    samples = sorted(samples)
+
+    def pick(p):
+        return round(samples[min(len(samples) - 1, int(len(samples) * p))], 3)
+
+    return {'p50': pick(0.50), 'p95': pick(0.95), 'p99': pick(0.99),
+            'mean': round(sum(samples) / len(samples), 3), 'max': round(samples[-1], 3)}
+
+
+def write_file(path, size):
+    """Write size bytes of incompressible data"""
+    with open(path, 'wb') as f:
+        while size > 0:
+            f.write(BLOCK[:min(size, len(BLOCK))])
+            size -= len(BLOCK)
+
+
+def make_directory(directory, count):
+    """Fill directory with count small files of mixed sizes"""
+    for i in range(count):
+        size = SMALL_FILE_SIZES[i % len(SMALL_FILE_SIZES)]
+        with open(os.path.join(directory, f'file-{i:06d}.bin'), 'wb') as f:
+            f.write(BLOCK[i % 4096:i % 4096 + size])
+
+
+def peak_rss_mb(pid):
+    """Peak resident set size of a running process (Linux), or None"""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def timed_get(conn, path):
+    """GET path on a keep-alive connection; return milliseconds to the last byte"""
+    start = time.perf_counter()
+    conn.request('GET', path, headers=AUTH)
+    resp = conn.getresponse()
+    resp.read()
+    if resp.status != 200:
+        raise RuntimeError(f"GET {path}: {resp.status}")
+    return (time.perf_counter() - start) * 1000
+
+
+def measure_latency(port, path, requests):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=600)
+    try:
+        return percentiles([timed_get(conn, path) for _ in range(requests)])
+    finally:
+        conn.close()
+
+
+def upload(port, name, size):
+    """PUT size bytes as name; return seconds taken"""
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=600)
+    try:
+        start = time.perf_counter()
+        conn.putrequest('PUT', '/api/files/' + name)
+        for header, value in AUTH.items():
+            conn.putheader(header, value)
+        conn.putheader('Content-Length', str(size))
+        conn.endheaders()
+        remaining = size
+        while remaining > 0:
+            conn.send(BLOCK[:min(remaining, len(BLOCK))])
+            remaining -= len(BLOCK)
+        resp = conn.getresponse()
+        resp.read()
+        elapsed = time.perf_counter() - start
+        if resp.status not in (200, 201):
+            raise RuntimeError(f"PUT {name}: {resp.status}")
+        return elapsed
+    finally:
+        conn.close()
+
+
+def delete(port, names):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=600)
+    try:
+        conn.request('POST', '/api/delete', json.dumps({'files': names}),
+                     {**AUTH, 'Content-Type': 'application/json'})
+        conn.getresponse().read()
+    finally:
+        conn.close()
+
+
+def measure_uploads(port, sizes, budget):
+    """Upload each size repeatedly for about budget bytes; MB/s per size"""
+    results = []
+    for size in sizes:
+        rounds = max(1, min(20, budget // max(size, 1)))
+        seconds = 0.0
+        names = []
+        for i in range(rounds):
+            name = f'upload-{format_size(size)}-{i}.bin'
+            seconds += upload(port, name, size)
+            names.append(name)
+        delete(port, names)
+        results.append({'size': size, 'uploads': rounds,
+                        'upload_mb_s': round(size * rounds / 1e6 / seconds, 1),
+                        'ms_per_upload': round(seconds * 1000 / rounds, 3)})
+        print(f"  upload {format_size(size):>6}: {results[-1]['upload_mb_s']:>8} MB/s", file=sys.stderr)
+    return results
+
+
+def measure_downloads(port, name, clients, duration):
+    """N clients download name in a loop for duration seconds; total MB/s"""
+    totals = [0] * clients
+    errors = []
+    deadline = time.perf_counter() + duration
+
+    def client(slot):
+        buffer = bytearray(1024 * 1024)
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=600)
+        try:
+            while time.perf_counter() < deadline:
+                conn.request('GET', '/' + name, headers=AUTH)
+                resp = conn.getresponse()
+                while True:
+                    count = resp.readinto(buffer)
+                    if not count:
+                        break
+                    totals[slot] += count
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(str(e))
+        finally:
+            conn.close()
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    result = {'clients': clients, 'bytes': sum(totals),
+              'download_mb_s': round(sum(totals) / 1e6 / elapsed, 1), 'errors': len(errors)}
+    print(f"  download x{clients:<4}: {result['download_mb_s']:>8} MB/s", file=sys.stderr)
+    return result
+
+
+def run_scenario(args, files):
+    """Start a server on a directory of `files` small files and run every measurement"""
+    with tempfile.TemporaryDirectory(dir=args.tmp_dir) as directory:
+        print(f"{files} files: generating...", file=sys.stderr)
+        make_directory(directory, files)
+        write_file(os.path.join(directory, 'download.bin'), args.download_size)
+        port = free_port()
+        cmd = [sys.executable, SERVER, '-p', str(port), '-d', directory,
+               '--password', PASSWORD, '--mode', args.mode, '--no-warm-up', *args.server_arg]
+        proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        result = {'files': files}
+        try:
+            wait_for_port(port)
+            result['listing_ms'] = measure_latency(port, '/', args.requests)
+            # 첫 요청은 모든 파일을 해시하므로 따로 측정
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=600)
+            result['api_files_cold_ms'] = round(timed_get(conn, '/api/files'), 3)
+            conn.close()
+            result['api_files_ms'] = measure_latency(port, '/api/files', args.requests)
+            print(f"  listing p50 {result['listing_ms']['p50']} ms, /api/files cold "
+                  f"{result['api_files_cold_ms']} ms, warm p50 {result['api_files_ms']['p50']} ms",
+                  file=sys.stderr)
+            result['uploads'] = measure_uploads(port, args.upload_sizes, args.upload_budget)
+            result['downloads'] = [measure_downloads(port, 'download.bin', clients, args.duration)
+                                   for clients in args.clients]
+            result['peak_rss_mb'] = peak_rss_mb(proc.pid)
+        finally:
+            proc.send_signal(signal.SIGTERM)
+            try:
+                _, _, usage = os.wait4(proc.pid, 0)
+                proc.returncode = 0
+                result.setdefault('peak_rss_mb', round(usage.ru_maxrss / 1024, 1))
+                result['server_cpu_s'] = round(usage.ru_utime + usage.ru_stime, 3)
+            except ChildProcessError:
+                pass
+    return result
+
+
+def source_version():
+    """git describe of the tree being benchmarked, if available"""
+    try:
+        out = subprocess.run(['git', 'describe', '--always', '--dirty'], capture_output=True,
+                             text=True, cwd=os.path.dirname(SERVER))
+    except OSError:
+        return None
+    return out.stdout.strip() or None
+
+
+def flatten(report):
+    """Map 'files=N upload 1M upload_mb_s'-style keys to the compared values"""
+    values = {}
+    for scenario in report['results']:
+        prefix = f"files={scenario['files']}"
+        for key in COMPARED:
+            name, _, sub = key.partition('.')
+            value = scenario.get(name)
+            if isinstance(value, dict):
+                value = value.get(sub)
+            if isinstance(value, (int, float)):
+                values[f"{prefix} {key}"] = (value, COMPARED[key])
+        for item in scenario.get('uploads', []):
+            values[f"{prefix} upload {format_size(item['size'])} upload_mb_s"] = (item['upload_mb_s'], True)
+        for item in scenario.get('downloads', []):
+            values[f"{prefix} download x{item['clients']} download_mb_s"] = (item['download_mb_s'], True)
+    return values
+
+
+def compare(baseline, report, tolerance):
+    """Print the change of every metric; return the number of regressions"""
+    old = flatten(baseline)
+    regressions = 0
+    for key, (value, higher_is_better) in flatten(report).items():
+        if key not in old or not old[key][0]:
+            continue
+        change = (value - old[key][0]) / old[key][0]
+        worse = -change if higher_is_better else change
+        flag = 'REGRESSION' if worse > tolerance else ''
+        regressions += bool(flag)
+        print(f"{key:<50} {old[key][0]:>12} -> {value:<12} {change:+7.1%} {flag}", file=sys.stderr)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark listing, /api/files, upload and download paths')
+    parser.add_argument('--files', default='1000,10000,100000',
+                        help='Directory sizes to test, comma separated (default: 1000,10000,100000)')
+    parser.add_argument('--upload-sizes', default='4K,1M,64M,1G',
+                        help='Upload sizes, comma separated, K/M/G suffixes (default: 4K,1M,64M,1G)')
+    parser.add_argument('--upload-budget', default='2G',
+                        help='Bytes to upload per size; small sizes repeat up to 20 times (default: 2G)')
+    parser.add_argument('--download-size', default='1G', help='File for download tests (default: 1G)')
+    parser.add_argument('--clients', default='1,8,32',
+                        help='Concurrent download clients, comma separated (default: 1,8,32)')
+    parser.add_argument('--duration', type=float, default=5,
+                        help='Seconds per download measurement (default: 5)')
+    parser.add_argument('--requests', type=int, default=50,
+                        help='Requests per latency measurement (default: 50)')
+    parser.add_argument('--mode', default='pool', help='Server --mode (default: pool)')
+    parser.add_argument('--server-arg', action='append', default=[],
+                        help='Extra server argument, may be repeated (e.g. --server-arg=--dedup)')
+    parser.add_argument('--tmp-dir', help='Where to create the test directories (default: system temp)')
+    parser.add_argument('-o', '--output', help='Write the JSON report here instead of stdout')
+    parser.add_argument('--compare', help='Earlier JSON report to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='Relative slowdown reported as a regression (default: 0.2)')
+    args = parser.parse_args()
+    args.upload_sizes = [parse_size(size) for size in args.upload_sizes.split(',')]
+    args.upload_budget = parse_size(args.upload_budget)
+    args.download_size = parse_size(args.download_size)
+    args.clients = [int(clients) for clients in args.clients.split(',')]
+
+    report = {
+        'started': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'version': source_version(),
+        'config': {'mode': args.mode, 'server_args': args.server_arg, 'requests': args.requests,
+                   'duration': args.duration, 'download_size': args.download_size},
+        'results': [run_scenario(args, int(files)) for files in args.files.split(',')],
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), report, args.tolerance)
+        if regressions:
+            print(f"{regressions} regressions beyond {args.tolerance:.0%}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
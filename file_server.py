@@ -4,638 +4,6595 @@ Simple file server with upload/delete capabilities and basic authentication
 """
 import http.server
 import socketserver
+import socket
 import os
 import base64
-import cgi
 import urllib.parse
 from urllib.parse import quote, unquote
 import sys
 import argparse
+import array
 import getpass
 import time
 from datetime import datetime
 import hashlib
+import gzip
+import zlib
+import html
 import json
+import threading
+import tempfile
+import queue
+import asyncio
+import bisect
+import heapq
+import concurrent.futures
+import email.parser
+import email.utils
+import http.client
+import mimetypes
+import posixpath
+import shutil
+import tarfile
+import zipfile
+import stat
+import struct
+import ctypes
+import ctypes.util
+import select
+import signal
+import traceback
+from collections import OrderedDict, deque
 
-class AuthUploadHandler(http.server.SimpleHTTPRequestHandler):
-    """HTTP request handler with upload and authentication support"""
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# 서버 상태 파일(해시 인덱스 등)을 보관하는 숨김 디렉터리 (목록에서 제외)
+STATE_DIR = '.file-server'
+HASH_CHUNK_SIZE = 1024 * 1024
+UPLOAD_CHUNK_SIZE = 64 * 1024
+# mkstemp은 0600으로 만들므로 업로드 파일은 open()과 같은 권한으로 되돌린다
+UMASK = os.umask(0o022)
+os.umask(UMASK)
+FILE_MODE = 0o666 & ~UMASK
+
+# 파일 종류별 확장자 (아이콘 표시와 압축 여부 판단에 사용)
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.svg')
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv')
+ARCHIVE_EXTENSIONS = ('.zip', '.tar', '.gz', '.rar')
+# 이미 압축된 형식은 다시 압축하지 않음 (svg, tar는 압축 효과가 있음)
+INCOMPRESSIBLE_EXTENSIONS = tuple(
+    ext for ext in IMAGE_EXTENSIONS + VIDEO_EXTENSIONS + ARCHIVE_EXTENSIONS
+    if ext not in ('.svg', '.tar')
+) + ('.webp', '.mp3', '.7z', '.bz2', '.xz', '.zst', '.docx', '.pptx')
+COMPRESSIBLE_TYPES = ('application/json', 'application/javascript', 'application/xml',
+                      'application/x-sh', 'application/x-tar', 'image/svg+xml')
+
+
+def sha256_file(filepath):
+    """Compute the SHA-256 hex digest of a file in bounded chunks"""
+    started = time.perf_counter()
+    h = hashlib.sha256()
+    size = 0
+    with open(filepath, 'rb') as f:
+        while True:
+            chunk = f.read(HASH_CHUNK_SIZE)
+            if not chunk:
+                break
+            h.update(chunk)
+            size += len(chunk)
+    METRICS.add('hash_seconds_total', time.perf_counter() - started)
+    METRICS.add('hashed_bytes_total', size)
+    return h.hexdigest()
+
+
+def copy_file_hashed(source, destination):
+    """Copy source to destination; return the SHA-256 hex digest of the bytes copied"""
+    h = hashlib.sha256()
+    with open(source, 'rb') as src, open(destination, 'wb') as dst:
+        while True:
+            chunk = src.read(HASH_CHUNK_SIZE)
+            if not chunk:
+                break
+            h.update(chunk)
+            dst.write(chunk)
+    return h.hexdigest()
+
+
+def parse_header(line):
+    """Parse a Content-Type like header into (value, params), like cgi.parse_header"""
+    parts = []
+    current = ''
+    quoted = False
+    for ch in line:
+        if ch == '"':
+            quoted = not quoted
+        if ch == ';' and not quoted:
+            parts.append(current)
+            current = ''
+        else:
+            current += ch
+    parts.append(current)
+    value = parts[0].strip().lower()
+    params = {}
+    for part in parts[1:]:
+        if '=' not in part:
+            continue
+        name, val = part.split('=', 1)
+        val = val.strip()
+        if len(val) >= 2 and val[0] == val[-1] == '"':
+            val = val[1:-1].replace('\\\\', '\\').replace('\\"', '"')
+        params[name.strip().lower()] = val
+    return value, params
+
+
+def safe_filename(name):
+    """Reduce a client-supplied filename to a bare name, or None if unusable"""
+    name = os.path.basename(name.replace('\\', '/'))
+    if name in ('', '.', '..', STATE_DIR):
+        return None
+    return name
+
+
+def make_etag(st):
+    """Strong validator derived from file metadata (inode, size, mtime)"""
+    return f'"{st.st_ino:x}-{st.st_size:x}-{st.st_mtime_ns:x}"'
+
+
+def parse_range_header(value, size):
+    """Parse a ``bytes=`` Range header into sorted, merged (start, end) pairs
+
+    Returns None when the header is absent or malformed (serve the whole
+    file) and [] when none of the ranges is satisfiable.
+    """
+    if not value:
+        return None
+    unit, _, spec = value.partition('=')
+    if unit.strip().lower() != 'bytes' or not spec.strip():
+        return None
+    ranges = []
+    for item in spec.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        first, sep, last = item.partition('-')
+        if not sep:
+            return None
+        try:
+            if first.strip() == '':
+                # suffix range: last N bytes
+                length = int(last)
+                if length <= 0:
+                    continue
+                start, end = max(size - length, 0), size - 1
+            else:
+                start = int(first)
+                end = int(last) if last.strip() else size - 1
+                if last.strip() and end < start:
+                    return None
+                end = min(end, size - 1)
+        except ValueError:
+            return None
+        if start < 0:
+            return None
+        if start < size:
+            ranges.append((start, end))
+    ranges.sort()
+    merged = []
+    for start, end in ranges:
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def accepted_encodings(value):
+    """Content codings an Accept-Encoding header allows, as {coding: q}"""
+    accepted = {}
+    for item in value.split(','):
+        coding, _, params = item.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            key, _, val = param.strip().partition('=')
+            if key.lower() == 'q':
+                try:
+                    q = float(val)
+                except ValueError:
+                    q = 0.0
+        accepted[coding] = q
+    if '*' in accepted:
+        for coding in ('br', 'gzip', 'zstd'):
+            accepted.setdefault(coding, accepted['*'])
+    return {coding: q for coding, q in accepted.items() if q > 0}
+
+
+def negotiate_encoding(value):
+    """Best on-the-fly coding the client accepts: zstd (when available), gzip or None"""
+    accepted = accepted_encodings(value or '')
+    options = [coding for coding in ('zstd', 'gzip')
+               if coding in accepted and (coding != 'zstd' or zstandard is not None)]
+    if not options:
+        return None
+    return max(options, key=lambda coding: accepted[coding])
+
+
+def is_compressible(path, ctype):
+    """Whether a file type is worth compressing on the fly"""
+    if path.lower().endswith(INCOMPRESSIBLE_EXTENSIONS):
+        return False
+    return ctype.startswith('text/') or ctype.endswith(('+xml', '+json')) or ctype in COMPRESSIBLE_TYPES
+
+
+def compress_bytes(data, encoding):
+    """Compress a complete body with gzip or zstd"""
+    if encoding == 'zstd':
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    return gzip.compress(data, 6, mtime=0)
+
+
+class StreamCompressor:
+    """Incremental gzip/zstd encoder for streamed bodies
+
+    Every ``compress`` call flushes, so each piece of a streamed page can be
+    sent as soon as it is generated.
+    """
+
+    def __init__(self, encoding):
+        if encoding == 'zstd':
+            self.obj = zstandard.ZstdCompressor(level=3).compressobj()
+            self.sync = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        else:
+            self.obj = zlib.compressobj(6, zlib.DEFLATED, 31)
+            self.sync = zlib.Z_SYNC_FLUSH
+
+    def compress(self, data):
+        return self.obj.compress(data) + self.obj.flush(self.sync)
+
+    def finish(self):
+        return self.obj.flush()
+
+
+class CompressionCache:
+    """Small LRU of compressed file bodies keyed by (path, etag, encoding)"""
+
+    def __init__(self, max_bytes=32 * 1024 * 1024, max_entry=4 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.max_entry = max_entry
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            data = self.entries.get(key)
+            if data is not None:
+                self.entries.move_to_end(key)
+            return data
+
+    def put(self, key, data):
+        if len(data) > self.max_entry or len(data) > self.max_bytes:
+            return
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self.entries[key] = data
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+
+
+class Metrics:
+    """Counters and latency histograms served at /metrics in Prometheus text format
+
+    Every thread records into its own dicts, so the hot path never takes a
+    lock; a scrape copies and sums them. The dicts of threads that have
+    exited are folded into ``retired`` when a new thread registers. Values
+    kept elsewhere (open connections, hash index hits) come from collectors
+    called at scrape time. Under --processes each worker also exports a
+    snapshot to a shared directory, and a scrape reports every worker.
+    """
+
+    PREFIX = 'file_server_'
+    LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+    EXPORT_INTERVAL = 5.0
+    HELP = {
+        'http_requests_total': ('counter', 'Requests answered, by route and status code'),
+        'http_request_duration_seconds': ('histogram', 'Time from request line to end of response, by route'),
+        'received_bytes_total': ('counter', 'Bytes read from client connections'),
+        'sent_bytes_total': ('counter', 'Bytes written to client connections, sendfile included'),
+        'active_connections': ('gauge', 'Client connections currently open'),
+        'rejected_connections_total': ('counter', 'Connections answered 503 because the worker queue was full'),
+        'hash_cache_hits_total': ('counter', 'File digests answered from the hash index'),
+        'hash_cache_misses_total': ('counter', 'File digests that had to be computed'),
+        'hash_seconds_total': ('counter', 'Time spent hashing whole files'),
+        'hashed_bytes_total': ('counter', 'Bytes read to hash whole files'),
+        'uploads_total': ('counter', 'Uploaded files stored'),
+        'upload_bytes_total': ('counter', 'Upload bytes written to disk'),
+        'upload_seconds_total': ('counter', 'Time spent receiving uploads; bytes/seconds is the throughput'),
+        'active_transfers': ('gauge', 'Uploads and downloads in progress, by direction'),
+        'rejected_transfers_total': ('counter', 'Transfers refused by the upload and per-client limits, by status code'),
+        'throttle_seconds_total': ('counter', 'Time transfers were held back by the per-client rate limits'),
+    }
+
+    def __init__(self):
+        self.local = threading.local()
+        self.threads = {}
+        self.retired = ({}, {})
+        self.lock = threading.Lock()
+        self.collectors = []
+        self.worker = None
+        self.export_dir = None
+
+    def shard(self):
+        """(counters, histograms) dicts owned by the calling thread"""
+        try:
+            return self.local.shard
+        except AttributeError:
+            pass
+        shard = self.local.shard = ({}, {})
+        with self.lock:
+            for thread in [t for t in self.threads if not t.is_alive()]:
+                self.fold(self.retired, self.threads.pop(thread))
+            self.threads[threading.current_thread()] = shard
+        return shard
+
+    def add(self, name, value=1, labels=()):
+        """Add to a counter; labels is a tuple of (name, value) pairs"""
+        counters = self.shard()[0]
+        key = (name, labels)
+        counters[key] = counters.get(key, 0) + value
+
+    def observe(self, name, value, labels=()):
+        """Record one sample in a latency histogram"""
+        histograms = self.shard()[1]
+        key = (name, labels)
+        buckets = histograms.get(key)
+        if buckets is None:
+            # 구간별 개수(마지막은 +Inf) 뒤에 합계
+            buckets = histograms[key] = [0] * (len(self.LATENCY_BUCKETS) + 2)
+        buckets[bisect.bisect_left(self.LATENCY_BUCKETS, value)] += 1
+        buckets[-1] += value
+
+    def request(self, route, code, seconds):
+        """Count a finished request and its latency"""
+        self.add('http_requests_total', 1, (('route', route), ('code', str(code))))
+        self.observe('http_request_duration_seconds', seconds, (('route', route),))
+
+    @staticmethod
+    def fold(into, shard):
+        """Add the values of shard to into"""
+        counters, histograms = into
+        # list(dict.items())는 GIL 아래에서 한 번에 복사되므로 기록 중인 스레드와 충돌하지 않음
+        for key, value in list(shard[0].items()):
+            counters[key] = counters.get(key, 0) + value
+        for key, buckets in list(shard[1].items()):
+            total = histograms.get(key)
+            if total is None:
+                histograms[key] = list(buckets)
+            else:
+                for i, count in enumerate(buckets):
+                    total[i] += count
+
+    def snapshot(self):
+        """Sum of all threads and collectors, as JSON-friendly lists"""
+        merged = ({}, {})
+        with self.lock:
+            self.fold(merged, self.retired)
+            for shard in self.threads.values():
+                self.fold(merged, shard)
+        counters, histograms = merged
+        for collect in self.collectors:
+            for name, labels, value in collect():
+                counters[(name, labels)] = counters.get((name, labels), 0) + value
+        return {
+            'counters': [[name, [list(label) for label in labels], value]
+                         for (name, labels), value in counters.items()],
+            'histograms': [[name, [list(label) for label in labels], buckets]
+                           for (name, labels), buckets in histograms.items()],
+        }
+
+    def start_export(self, directory, worker):
+        """Write this process's snapshot to directory every EXPORT_INTERVAL seconds"""
+        self.worker = str(worker)
+        self.export_dir = directory
+        os.makedirs(directory, exist_ok=True)
+
+        def run():
+            path = os.path.join(directory, f'{self.worker}.json')
+            while True:
+                try:
+                    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+                        json.dump(self.snapshot(), f)
+                    os.replace(path + '.tmp', path)
+                except OSError:
+                    pass
+                time.sleep(self.EXPORT_INTERVAL)
+
+        threading.Thread(target=run, name='metrics-export', daemon=True).start()
+
+    def snapshots(self):
+        """(worker, snapshot) for this process and the last export of every other worker"""
+        snapshots = [(self.worker, self.snapshot())]
+        if self.export_dir is None:
+            return snapshots
+        try:
+            names = sorted(os.listdir(self.export_dir))
+        except OSError:
+            names = []
+        for name in names:
+            worker, ext = os.path.splitext(name)
+            if ext != '.json' or worker == self.worker:
+                continue
+            try:
+                with open(os.path.join(self.export_dir, name), 'r', encoding='utf-8') as f:
+                    snapshots.append((worker, json.load(f)))
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+    @staticmethod
+    def format_labels(labels):
+        if not labels:
+            return ''
+        pairs = []
+        for name, value in labels:
+            value = value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+            pairs.append(f'{name}="{value}"')
+        return '{' + ','.join(pairs) + '}'
+
+    def render(self):
+        """The Prometheus text exposition of every worker's metrics"""
+        samples = {}
+        for worker, snapshot in self.snapshots():
+            extra = [['worker', worker]] if worker is not None else []
+            for name, labels, value in snapshot['counters']:
+                samples.setdefault(name, []).append(
+                    f'{self.PREFIX}{name}{self.format_labels(labels + extra)} {value!r}')
+            for name, labels, buckets in snapshot['histograms']:
+                lines = samples.setdefault(name, [])
+                labels = labels + extra
+                cumulative = 0
+                for bound, count in zip(self.LATENCY_BUCKETS + ('+Inf',), buckets):
+                    cumulative += count
+                    lines.append(f'{self.PREFIX}{name}_bucket'
+                                 f'{self.format_labels(labels + [["le", str(bound)]])} {cumulative}')
+                lines.append(f'{self.PREFIX}{name}_sum{self.format_labels(labels)} {buckets[-1]!r}')
+                lines.append(f'{self.PREFIX}{name}_count{self.format_labels(labels)} {cumulative}')
+        out = []
+        for name, (kind, text) in self.HELP.items():
+            if name in samples:
+                out.append(f'# HELP {self.PREFIX}{name} {text}')
+                out.append(f'# TYPE {self.PREFIX}{name} {kind}')
+                out.extend(samples[name])
+        return ('\n'.join(out) + '\n').encode('utf-8')
+
+
+METRICS = Metrics()
+
+
+class ArchiveBuffer:
+    """Write-only, non-seekable sink that zipfile streams into"""
+
+    def __init__(self):
+        self.parts = []
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b''.join(self.parts)
+        self.parts = []
+        return data
+
+
+class ArchiveStream:
+    """ZIP or tar of many files generated on the fly in constant memory
+
+    Iterating yields ``bytes`` to send verbatim and, for tar, ``(path,
+    length)`` file slices the engines send zero-copy; a file that shrank
+    meanwhile is padded with zeros so the archive stays well-formed. ZIP is
+    written to a non-seekable sink, so every entry uses a data descriptor
+    (and ZIP64 where needed) and the first byte goes out before any file
+    is read; incompressible files are stored rather than deflated.
+    """
+
+    READ_SIZE = 256 * 1024
+
+    def __init__(self, entries, fmt='zip'):
+        self.entries = entries
+        self.fmt = fmt
+
+    def __iter__(self):
+        return self.iter_tar() if self.fmt == 'tar' else self.iter_zip()
+
+    def iter_tar(self):
+        for arcname, path in self.entries:
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            if not stat.S_ISREG(st.st_mode):
+                continue
+            info = tarfile.TarInfo(arcname)
+            info.size = st.st_size
+            info.mtime = int(st.st_mtime)
+            info.mode = st.st_mode & 0o7777
+            yield info.tobuf(tarfile.PAX_FORMAT, 'utf-8', 'surrogateescape')
+            if st.st_size:
+                yield path, st.st_size
+            if st.st_size % tarfile.BLOCKSIZE:
+                yield b'\0' * (tarfile.BLOCKSIZE - st.st_size % tarfile.BLOCKSIZE)
+        yield b'\0' * (2 * tarfile.BLOCKSIZE)
+
+    def iter_zip(self):
+        sink = ArchiveBuffer()
+        with zipfile.ZipFile(sink, 'w') as archive:
+            for arcname, path in self.entries:
+                try:
+                    f = open(path, 'rb')
+                except OSError:
+                    continue
+                with f:
+                    st = os.fstat(f.fileno())
+                    info = zipfile.ZipInfo(arcname, time.localtime(max(st.st_mtime, 315532800))[:6])
+                    info.file_size = st.st_size
+                    info.external_attr = (st.st_mode & 0xFFFF) << 16
+                    ctype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+                    info.compress_type = (zipfile.ZIP_DEFLATED if is_compressible(path, ctype)
+                                          else zipfile.ZIP_STORED)
+                    with archive.open(info, 'w') as dest:
+                        while True:
+                            chunk = f.read(self.READ_SIZE)
+                            if not chunk:
+                                break
+                            dest.write(chunk)
+                            data = sink.take()
+                            if data:
+                                yield data
+                yield sink.take()
+        yield sink.take()
+
+
+class ChunkedWriter:
+    """Frame writes with HTTP/1.1 chunked transfer encoding"""
+
+    def __init__(self, wfile):
+        self.wfile = wfile
+
+    def write(self, data):
+        if data:
+            self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+
+    def close(self):
+        self.wfile.write(b'0\r\n\r\n')
+
+
+class MultipartParser:
+    """Incremental multipart/form-data parser with bounded buffering
+
+    ``feed`` accepts arbitrary slices of the body and returns a list of
+    events: ``('part', headers)`` when a part starts, ``('data', bytes)`` for
+    body bytes and ``('end', None)`` when the part is complete. At most one
+    delimiter length of data is held back between calls.
+    """
+
+    MAX_HEADER_SIZE = 16 * 1024
+
+    def __init__(self, boundary):
+        if isinstance(boundary, str):
+            boundary = boundary.encode('latin-1')
+        self.delimiter = b'\r\n--' + boundary
+        # 첫 경계는 앞에 CRLF가 없으므로 미리 넣어둔다
+        self.buffer = b'\r\n'
+        self.state = 'preamble'
+
+    @property
+    def finished(self):
+        return self.state == 'epilogue'
+
+    def parse_part_headers(self, raw):
+        """Decode the header block of one part"""
+        headers = {}
+        for line in raw.split(b'\r\n'):
+            if not line:
+                continue
+            try:
+                text = line.decode('utf-8')
+            except UnicodeDecodeError:
+                text = line.decode('latin-1')
+            if ':' not in text:
+                raise ValueError(f"Malformed part header: {text!r}")
+            name, value = text.split(':', 1)
+            headers[name.strip().lower()] = value.strip()
+        return headers
+
+    def feed(self, data):
+        """Consume a chunk of the body and return the resulting events"""
+        events = []
+        buf = self.buffer + data
+        keep = len(self.delimiter) - 1
+        while True:
+            if self.state == 'preamble':
+                idx = buf.find(self.delimiter)
+                if idx < 0:
+                    buf = buf[-keep:]
+                    break
+                buf = buf[idx + len(self.delimiter):]
+                self.state = 'boundary'
+            elif self.state == 'boundary':
+                if len(buf) < 2:
+                    break
+                if buf[:2] == b'--':
+                    self.state = 'epilogue'
+                    continue
+                idx = buf.find(b'\r\n')
+                if idx < 0:
+                    if len(buf) > self.MAX_HEADER_SIZE:
+                        raise ValueError("Malformed multipart boundary")
+                    break
+                buf = buf[idx + 2:]
+                self.state = 'headers'
+            elif self.state == 'headers':
+                if buf.startswith(b'\r\n'):
+                    idx, raw = 0, b''
+                    buf = buf[2:]
+                else:
+                    idx = buf.find(b'\r\n\r\n')
+                    if idx < 0:
+                        if len(buf) > self.MAX_HEADER_SIZE:
+                            raise ValueError("Multipart part headers too large")
+                        break
+                    raw = buf[:idx]
+                    buf = buf[idx + 4:]
+                events.append(('part', self.parse_part_headers(raw)))
+                self.state = 'body'
+            elif self.state == 'body':
+                idx = buf.find(self.delimiter)
+                if idx < 0:
+                    if len(buf) > keep:
+                        events.append(('data', buf[:-keep]))
+                        buf = buf[-keep:]
+                    break
+                if idx:
+                    events.append(('data', buf[:idx]))
+                events.append(('end', None))
+                buf = buf[idx + len(self.delimiter):]
+                self.state = 'boundary'
+            else:
+                buf = b''
+                break
+        self.buffer = buf
+        return events
+
+
+class BlobStore:
+    """Content-addressed store of uploaded file contents keyed by SHA-256
+
+    Blobs live under ``STATE_DIR/blobs/<2 hex>/<digest>`` and visible
+    filenames are hard links to them, so identical content is stored once.
+    A blob's link count is its reference count: when the last visible name
+    goes away (delete or overwrite) the blob is removed. Names with the same
+    content share one inode, so an in-place edit of one changes all of them,
+    and they keep the mtime of the content's first upload: touching a new
+    link would also touch every other name. The map from inode to digest is
+    per process and is rebuilt from the blob directory when it misses, e.g.
+    for a blob another worker stored.
+    """
+
+    def __init__(self, directory, shared=False):
+        self.root = os.path.join(directory, STATE_DIR, 'blobs')
+        self.by_inode = {}
+        os.makedirs(self.root, exist_ok=True)
+        # 프로세스 간 잠금: 한쪽이 지우려는 blob에 다른 쪽이 링크하는 경쟁을 막음
+        self.lock = FileLock(os.path.join(self.root, '.lock')) if shared else threading.Lock()
+        self.scan()
+
+    def blob_path(self, digest):
+        return os.path.join(self.root, digest[:2], digest)
+
+    def walk(self):
+        """Yield (digest, stat) for every blob on disk"""
+        for dirpath, _, filenames in os.walk(self.root):
+            # blob은 <2 hex>/ 하위 디렉터리에만 있음 (루트에는 잠금 파일)
+            if dirpath == self.root:
+                continue
+            for name in filenames:
+                try:
+                    yield name, os.stat(os.path.join(dirpath, name))
+                except OSError:
+                    continue
+
+    def scan(self):
+        """Index existing blobs by inode and drop unreferenced ones"""
+        removed = 0
+        with self.lock:
+            for digest, st in self.walk():
+                if st.st_nlink <= 1:
+                    try:
+                        os.remove(self.blob_path(digest))
+                        removed += 1
+                    except OSError:
+                        pass
+                else:
+                    self.by_inode[st.st_ino] = digest
+        return removed
+
+    def place(self, tmp_path, filepath, digest):
+        """Store tmp_path as a blob (unless already present) and link filepath to it"""
+        blob = self.blob_path(digest)
+        with self.lock:
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            try:
+                os.link(tmp_path, blob)
+            except FileExistsError:
+                pass
+            blob_st = os.stat(blob)
+            try:
+                old = os.stat(filepath)
+            except FileNotFoundError:
+                old = None
+            if old is None or old.st_ino != blob_st.st_ino:
+                link_tmp = tmp_path + '.link'
+                os.link(blob, link_tmp)
+                os.replace(link_tmp, filepath)
+            self.by_inode[blob_st.st_ino] = digest
+            if old is not None and old.st_ino != blob_st.st_ino:
+                self._release(old)
+        os.remove(tmp_path)
+
+    def release(self, st):
+        """Drop the blob behind a just-removed file if nothing else links to it"""
+        with self.lock:
+            self._release(st)
+
+    def _release(self, st):
+        # 링크가 하나뿐이던 파일은 blob에 연결된 적이 없음
+        if st.st_nlink <= 1:
+            return
+        digest = self._locate(st.st_ino)
+        if digest is None:
+            return
+        try:
+            if os.stat(self.blob_path(digest)).st_nlink <= 1:
+                os.remove(self.blob_path(digest))
+                del self.by_inode[st.st_ino]
+        except FileNotFoundError:
+            self.by_inode.pop(st.st_ino, None)
+
+    def _locate(self, ino):
+        """Digest of the blob with this inode, or None; call with the lock held"""
+        digest = self.by_inode.get(ino)
+        if digest is not None:
+            try:
+                if os.stat(self.blob_path(digest)).st_ino == ino:
+                    return digest
+            except FileNotFoundError:
+                pass
+        # 다른 워커가 만든 blob이거나 inode가 재사용됐으면 이 프로세스의 색인이 틀리므로 다시 읽음
+        self.by_inode = {st.st_ino: digest for digest, st in self.walk()}
+        return self.by_inode.get(ino)
+
+    def stats(self):
+        """Dedup ratio and space saved across all blobs"""
+        blobs = files = logical = physical = 0
+        # 다른 워커가 만든 blob도 세도록 색인 대신 디렉터리를 읽음
+        for _, st in self.walk():
+            links = st.st_nlink - 1
+            blobs += 1
+            files += links
+            logical += st.st_size * links
+            physical += st.st_size
+        return {
+            'enabled': True,
+            'blobs': blobs,
+            'files': files,
+            'logical_bytes': logical,
+            'physical_bytes': physical,
+            'saved_bytes': logical - physical,
+            'ratio': round(logical / physical, 3) if physical else 1.0,
+        }
+
+
+def place_file(tmp_path, filepath, digest, blob_store=None):
+    """Atomically move a finished upload to filepath, through the blob store if enabled"""
+    if blob_store is None:
+        os.replace(tmp_path, filepath)
+    else:
+        blob_store.place(tmp_path, filepath, digest)
+
+
+class UploadSink:
+    """Stream one uploaded file to a temp file, hashing bytes as they arrive
+
+    The temp file lives under the state directory of the target directory so
+    the final ``os.replace`` is an atomic rename on the same filesystem.
+    """
+
+    def __init__(self, directory, filename, hash_index=None, blob_store=None):
+        self.directory = directory
+        self.filename = filename
+        self.hash_index = hash_index
+        self.blob_store = blob_store
+        self.size = 0
+        self.sha256 = hashlib.sha256()
+        self.started = time.perf_counter()
+        tmp_dir = os.path.join(directory, STATE_DIR, 'tmp')
+        os.makedirs(tmp_dir, exist_ok=True)
+        fd, self.tmp_path = tempfile.mkstemp(dir=tmp_dir, prefix='upload-', suffix='.part')
+        if hasattr(os, 'fchmod'):
+            os.fchmod(fd, FILE_MODE)
+        self.file = os.fdopen(fd, 'wb')
+
+    def write(self, data):
+        self.file.write(data)
+        self.sha256.update(data)
+        self.size += len(data)
+
+    def commit(self):
+        """fsync, atomically move into place and record the digest"""
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+        filepath = os.path.join(self.directory, self.filename)
+        digest = self.sha256.hexdigest()
+        place_file(self.tmp_path, filepath, digest, self.blob_store)
+        if self.hash_index is not None:
+            self.hash_index.put(filepath, digest)
+        METRICS.add('uploads_total')
+        METRICS.add('upload_bytes_total', self.size)
+        METRICS.add('upload_seconds_total', time.perf_counter() - self.started)
+        return filepath, digest
+
+    def abort(self):
+        """Discard the partial upload"""
+        # 디스크가 가득 차면 close가 버퍼를 비우다 실패하므로 삭제는 따로 시도
+        try:
+            self.file.close()
+        except OSError:
+            pass
+        try:
+            os.remove(self.tmp_path)
+        except OSError:
+            pass
+
+
+def commit_upload(sink, file_locks, journal=None):
+    """Commit a finished UploadSink under its per-name lock; return (filename, digest)"""
+    with file_locks.hold(sink.filename):
+        existed = os.path.exists(os.path.join(sink.directory, sink.filename))
+        filepath, digest = sink.commit()
+        if journal is not None:
+            journal.record('modify' if existed else 'add', sink.filename, digest)
+    return os.path.basename(filepath), digest
+
+
+class MultipartUpload:
+    """Drive a MultipartParser, streaming each ``file`` part into an UploadSink
+
+    Transport-agnostic: callers feed body chunks however they read them.
+    """
+
+    def __init__(self, boundary, directory, hash_index, file_locks, journal=None, blob_store=None):
+        self.parser = MultipartParser(boundary)
+        self.directory = directory
+        self.hash_index = hash_index
+        self.file_locks = file_locks
+        self.journal = journal
+        self.blob_store = blob_store
+        self.sink = None
+        self.uploaded = []
+        self.results = []
+
+    @property
+    def finished(self):
+        return self.parser.finished
+
+    def feed(self, chunk):
+        """Parse a body chunk and write any file data it contains"""
+        for event, value in self.parser.feed(chunk):
+            if event == 'part':
+                _, params = parse_header(value.get('content-disposition', ''))
+                raw_name = params.get('filename', '')
+                filename = safe_filename(raw_name)
+                if params.get('name') == 'file' and filename:
+                    try:
+                        self.sink = UploadSink(self.directory, filename, self.hash_index,
+                                               self.blob_store)
+                    except OSError as e:
+                        # 이 파트의 나머지 데이터는 버리고 다음 파일을 계속 받는다
+                        self.results.append({'name': filename, 'error': e.strerror or str(e)})
+                elif params.get('name') == 'file' and raw_name:
+                    self.results.append({'name': raw_name, 'error': 'Invalid filename'})
+            elif event == 'data':
+                if self.sink is not None:
+                    try:
+                        self.sink.write(value)
+                    except OSError as e:
+                        sink, self.sink = self.sink, None
+                        sink.abort()
+                        self.results.append({'name': sink.filename, 'error': e.strerror or str(e)})
+            elif event == 'end':
+                if self.sink is not None:
+                    sink, self.sink = self.sink, None
+                    try:
+                        filename, digest = commit_upload(sink, self.file_locks, self.journal)
+                    except OSError as e:
+                        # 한 파일의 실패가 나머지 파일 업로드를 막지 않도록 결과에만 기록
+                        sink.abort()
+                        self.results.append({'name': sink.filename, 'error': e.strerror or str(e)})
+                        continue
+                    self.uploaded.append((filename, digest))
+                    self.results.append({'name': filename, 'sha256': digest, 'size': sink.size})
+
+    def abort(self):
+        """Discard the file part in progress, if any"""
+        if self.sink is not None:
+            self.sink.abort()
+            self.sink = None
+
+
+class UploadSessions:
+    """Server-side state for resumable chunked uploads
+
+    Each session has a JSON record and a preallocated data file under
+    ``STATE_DIR/uploads``. Chunk ``n`` lands at ``n * chunk_size`` so chunks
+    may arrive in any order or in parallel; acknowledged chunks are recorded
+    in the JSON record so sessions survive a restart. Sessions untouched for
+    ``ttl`` seconds are garbage-collected.
+    """
+
+    DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+    MIN_CHUNK_SIZE = 64 * 1024
+    MAX_CHUNK_SIZE = 64 * 1024 * 1024
+
+    def __init__(self, directory, hash_index, file_locks, ttl=24 * 3600, journal=None,
+                 blob_store=None, shared=False):
+        self.directory = directory
+        self.root = os.path.join(directory, STATE_DIR, 'uploads')
+        self.hash_index = hash_index
+        self.file_locks = file_locks
+        self.journal = journal
+        self.blob_store = blob_store
+        self.ttl = ttl
+        # 여러 프로세스가 세션을 공유하면 디스크의 기록이 기준이고 잠금도 프로세스 간에 건다
+        self.shared = shared
+        os.makedirs(self.root, exist_ok=True)
+        self.lock = FileLock(os.path.join(self.root, '.lock')) if shared else threading.Lock()
+        self.sessions = {}
+        self.load()
+
+    def record_path(self, session_id):
+        return os.path.join(self.root, f"{session_id}.json")
+
+    def data_path(self, session_id):
+        return os.path.join(self.root, f"{session_id}.part")
+
+    def load(self):
+        """Reload sessions left over from a previous run"""
+        for name in os.listdir(self.root):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.root, name), 'r', encoding='utf-8') as f:
+                    session = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if os.path.exists(self.data_path(session.get('id', ''))):
+                session['received'] = set(session.get('received', []))
+                self.sessions[session['id']] = session
+
+    def save(self, session):
+        """Atomically persist a session record"""
+        record = dict(session, received=sorted(session['received']))
+        path = self.record_path(session['id'])
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(record, f)
+        os.replace(tmp_path, path)
+
+    def chunk_count(self, session):
+        return max(1, -(-session['size'] // session['chunk_size']))
+
+    def chunk_length(self, session, index):
+        start = index * session['chunk_size']
+        return max(0, min(session['size'], start + session['chunk_size']) - start)
+
+    def status(self, session):
+        """Public view of a session, including the contiguous acknowledged offset"""
+        offset = 0
+        for index in range(self.chunk_count(session)):
+            if index not in session['received']:
+                break
+            offset += self.chunk_length(session, index)
+        return {
+            'id': session['id'],
+            'filename': session['filename'],
+            'size': session['size'],
+            'chunk_size': session['chunk_size'],
+            'chunk_count': self.chunk_count(session),
+            'received': sorted(session['received']),
+            'offset': offset,
+        }
+
+    def create(self, filename, size, chunk_size=None, sha256=None):
+        """Start a session and preallocate its data file"""
+        filename = safe_filename(filename or '')
+        if not filename:
+            raise ValueError("Invalid filename")
+        if not isinstance(size, int) or size < 0:
+            raise ValueError("Invalid size")
+        chunk_size = chunk_size or self.DEFAULT_CHUNK_SIZE
+        if not isinstance(chunk_size, int) or not self.MIN_CHUNK_SIZE <= chunk_size <= self.MAX_CHUNK_SIZE:
+            raise ValueError("Invalid chunk_size")
+        if sha256 is not None and (not isinstance(sha256, str) or len(sha256) != 64):
+            raise ValueError("Invalid sha256")
+        session = {
+            'id': os.urandom(16).hex(),
+            'filename': filename,
+            'size': size,
+            'chunk_size': chunk_size,
+            'sha256': sha256.lower() if sha256 else None,
+            'received': set(),
+            'created': time.time(),
+            'updated': time.time(),
+        }
+        # 기록을 먼저 남겨 GC가 만들어지는 중인 데이터 파일을 고아로 보지 않게 함
+        with self.lock:
+            self.sessions[session['id']] = session
+            self.save(session)
+        try:
+            with open(self.data_path(session['id']), 'wb') as f:
+                f.truncate(size)
+        except BaseException:
+            with self.lock:
+                self.sessions.pop(session['id'], None)
+            self.remove_files(session['id'])
+            raise
+        return session
+
+    def get(self, session_id):
+        """Return a session or raise KeyError"""
+        with self.lock:
+            if self.shared:
+                self._refresh(session_id)
+            return self.sessions[session_id]
+
+    def _refresh(self, session_id):
+        """Reload one session record written by any process; caller holds the lock"""
+        try:
+            with open(self.record_path(session_id), 'r', encoding='utf-8') as f:
+                record = json.load(f)
+        except FileNotFoundError:
+            self.sessions.pop(session_id, None)
+            return
+        except (OSError, ValueError):
+            return
+        record['received'] = set(record.get('received', []))
+        session = self.sessions.get(session_id)
+        if session is None:
+            self.sessions[session_id] = record
+        else:
+            # ChunkWriter가 들고 있는 dict를 그대로 갱신
+            session.update(record)
+
+    def open_chunk(self, session_id, index, length):
+        """Validate a chunk PUT and return a writer for it"""
+        session = self.get(session_id)
+        try:
+            index = int(index)
+        except ValueError:
+            raise ValueError("Invalid chunk index")
+        if not 0 <= index < self.chunk_count(session):
+            raise ValueError("Chunk index out of range")
+        if length != self.chunk_length(session, index):
+            raise ValueError(f"Chunk {index} must be {self.chunk_length(session, index)} bytes")
+        return ChunkWriter(self, session, index)
+
+    def mark_received(self, session, index):
+        with self.lock:
+            if self.shared:
+                self._refresh(session['id'])
+            if session['id'] not in self.sessions:
+                raise KeyError(session['id'])
+            session['received'].add(index)
+            session['updated'] = time.time()
+            self.save(session)
+
+    def finalize(self, session_id):
+        """Verify a complete session and move its file into place"""
+        session = self.get(session_id)
+        missing = [i for i in range(self.chunk_count(session)) if i not in session['received']]
+        if missing:
+            raise ValueError(f"{len(missing)} chunks missing, first is {missing[0]}")
+        with self.lock:
+            if self.shared:
+                self._refresh(session_id)
+            if self.sessions.pop(session_id, None) is None:
+                raise KeyError(session_id)
+            if self.shared:
+                # 기록을 지워 다른 프로세스가 같은 세션을 완료하지 못하게 함
+                os.remove(self.record_path(session_id))
+        data_path = self.data_path(session_id)
+        digest = sha256_file(data_path)
+        if session['sha256'] and digest != session['sha256']:
+            self.remove_files(session_id)
+            raise ValueError("SHA-256 mismatch, upload discarded")
+        with open(data_path, 'rb') as f:
+            os.fsync(f.fileno())
+        filepath = os.path.join(self.directory, session['filename'])
+        with self.file_locks.hold(session['filename']):
+            existed = os.path.exists(filepath)
+            place_file(data_path, filepath, digest, self.blob_store)
+            self.hash_index.put(filepath, digest)
+            if self.journal is not None:
+                self.journal.record('modify' if existed else 'add', session['filename'], digest)
+        self.remove_files(session_id)
+        METRICS.add('uploads_total')
+        return session['filename'], digest
+
+    def abort(self, session_id):
+        with self.lock:
+            if self.shared:
+                self._refresh(session_id)
+            if self.sessions.pop(session_id, None) is None:
+                raise KeyError(session_id)
+        self.remove_files(session_id)
+
+    def remove_files(self, session_id):
+        for path in (self.record_path(session_id), self.data_path(session_id)):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def collect_garbage(self):
+        """Drop sessions idle for longer than ttl and orphaned files older than that"""
+        cutoff = time.time() - self.ttl
+        with self.lock:
+            if self.shared:
+                # 다른 워커가 만든 세션은 디스크의 기록에만 있으므로 기록 기준으로 다시 읽는다
+                recorded = {name[:-len('.json')] for name in os.listdir(self.root)
+                            if name.endswith('.json')}
+                for session_id in recorded | set(self.sessions):
+                    self._refresh(session_id)
+            expired = [sid for sid, session in self.sessions.items() if session['updated'] < cutoff]
+            for session_id in expired:
+                del self.sessions[session_id]
+                self.remove_files(session_id)
+            live = set(self.sessions)
+        for name in os.listdir(self.root):
+            session_id = name.split('.', 1)[0]
+            if session_id and session_id not in live:
+                path = os.path.join(self.root, name)
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                except OSError:
+                    pass
+        if expired:
+            print(f"Removed {len(expired)} abandoned upload sessions")
+        return len(expired)
+
+    def start_gc(self, interval=600):
+        """Collect garbage now and then every interval seconds in the background"""
+        def run():
+            while True:
+                try:
+                    self.collect_garbage()
+                except OSError as e:
+                    print(f"Upload session cleanup failed: {e}")
+                time.sleep(interval)
+
+        thread = threading.Thread(target=run, name='upload-session-gc', daemon=True)
+        thread.start()
+        return thread
+
+
+class ChunkWriter:
+    """Write one chunk of an upload session at its offset and verify its checksum"""
+
+    def __init__(self, sessions, session, index):
+        self.sessions = sessions
+        self.session = session
+        self.index = index
+        self.expected = sessions.chunk_length(session, index)
+        self.offset = index * session['chunk_size']
+        self.written = 0
+        self.sha256 = hashlib.sha256()
+        self.started = time.perf_counter()
+        self.fd = os.open(sessions.data_path(session['id']), os.O_WRONLY)
+
+    def write(self, data):
+        os.pwrite(self.fd, data, self.offset + self.written)
+        self.sha256.update(data)
+        self.written += len(data)
+
+    def commit(self, checksum=None):
+        """fsync and acknowledge the chunk; raise ValueError on a bad checksum"""
+        try:
+            if self.written != self.expected:
+                raise ValueError("Incomplete chunk")
+            if checksum and checksum.strip().lower() != self.sha256.hexdigest():
+                raise ValueError("Chunk checksum mismatch")
+            os.fsync(self.fd)
+        finally:
+            self.abort()
+        self.sessions.mark_received(self.session, self.index)
+        METRICS.add('upload_bytes_total', self.written)
+        METRICS.add('upload_seconds_total', time.perf_counter() - self.started)
+
+    def abort(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+class AdmissionError(Exception):
+    """A transfer refused by TransferLimits; code is the HTTP status to answer"""
+
+    def __init__(self, code, message, retry_after=None):
+        super().__init__(message)
+        self.code = code
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Byte-rate limiter holding up to burst bytes of credit
+
+    reserve() takes the bytes on credit and returns how long the caller
+    should sleep to pay the debt back, so the lock only covers the
+    arithmetic and transfers sharing a bucket never wait on each other.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst or rate
+        self.tokens = self.burst
+        self.stamp = time.monotonic()
+        self.throttled = 0.0
+        self.lock = threading.Lock()
+
+    def reserve(self, amount):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate) - amount
+            self.stamp = now
+            if self.tokens >= 0:
+                return 0
+            delay = -self.tokens / self.rate
+            self.throttled += delay
+            return delay
+
+
+class TransferLimits:
+    """Admission control and per-client rate shaping for uploads and downloads
+
+    Uploads are refused before their body is read when they are larger than
+    max_upload_size (413) or would leave less than min_free_space on disk,
+    counting what uploads in flight have yet to write (507). A client that
+    already has max_per_client transfers running gets 429. Each client has
+    one token bucket per direction, shared by all of its transfers. Clients
+    are told apart by address (see FileServerMixin.client_ip), and the state
+    is per process.
+    """
+
+    IDLE_TTL = 300
+    SLICE = 256 * 1024
+
+    def __init__(self, directory, max_upload_size=None, min_free_space=0, max_per_client=None,
+                 upload_rate=None, download_rate=None):
+        self.directory = directory
+        self.max_upload_size = max_upload_size
+        self.min_free_space = min_free_space
+        self.max_per_client = max_per_client
+        self.rates = {'upload': upload_rate, 'download': download_rate}
+        self.clients = {}
+        self.reserved = 0
+        self.pruned = time.monotonic()
+        self.lock = threading.Lock()
+
+    def refuse(self, code, message, retry_after=None):
+        METRICS.add('rejected_transfers_total', 1, (('code', str(code)),))
+        return AdmissionError(code, message, retry_after)
+
+    def free_space(self):
+        """Bytes available to this process on the served filesystem, or None if unknown"""
+        try:
+            st = os.statvfs(self.directory)
+        except (AttributeError, OSError):
+            return None
+        return st.f_bavail * st.f_frsize
+
+    def check_upload(self, length):
+        """Raise AdmissionError unless an upload of length bytes fits the limits and the disk"""
+        if self.max_upload_size is not None and length > self.max_upload_size:
+            raise self.refuse(413, f"Upload of {length} bytes exceeds the "
+                                   f"{self.max_upload_size}-byte limit")
+        free = self.free_space()
+        if free is not None and length > free - self.min_free_space - self.reserved:
+            raise self.refuse(507, "Not enough free disk space for this upload")
+
+    def client(self, address):
+        """Per-client state, created on first use; called with the lock held"""
+        state = self.clients.get(address)
+        if state is not None:
+            return state
+        now = time.monotonic()
+        if now - self.pruned > self.IDLE_TTL:
+            self.pruned = now
+            for key in [key for key, s in self.clients.items()
+                        if not s['upload'] and not s['download'] and now - s['seen'] > self.IDLE_TTL]:
+                del self.clients[key]
+        state = self.clients[address] = {
+            'upload': 0,
+            'download': 0,
+            'buckets': {d: TokenBucket(rate) for d, rate in self.rates.items() if rate},
+            'seen': now,
+        }
+        return state
+
+    def admit(self, address, direction, length=0):
+        """Start an 'upload' of length bytes or a 'download'; raise AdmissionError if refused"""
+        with self.lock:
+            if direction == 'upload':
+                self.check_upload(length)
+            state = self.client(address)
+            if self.max_per_client and state['upload'] + state['download'] >= self.max_per_client:
+                raise self.refuse(429, f"Too many concurrent transfers (limit {self.max_per_client})",
+                                  retry_after=1)
+            state[direction] += 1
+            state['seen'] = time.monotonic()
+            if direction == 'upload':
+                self.reserved += length
+        return Transfer(self, state, direction, length if direction == 'upload' else 0)
+
+    def collect_metrics(self):
+        """Transfers in progress for /metrics"""
+        with self.lock:
+            totals = {d: sum(s[d] for s in self.clients.values()) for d in ('upload', 'download')}
+        return [('active_transfers', (('direction', d),), n) for d, n in totals.items()]
+
+    def status(self):
+        """Configured limits and per-client activity for /api/limits"""
+        with self.lock:
+            clients = [{'client': address,
+                        'uploads': s['upload'],
+                        'downloads': s['download'],
+                        'throttled_seconds': {d: round(b.throttled, 3) for d, b in s['buckets'].items()}}
+                       for address, s in self.clients.items()]
+            reserved = self.reserved
+        return {
+            'max_upload_size': self.max_upload_size,
+            'min_free_space': self.min_free_space,
+            'max_transfers_per_client': self.max_per_client,
+            'upload_rate': self.rates['upload'],
+            'download_rate': self.rates['download'],
+            'free_space': self.free_space(),
+            'reserved_bytes': reserved,
+            'clients': clients,
+        }
+
+
+class Transfer:
+    """An admitted transfer; holds its client slot and disk reservation until closed"""
+
+    def __init__(self, limits, state, direction, reserved):
+        self.limits = limits
+        self.state = state
+        self.direction = direction
+        self.reserved = reserved
+        self.bucket = state['buckets'].get(direction)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def slice(self, length):
+        """Bytes to send in one go; shaped transfers go in slices so the rate stays even"""
+        return length if self.bucket is None else min(length, self.limits.SLICE)
+
+    def throttle(self, amount):
+        """Charge amount bytes to the transfer; return the seconds to sleep to keep to the rate"""
+        if self.reserved:
+            # 디스크에 쓴 만큼 예약에서 뺀다
+            done = min(amount, self.reserved)
+            with self.limits.lock:
+                self.limits.reserved -= done
+            self.reserved -= done
+        if self.bucket is None:
+            return 0
+        delay = self.bucket.reserve(amount)
+        if delay:
+            METRICS.add('throttle_seconds_total', delay, (('direction', self.direction),))
+        return delay
+
+    def close(self):
+        if self.state is None:
+            return
+        with self.limits.lock:
+            self.limits.reserved -= self.reserved
+            self.state[self.direction] -= 1
+            self.state['seen'] = time.monotonic()
+        self.reserved = 0
+        self.state = None
+
+
+class ChangeJournal:
+    """Sequence-numbered log of add/modify/delete events behind /api/files?since=
+
+    Only the most recent ``max_events`` are kept; older cursors are
+    answered with a full snapshot. Cursors are ``<epoch>.<seq>`` where the
+    epoch is random per journal, so cursors from before a restart (whose
+    changes were never recorded) also fall back to a snapshot.
+    """
+
+    def __init__(self, max_events=10000):
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+        self.epoch = os.urandom(4).hex()
+        self.seq = 0
+        self.events = deque(maxlen=max_events)
+        # 이름별 마지막 상태 (op, digest): watcher가 이미 기록된 변경을 건너뛰는 데 사용
+        self.latest = {}
+        self.waiters = []
+
+    @property
+    def value(self):
+        return self.seq
+
+    @property
+    def cursor(self):
+        return f"{self.epoch}.{self.seq}"
+
+    def record(self, op, name, digest=None):
+        """Append an event and return its sequence number"""
+        with self.lock:
+            self._add(self.seq + 1, op, name, digest)
+            return self.seq
+
+    def refresh(self):
+        """Pick up events recorded elsewhere (only SharedChangeJournal has any)"""
+
+    def _add(self, seq, op, name, digest):
+        """Append an event and wake everyone waiting for one; caller holds the lock"""
+        self.seq = seq
+        self.events.append({'seq': seq, 'op': op, 'name': name,
+                            'hash': digest[:16] if digest else None})
+        self.latest[name] = (op, digest)
+        self.changed.notify_all()
+        for loop, future in self.waiters:
+            loop.call_soon_threadsafe(self._wake, future)
+        self.waiters = []
+
+    @staticmethod
+    def _wake(future):
+        if not future.done():
+            future.set_result(None)
+
+    def wait(self, seq, timeout):
+        """Block until an event newer than seq is recorded or timeout passes"""
+        with self.changed:
+            self.changed.wait_for(lambda: self.seq != seq, timeout)
+
+    async def wait_async(self, seq, timeout):
+        """Like wait() for the asyncio engine, without holding an executor thread"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self.lock:
+            if self.seq != seq:
+                return
+            self.waiters.append((loop, future))
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self.lock:
+                if (loop, future) in self.waiters:
+                    self.waiters.remove((loop, future))
+
+    def since(self, cursor):
+        """Return (events after cursor, new cursor), or (None, cursor) if a snapshot is needed"""
+        with self.lock:
+            current = f"{self.epoch}.{self.seq}"
+            epoch, _, seq = (cursor or '').partition('.')
+            try:
+                seq = int(seq)
+            except ValueError:
+                return None, current
+            if epoch != self.epoch or seq > self.seq:
+                return None, current
+            floor = self.events[0]['seq'] - 1 if self.events else self.seq
+            if seq < floor:
+                return None, current
+            return [e for e in self.events if e['seq'] > seq], current
+
+
+class FileLock:
+    """Exclusive lock shared by threads and server processes, backed by flock(2)
+
+    Every acquisition opens its own descriptor, and flock locks belong to
+    the open file, so threads of one process exclude each other as well.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.fd = None
+
+    def __enter__(self):
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        except BaseException:
+            os.close(fd)
+            raise
+        self.fd = fd
+        return self
+
+    def __exit__(self, *exc):
+        fd, self.fd = self.fd, None
+        os.close(fd)
+        return False
+
+
+class SharedChangeJournal(ChangeJournal):
+    """ChangeJournal kept in step across --processes workers through a log file
+
+    Events are appended to ``STATE_DIR/changes.log`` as JSON lines under a
+    FileLock, after catching up with the lines other processes wrote, so
+    sequence numbers and therefore cursors mean the same in every worker.
+    A follower thread applies the other workers' events, which also wakes
+    /api/events streams. The log is cut back to its last ``max_events``
+    lines once it grows past ``ROTATE_SIZE``.
+    """
+
+    POLL_INTERVAL = 0.2
+    ROTATE_SIZE = 8 * 1024 * 1024
+
+    def __init__(self, path, max_events=10000):
+        super().__init__(max_events)
+        self.path = path
+        self.file_lock = FileLock(path + '.lock')
+        self.read_lock = threading.Lock()
+        self.inode = None
+        self.offset = 0
+        self.refresh()
+
+    @staticmethod
+    def reset(path):
+        """Start a fresh log with a new epoch (supervisor, before forking workers)"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'epoch': os.urandom(4).hex()}) + '\n')
+        os.replace(tmp_path, path)
+
+    def start(self):
+        """Follow events recorded by the other processes in a background thread"""
+        def run():
+            while True:
+                time.sleep(self.POLL_INTERVAL)
+                try:
+                    self.refresh()
+                except (OSError, ValueError) as e:
+                    print(f"Failed to read change log: {e}")
+
+        thread = threading.Thread(target=run, name='change-log-follower', daemon=True)
+        thread.start()
+        return thread
+
+    def refresh(self):
+        with self.read_lock:
+            self._read_new()
+
+    def _read_new(self):
+        """Apply complete lines appended since the last read; caller holds read_lock"""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        if st.st_ino == self.inode and st.st_size == self.offset:
+            return
+        with open(self.path, 'rb') as f:
+            st = os.fstat(f.fileno())
+            if st.st_ino != self.inode:
+                # 새 로그 또는 회전된 로그: 처음부터 읽고 이미 본 seq는 건너뜀
+                self.inode = st.st_ino
+                self.offset = 0
+            f.seek(self.offset)
+            data = f.read()
+        complete = data.rfind(b'\n') + 1
+        self.offset += complete
+        for line in data[:complete].splitlines():
+            event = json.loads(line)
+            if 'epoch' in event:
+                with self.lock:
+                    self.epoch = event['epoch']
+                continue
+            with self.lock:
+                if event['seq'] <= self.seq:
+                    continue
+                if event['seq'] > self.seq + 1:
+                    # 회전으로 놓친 이벤트가 있으면 이전 커서는 스냅샷으로 대체
+                    self.events.clear()
+                self._add(event['seq'], event['op'], event['name'], event['digest'])
+
+    def record(self, op, name, digest=None):
+        with self.file_lock, self.read_lock:
+            self._read_new()
+            # 다른 프로세스(주로 디렉터리 감시자)가 이미 같은 변경을 기록했으면 생략
+            if self.latest.get(name) == (op, digest):
+                return self.seq
+            seq = self.seq + 1
+            line = (json.dumps({'seq': seq, 'op': op, 'name': name, 'digest': digest}) + '\n').encode()
+            with open(self.path, 'ab') as f:
+                f.write(line)
+            self.offset += len(line)
+            with self.lock:
+                self._add(seq, op, name, digest)
+            if self.offset > self.ROTATE_SIZE:
+                self._rotate()
+            return seq
+
+    def _rotate(self):
+        """Rewrite the log as its header plus the newest max_events lines; caller holds both locks"""
+        with open(self.path, 'rb') as f:
+            lines = f.read().splitlines(keepends=True)
+        kept = lines[:1] + lines[1:][-self.events.maxlen:]
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.writelines(kept)
+        os.replace(tmp_path, self.path)
+        st = os.stat(self.path)
+        self.inode = st.st_ino
+        self.offset = st.st_size
+
+
+class PathLocks:
+    """Per-filename locks so concurrent uploads and deletes of a name serialize"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.locks = {}
+
+    def hold(self, name):
+        """Return a context manager holding the lock for name"""
+        return _PathLock(self, name)
+
+
+class _PathLock:
+    def __init__(self, registry, name):
+        self.registry = registry
+        self.name = name
+
+    def __enter__(self):
+        with self.registry.lock:
+            entry = self.registry.locks.setdefault(self.name, [threading.Lock(), 0])
+            entry[1] += 1
+        entry[0].acquire()
+        return self
+
+    def __exit__(self, *exc):
+        with self.registry.lock:
+            entry = self.registry.locks[self.name]
+            entry[0].release()
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self.registry.locks[self.name]
+        return False
+
+
+class HashIndex:
+    """Persistent SHA-256 index keyed by (inode, size, mtime)
+
+    Entries map a path relative to the served directory to
+    ``[inode, size, mtime_ns, digest]``. A digest is only recomputed when the
+    file's stat signature changes. The index is kept in LRU order and trimmed
+    to ``max_entries``; entries for vanished files are dropped by ``compact``.
+    A reverse map from digest to paths answers "do we already have this
+    content?" without hashing anything.
+    """
+
+    SAVE_INTERVAL = 5.0
+
+    def __init__(self, path, max_entries=100000, shared=False):
+        self.path = path
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.by_digest = {}
+        self.lock = threading.Lock()
+        self.dirty = False
+        self.last_save = 0.0
+        self.hits = 0
+        self.misses = 0
+        # 여러 프로세스가 같은 파일을 쓰면 저장할 때마다 서로의 항목을 병합
+        self.shared = shared
+        self.file_lock = FileLock(path + '.lock') if shared else None
+        self.disk_mtime = None
+        self.load()
+
+    @staticmethod
+    def key(filepath):
+        """Normalize a path to the index key"""
+        return os.path.relpath(os.path.abspath(filepath))
+
+    @staticmethod
+    def signature(st):
+        """Stat signature that invalidates a cached digest"""
+        return [st.st_ino, st.st_size, st.st_mtime_ns]
+
+    def load(self):
+        """Load the index from disk, ignoring a missing or corrupt file"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        with self.lock:
+            for name, entry in data.get('entries', {}).items():
+                if isinstance(entry, list) and len(entry) == 4:
+                    self.entries[name] = entry
+                    self.by_digest.setdefault(entry[3], set()).add(name)
+
+    def save(self, force=False):
+        """Atomically write the index to disk if it changed
+
+        A shared index first merges entries that other processes saved since
+        the last look, and does so even when nothing changed locally.
+        """
+        with self.lock:
+            if not self.dirty and not self.shared:
+                return
+            if not force and time.time() - self.last_save < self.SAVE_INTERVAL:
+                return
+            self.last_save = time.time()
+        if not self.shared:
+            self._write()
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self.file_lock:
+            self.merge()
+            if self._write():
+                self.disk_mtime = os.stat(self.path).st_mtime_ns
+
+    def merge(self):
+        """Add entries another process wrote to the index file since we last read it"""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return
+        if mtime == self.disk_mtime:
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        with self.lock:
+            for name, entry in data.get('entries', {}).items():
+                if name in self.entries or not isinstance(entry, list) or len(entry) != 4:
+                    continue
+                # 병합한 항목은 가장 오래된 쪽에 두어 이 프로세스의 최근 항목이 밀려나지 않게 함
+                self.entries[name] = entry
+                self.entries.move_to_end(name, last=False)
+                self.by_digest.setdefault(entry[3], set()).add(name)
+            while len(self.entries) > self.max_entries:
+                self._remove(next(iter(self.entries)))
+            self.disk_mtime = mtime
+
+    def _write(self):
+        """Write the entries if dirty; return True if the file was written"""
+        with self.lock:
+            if not self.dirty:
+                return False
+            data = json.dumps({'version': 1, 'entries': self.entries})
+            self.dirty = False
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Failed to save hash index: {e}")
+            with self.lock:
+                self.dirty = True
+            return False
+        return True
+
+    def _store(self, key, entry):
+        """Insert an entry as most recently used and trim to max_entries"""
+        self._remove(key)
+        self.entries[key] = entry
+        self.by_digest.setdefault(entry[3], set()).add(key)
+        while len(self.entries) > self.max_entries:
+            self._remove(next(iter(self.entries)))
+        self.dirty = True
+
+    def _remove(self, key):
+        """Drop an entry and its reverse-map link; return whether it existed"""
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return False
+        keys = self.by_digest.get(entry[3])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.by_digest[entry[3]]
+        return True
+
+    def collect_metrics(self):
+        """Cache hit/miss counters for /metrics"""
+        return [('hash_cache_hits_total', (), self.hits), ('hash_cache_misses_total', (), self.misses)]
+
+    def lookup(self, filepath, st=None):
+        """Return the full SHA-256 digest of a file, hashing only on a miss"""
+        if st is None:
+            st = os.stat(filepath)
+        key = self.key(filepath)
+        sig = self.signature(st)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[:3] == sig:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[3]
+            self.misses += 1
+        digest = sha256_file(filepath)
+        # 해시 계산 중 파일이 바뀌었으면 캐시하지 않음
+        if self.signature(os.stat(filepath)) == sig:
+            with self.lock:
+                self._store(key, sig + [digest])
+        return digest
+
+    def put(self, filepath, digest, st=None):
+        """Record a digest computed elsewhere (e.g. while uploading)"""
+        if st is None:
+            st = os.stat(filepath)
+        with self.lock:
+            self._store(self.key(filepath), self.signature(st) + [digest])
+
+    def discard(self, filepath):
+        """Forget a path (e.g. after delete)"""
+        with self.lock:
+            if self._remove(self.key(filepath)):
+                self.dirty = True
+
+    def find(self, digest):
+        """Return a path whose current content has this digest, or None"""
+        key = self._find(digest)
+        if key is None and self.shared:
+            # 다른 프로세스가 방금 받은 내용일 수 있으므로 디스크의 인덱스와 병합 후 재시도
+            with self.file_lock:
+                self.merge()
+            key = self._find(digest)
+        return key
+
+    def _find(self, digest):
+        with self.lock:
+            keys = list(self.by_digest.get(digest, ()))
+        for key in keys:
+            try:
+                sig = self.signature(os.stat(key))
+            except OSError:
+                continue
+            with self.lock:
+                entry = self.entries.get(key)
+            # stat가 바뀐 항목은 내용이 달라졌을 수 있으므로 신뢰하지 않음
+            if entry is not None and entry[:3] == sig and entry[3] == digest:
+                return key
+        return None
+
+    def compact(self):
+        """Drop entries whose file vanished or no longer matches"""
+        with self.lock:
+            items = list(self.entries.items())
+        stale = []
+        for key, entry in items:
+            try:
+                if self.signature(os.stat(key)) != entry[:3]:
+                    stale.append(key)
+            except OSError:
+                stale.append(key)
+        with self.lock:
+            for key in stale:
+                self._remove(key)
+            if stale:
+                self.dirty = True
+        return len(stale)
+
+    def warm_up(self, root):
+        """Compact and hash every file under root in a background thread"""
+        def run():
+            start = time.time()
+            removed = self.compact()
+            hashed = 0
+            for dirpath, dirnames, filenames in os.walk(root):
+                dirnames[:] = [d for d in dirnames if d != STATE_DIR]
+                for name in filenames:
+                    try:
+                        self.lookup(os.path.join(dirpath, name))
+                        hashed += 1
+                    except OSError:
+                        continue
+                self.save()
+            self.save(force=True)
+            print(f"Hash index ready: {hashed} files, {removed} stale entries "
+                  f"removed ({time.time() - start:.1f}s)")
+
+        thread = threading.Thread(target=run, name='hash-index-warm-up', daemon=True)
+        thread.start()
+        return thread
+
+
+class DirectoryWatcher:
+    """Follows changes made to the served directory by other processes
+
+    Uses inotify on Linux and falls back to polling with ``scandir``. Every
+    change to a top-level file refreshes the hash index and is recorded in
+    the change journal, which bumps listing ETags and feeds /api/events.
+    Changes the server made itself are already in the journal and are
+    skipped by comparing against its last recorded state for that name.
+    """
+
+    IN_ATTRIB = 0x4
+    IN_CLOSE_WRITE = 0x8
+    IN_MOVED_FROM = 0x40
+    IN_MOVED_TO = 0x80
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    IN_Q_OVERFLOW = 0x4000
+    IN_ISDIR = 0x40000000
+    EVENT_HEADER = struct.Struct('iIII')
+
+    def __init__(self, directory, hash_index, journal, file_locks, interval=2.0):
+        self.directory = directory
+        self.hash_index = hash_index
+        self.journal = journal
+        self.file_locks = file_locks
+        self.interval = interval
+        self.known = {}
+        self.backend = None
+
+    def scan(self):
+        """Current {name: stat signature} of top-level regular files"""
+        current = {}
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name == STATE_DIR:
+                    continue
+                try:
+                    if entry.is_file():
+                        current[entry.name] = HashIndex.signature(entry.stat())
+                except OSError:
+                    continue
+        return current
+
+    def rescan(self):
+        """Compare the directory against the known state and record differences"""
+        current = self.scan()
+        for name in set(self.known) | set(current):
+            if self.known.get(name) != current.get(name):
+                self.check(name)
+
+    def check(self, name):
+        """Record whatever happened to one top-level name"""
+        if not name or name == STATE_DIR or '/' in name:
+            return
+        filepath = os.path.join(self.directory, name)
+        with self.file_locks.hold(name):
+            try:
+                st = os.stat(filepath)
+                sig = HashIndex.signature(st) if stat.S_ISREG(st.st_mode) else None
+            except OSError:
+                sig = None
+            old = self.known.get(name)
+            if sig == old:
+                return
+            self.journal.refresh()
+            latest = self.journal.latest.get(name)
+            if sig is None:
+                del self.known[name]
+                if latest is None or latest[0] != 'delete':
+                    self.hash_index.discard(filepath)
+                    self.journal.record('delete', name)
+                return
+            self.known[name] = sig
+            try:
+                digest = self.hash_index.lookup(filepath, st)
+            except OSError:
+                return
+            if latest is not None and latest[0] != 'delete' and latest[1] == digest:
+                return
+            existed = old is not None or (latest is not None and latest[0] != 'delete')
+            self.journal.record('modify' if existed else 'add', name, digest)
+        self.hash_index.save()
+
+    def start(self):
+        """Take the initial snapshot and start the inotify or polling thread"""
+        self.known = self.scan()
+        fd = self.inotify_open()
+        if fd is not None:
+            self.backend = 'inotify'
+            target = self.run_inotify
+            args = (fd,)
+        else:
+            self.backend = 'polling'
+            target = self.run_polling
+            args = ()
+        thread = threading.Thread(target=target, args=args, name='directory-watcher', daemon=True)
+        thread.start()
+        return thread
+
+    def inotify_open(self):
+        """inotify fd watching the directory, or None where unavailable"""
+        if not sys.platform.startswith('linux'):
+            return None
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c') or None, use_errno=True)
+            fd = libc.inotify_init1(os.O_CLOEXEC)
+            if fd < 0:
+                return None
+            mask = (self.IN_ATTRIB | self.IN_CLOSE_WRITE | self.IN_MOVED_FROM | self.IN_MOVED_TO
+                    | self.IN_CREATE | self.IN_DELETE)
+            if libc.inotify_add_watch(fd, os.fsencode(self.directory), mask) < 0:
+                os.close(fd)
+                return None
+        except (OSError, AttributeError):
+            return None
+        return fd
+
+    def run_inotify(self, fd):
+        while True:
+            try:
+                data = os.read(fd, 64 * 1024)
+                names = set()
+                overflow = False
+                offset = 0
+                while offset + self.EVENT_HEADER.size <= len(data):
+                    _, mask, _, length = self.EVENT_HEADER.unpack_from(data, offset)
+                    offset += self.EVENT_HEADER.size
+                    raw = data[offset:offset + length].split(b'\0', 1)[0]
+                    offset += length
+                    if mask & self.IN_Q_OVERFLOW:
+                        overflow = True
+                    elif raw and not mask & self.IN_ISDIR:
+                        name = os.fsdecode(raw)
+                        # 새로 만들어진 빈 파일은 쓰기가 끝날 때(CLOSE_WRITE) 처리, 하드링크는 즉시 처리
+                        if mask & self.IN_CREATE and not self.is_hard_link(name):
+                            continue
+                        names.add(name)
+                if overflow:
+                    self.rescan()
+                else:
+                    for name in names:
+                        self.check(name)
+            except Exception as e:
+                print(f"Directory watcher error: {e}")
+                time.sleep(self.interval)
+
+    def is_hard_link(self, name):
+        try:
+            return os.stat(os.path.join(self.directory, name)).st_nlink > 1
+        except OSError:
+            return False
+
+    def run_polling(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.rescan()
+            except Exception as e:
+                print(f"Directory watcher error: {e}")
+
+
+class SearchBlock:
+    """Up to SearchIndex.BLOCK_SIZE files: paths, lowercased names, sizes and mtimes"""
+
+    def __init__(self):
+        self.paths = []
+        self.names = []
+        self.sizes = array.array('q')
+        self.mtimes = array.array('d')
+        self.text = None
+        self.starts = None
+
+    def joined(self):
+        """Names as one string, each between newlines, with where each one starts"""
+        if self.text is None:
+            starts = []
+            pos = 0
+            for name in self.names:
+                starts.append(pos)
+                pos += len(name) + 1
+            self.text = '\n' + '\n'.join(self.names) + '\n'
+            self.starts = starts
+        return self.text, self.starts
+
+    def find(self, pattern):
+        """Slots whose ``\\n``-delimited name contains pattern, once each"""
+        text, starts = self.joined()
+        pos = text.find(pattern)
+        while pos != -1:
+            slot = bisect.bisect_right(starts, pos) - 1
+            yield slot
+            if slot + 1 >= len(starts):
+                break
+            pos = text.find(pattern, starts[slot + 1])
+
+
+class SearchIndex:
+    """In-memory index of every file under the served directory, for /api/search
+
+    Lowercased names are kept in blocks of BLOCK_SIZE, and each block joins
+    them into one newline-delimited string, so a substring, prefix or
+    extension lookup is a ``str.find`` over a few large strings rather than
+    a Python loop per file. Sizes and mtimes sit in parallel arrays. A
+    removed file leaves an empty slot for the next new one, and a block's
+    string is rebuilt on the first search after it changed.
+
+    The tree is walked once in the background; inotify watches on every
+    directory then keep the index current, with a full rescan every
+    RESCAN_INTERVAL seconds where inotify (or a watch) is unavailable.
+    """
+
+    BLOCK_SIZE = 4096
+    RESCAN_INTERVAL = 60.0
+    SORTS = ('name', 'path', 'size', 'mtime')
+    IN_IGNORED = 0x8000
+    IN_DELETE_SELF = 0x400
+    WATCH_MASK = (DirectoryWatcher.IN_ATTRIB | DirectoryWatcher.IN_CLOSE_WRITE
+                  | DirectoryWatcher.IN_MOVED_FROM | DirectoryWatcher.IN_MOVED_TO
+                  | DirectoryWatcher.IN_CREATE | DirectoryWatcher.IN_DELETE)
+
+    def __init__(self, root):
+        self.root = root
+        self.lock = threading.Lock()
+        self.slots = {}
+        self.blocks = []
+        self.free = []
+        self.ready = False
+        self.backend = None
+        self.fd = None
+        self.libc = None
+        self.watches = {}
+        self.polling = False
+
+    def __len__(self):
+        return len(self.slots)
+
+    @staticmethod
+    def key(name):
+        return name.lower().replace('\n', ' ')
+
+    def put(self, relpath, size, mtime):
+        """Add or update one file"""
+        with self.lock:
+            index = self.slots.get(relpath)
+            if index is None:
+                if self.free:
+                    index = self.free.pop()
+                else:
+                    if not self.blocks or len(self.blocks[-1].paths) >= self.BLOCK_SIZE:
+                        self.blocks.append(SearchBlock())
+                    block = self.blocks[-1]
+                    index = (len(self.blocks) - 1) * self.BLOCK_SIZE + len(block.paths)
+                    block.paths.append(None)
+                    block.names.append('')
+                    block.sizes.append(0)
+                    block.mtimes.append(0.0)
+                block = self.blocks[index // self.BLOCK_SIZE]
+                slot = index % self.BLOCK_SIZE
+                block.paths[slot] = relpath
+                block.names[slot] = self.key(posixpath.basename(relpath))
+                block.text = None
+                self.slots[relpath] = index
+            block = self.blocks[index // self.BLOCK_SIZE]
+            block.sizes[index % self.BLOCK_SIZE] = size
+            block.mtimes[index % self.BLOCK_SIZE] = mtime
+
+    def remove(self, relpath):
+        """Forget one file"""
+        with self.lock:
+            self._remove(relpath)
+
+    def _remove(self, relpath):
+        index = self.slots.pop(relpath, None)
+        if index is None:
+            return
+        block = self.blocks[index // self.BLOCK_SIZE]
+        slot = index % self.BLOCK_SIZE
+        block.paths[slot] = None
+        # 빈 이름은 어떤 검색어와도 맞지 않음
+        block.names[slot] = ''
+        block.text = None
+        self.free.append(index)
+
+    def remove_tree(self, reldir):
+        """Forget every file under a directory that went away"""
+        prefix = reldir + '/'
+        with self.lock:
+            for relpath in [p for p in self.slots if p.startswith(prefix)]:
+                self._remove(relpath)
+
+    def refresh(self, relpath):
+        """Re-stat one path and update the index to match"""
+        try:
+            st = os.stat(os.path.join(self.root, relpath))
+        except OSError:
+            self.remove(relpath)
+            return
+        if stat.S_ISREG(st.st_mode):
+            self.put(relpath, st.st_size, st.st_mtime)
+        else:
+            self.remove(relpath)
+
+    def scan(self, reldir=''):
+        """Index (and watch) everything under reldir; return the paths seen"""
+        seen = set()
+        pending = [reldir]
+        while pending:
+            current = pending.pop()
+            self.watch(current)
+            try:
+                with os.scandir(os.path.join(self.root, current)) as it:
+                    for entry in it:
+                        if not current and entry.name == STATE_DIR:
+                            continue
+                        relpath = posixpath.join(current, entry.name) if current else entry.name
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                pending.append(relpath)
+                            elif entry.is_file():
+                                st = entry.stat()
+                                self.put(relpath, st.st_size, st.st_mtime)
+                                seen.add(relpath)
+                        except OSError:
+                            continue
+            except OSError:
+                continue
+        return seen
+
+    def rescan(self):
+        """Walk the whole tree and drop files that are gone"""
+        seen = self.scan()
+        with self.lock:
+            for relpath in [p for p in self.slots if p not in seen]:
+                self._remove(relpath)
+
+    def start(self, verbose=True):
+        """Build the index and keep it current from background threads"""
+        self.fd = self.inotify_open()
+        self.backend = 'inotify' if self.fd is not None else 'polling'
+
+        def build():
+            started = time.time()
+            self.scan()
+            self.ready = True
+            if verbose:
+                print(f"Search index ready: {len(self)} files ({time.time() - started:.1f}s, {self.backend})")
+            if self.fd is None:
+                self.start_polling()
+
+        if self.fd is not None:
+            threading.Thread(target=self.run_inotify, name='search-index-watcher', daemon=True).start()
+        threading.Thread(target=build, name='search-index-build', daemon=True).start()
+
+    def start_polling(self):
+        if self.polling:
+            return
+        self.polling = True
+
+        def run():
+            while True:
+                time.sleep(self.RESCAN_INTERVAL)
+                try:
+                    self.rescan()
+                except Exception as e:
+                    print(f"Search index error: {e}")
+
+        threading.Thread(target=run, name='search-index-rescan', daemon=True).start()
+
+    def inotify_open(self):
+        if not sys.platform.startswith('linux'):
+            return None
+        try:
+            self.libc = ctypes.CDLL(ctypes.util.find_library('c') or None, use_errno=True)
+            fd = self.libc.inotify_init1(os.O_CLOEXEC)
+        except (OSError, AttributeError):
+            return None
+        return fd if fd >= 0 else None
+
+    def watch(self, reldir):
+        """Add an inotify watch for a directory; fall back to rescans if that fails"""
+        if self.fd is None:
+            return
+        path = os.path.join(self.root, reldir) if reldir else self.root
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), self.WATCH_MASK)
+        if wd < 0:
+            if not self.polling:
+                print(f"Search index: cannot watch {path} ({os.strerror(ctypes.get_errno())}), "
+                      f"rescanning every {self.RESCAN_INTERVAL:g}s")
+                self.start_polling()
+            return
+        # 같은 디렉터리를 다시 감시하면(이동 등) 기존 wd가 돌아오므로 경로만 갱신
+        self.watches[wd] = reldir
+
+    def unwatch(self, reldir):
+        prefix = reldir + '/'
+        for wd, path in list(self.watches.items()):
+            if path == reldir or path.startswith(prefix):
+                self.libc.inotify_rm_watch(self.fd, wd)
+                self.watches.pop(wd, None)
+
+    def run_inotify(self):
+        header = DirectoryWatcher.EVENT_HEADER
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+                offset = 0
+                while offset + header.size <= len(data):
+                    wd, mask, _, length = header.unpack_from(data, offset)
+                    offset += header.size
+                    raw = data[offset:offset + length].split(b'\0', 1)[0]
+                    offset += length
+                    if mask & DirectoryWatcher.IN_Q_OVERFLOW:
+                        self.rescan()
+                        continue
+                    if mask & self.IN_IGNORED:
+                        self.watches.pop(wd, None)
+                        continue
+                    reldir = self.watches.get(wd)
+                    if reldir is None or not raw:
+                        continue
+                    name = os.fsdecode(raw)
+                    if not reldir and name == STATE_DIR:
+                        continue
+                    relpath = posixpath.join(reldir, name) if reldir else name
+                    if not mask & DirectoryWatcher.IN_ISDIR:
+                        self.refresh(relpath)
+                    elif mask & (DirectoryWatcher.IN_CREATE | DirectoryWatcher.IN_MOVED_TO):
+                        self.scan(relpath)
+                    elif mask & (DirectoryWatcher.IN_DELETE | DirectoryWatcher.IN_MOVED_FROM):
+                        self.unwatch(relpath)
+                        self.remove_tree(relpath)
+            except Exception as e:
+                print(f"Search index watcher error: {e}")
+                time.sleep(1)
+
+    def search(self, query='', prefix=False, exts=(), min_size=None, max_size=None,
+               after=None, before=None, under='', sort='name', limit=100):
+        """Return (total, [(path, size, mtime)]) for files matching every given filter
+
+        query matches anywhere in the file name (or at its start with
+        prefix), case-insensitively; exts are extensions without the dot;
+        after/before bound the mtime; under limits the search to a subtree.
+        """
+        query = self.key(query)
+        exts = tuple('.' + self.key(ext) for ext in exts)
+        if query:
+            patterns = ['\n' + query if prefix else query]
+        else:
+            # 검색어 없이 확장자만 있으면 이름 끝('.ext\n')을 찾음
+            patterns = [ext + '\n' for ext in exts]
+        under = under.strip('/')
+        under_prefix = under + '/' if under else ''
+        field = sort.lstrip('-')
+        total = 0
+
+        def candidates():
+            nonlocal total
+            for block in self.blocks:
+                if len(patterns) > 1:
+                    slots = set()
+                    for pattern in patterns:
+                        slots.update(block.find(pattern))
+                elif patterns:
+                    slots = block.find(patterns[0])
+                else:
+                    slots = range(len(block.paths))
+                paths, names, sizes, mtimes = block.paths, block.names, block.sizes, block.mtimes
+                for slot in slots:
+                    path = paths[slot]
+                    if path is None:
+                        continue
+                    if query and exts and not names[slot].endswith(exts):
+                        continue
+                    size = sizes[slot]
+                    mtime = mtimes[slot]
+                    if ((min_size is not None and size < min_size)
+                            or (max_size is not None and size > max_size)
+                            or (after is not None and mtime < after)
+                            or (before is not None and mtime > before)
+                            or (under_prefix and not path.startswith(under_prefix))):
+                        continue
+                    total += 1
+                    if field == 'name':
+                        yield (names[slot], path), path, size, mtime
+                    elif field == 'path':
+                        yield path, path, size, mtime
+                    else:
+                        yield size if field == 'size' else mtime, path, size, mtime
+
+        # 일치 항목 전체를 모으지 않고 상위 limit개만 힙으로 유지
+        pick = heapq.nlargest if sort.startswith('-') else heapq.nsmallest
+        with self.lock:
+            results = pick(limit, candidates(), key=lambda match: match[0])
+        return total, [match[1:] for match in results]
+
+
+class EventBroadcaster:
+    """Pushes change-journal events to Server-Sent Events clients from one thread
+
+    The threaded engines hand an /api/events socket over after sending the
+    response headers, so an open page does not pin a worker thread. Sockets
+    are non-blocking and each client has its own backlog, so a stalled
+    client never holds up the others; it is dropped once its backlog grows
+    past MAX_BACKLOG or stops draining for STALL_TIMEOUT seconds.
+    """
+
+    HEARTBEAT = 15.0
+    MAX_BACKLOG = 256 * 1024
+    STALL_TIMEOUT = 30.0
+    POLL_INTERVAL = 0.1
+
+    def __init__(self, journal, render):
+        self.journal = journal
+        self.render = render
+        self.lock = threading.Lock()
+        self.clients = []
+        self.thread = None
+
+    def add(self, sock, cursor):
+        """Start pushing events after cursor to an already-answered socket"""
+        sock.setblocking(False)
+        with self.lock:
+            # [소켓, 커서, 못 보낸 데이터, 마지막으로 전송이 진행된 시각]
+            self.clients.append([sock, cursor, bytearray(), time.monotonic()])
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name='event-broadcaster', daemon=True)
+                self.thread.start()
+
+    def run(self):
+        seq = self.journal.value
+        beat = time.monotonic() + self.HEARTBEAT
+        while True:
+            with self.lock:
+                clients = list(self.clients)
+            backlog = [client for client in clients if client[2]]
+            if backlog:
+                # 밀린 클라이언트가 있으면 쓰기 가능해질 때까지만 짧게 기다리고 저널은 다시 확인
+                self.wait_writable(backlog, self.POLL_INTERVAL)
+            else:
+                self.journal.wait(seq, max(0.0, beat - time.monotonic()))
+            now = time.monotonic()
+            if self.journal.value != seq or now >= beat:
+                seq = self.journal.value
+                beat = now + self.HEARTBEAT
+                for client in clients:
+                    payload, client[1] = self.render(client[1])
+                    if not client[2]:
+                        client[3] = now
+                    client[2] += payload or b': ping\n\n'
+            for client in clients:
+                if client[2]:
+                    self.flush(client, now)
+
+    @staticmethod
+    def wait_writable(clients, timeout):
+        """Sleep until one of the clients' sockets can take more data, or timeout"""
+        if hasattr(select, 'poll'):
+            poller = select.poll()
+            for client in clients:
+                poller.register(client[0], select.POLLOUT)
+            poller.poll(timeout * 1000)
+        else:
+            select.select([], [client[0] for client in clients], [], timeout)
+
+    def flush(self, client, now):
+        """Send as much backlog as the socket takes without blocking"""
+        sock, _, backlog, _ = client
+        try:
+            sent = sock.send(backlog)
+        except (BlockingIOError, InterruptedError):
+            sent = 0
+        except OSError:
+            self.drop(client)
+            return
+        if sent:
+            del backlog[:sent]
+            client[3] = now
+        if len(backlog) > self.MAX_BACKLOG or (backlog and now - client[3] > self.STALL_TIMEOUT):
+            self.drop(client)
+
+    def drop(self, client):
+        with self.lock:
+            if client in self.clients:
+                self.clients.remove(client)
+        try:
+            client[0].shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        client[0].close()
+
+
+class StaticAssets:
+    """Versioned, precompressed UI assets served under /static/
+
+    Each asset is addressed by a content hash (``/static/app.<hash>.js``) so
+    browsers may cache it forever. gzip and, when the ``brotli`` module is
+    installed, brotli variants are built once at startup.
+    """
+
+    MAX_AGE = 365 * 24 * 3600
+
+    def __init__(self):
+        self.assets = {}
+        self.urls = {}
+
+    def add(self, name, content, content_type):
+        """Register an asset and return its versioned URL"""
+        data = content.encode('utf-8')
+        version = hashlib.sha256(data).hexdigest()[:12]
+        stem, ext = os.path.splitext(name)
+        url = f'/static/{stem}.{version}{ext}'
+        variants = {'identity': data, 'gzip': gzip.compress(data, 9, mtime=0)}
+        if brotli is not None:
+            variants['br'] = brotli.compress(data, quality=11)
+        self.assets[url] = (content_type, version, variants)
+        self.urls[name] = url
+        return url
+
+    def url(self, name):
+        return self.urls[name]
+
+    def get(self, path):
+        """(content_type, version, variants) for a request path, or None"""
+        return self.assets.get(path.split('?', 1)[0])
+
+
+UI_STYLE = '''\
+* { margin: 0; padding: 0; box-sizing: border-box; -webkit-tap-highlight-color: transparent; }
+body { font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', sans-serif; background: #f5f5f5; padding: 10px; }
+.container { max-width: 900px; margin: 0 auto; background: white; border-radius: 8px; box-shadow: 0 2px 8px rgba(0,0,0,0.1); }
+.header { padding: 16px 20px; border-bottom: 1px solid #e0e0e0; }
+h1 { font-size: 20px; color: #333; }
+
+.upload-section { padding: 16px; background: #fafafa; border-bottom: 1px solid #e0e0e0; }
+.upload-zone { border: 2px dashed #4CAF50; border-radius: 8px; padding: 24px; text-align: center; background: white; transition: all 0.3s; cursor: pointer; }
+.upload-zone.dragover { background: #e8f5e9; border-color: #2e7d32; }
+.upload-zone:hover { background: #f1f8f4; }
+.file-input-label { display: block; cursor: pointer; }
+.file-input-label .icon { font-size: 48px; margin-bottom: 12px; }
+.file-input-label .text { color: #666; font-size: 14px; }
+.file-input-label .sub { color: #999; font-size: 12px; margin-top: 4px; }
+input[type="file"] { display: none; }
+
+.selected-file { margin-top: 12px; padding: 12px; background: #e8f5e9; border-radius: 4px; display: none; align-items: center; gap: 10px; }
+.selected-file.show { display: flex; }
+.selected-file-name { flex: 1; font-size: 14px; color: #2e7d32; word-break: break-all; }
+.upload-btn { padding: 8px 20px; background: #4CAF50; color: white; border: none; border-radius: 4px; cursor: pointer; font-size: 14px; font-weight: 500; }
+.upload-btn:active { transform: scale(0.98); }
+.cancel-btn { padding: 8px 16px; background: #f44336; color: white; border: none; border-radius: 4px; cursor: pointer; font-size: 14px; }
+
+.files-section { padding: 12px; }
+.file-list { list-style: none; }
+.file-item { display: flex; align-items: center; padding: 12px; border-radius: 6px; margin-bottom: 4px; transition: all 0.3s; cursor: pointer; position: relative; }
+.file-item:active { background: #e0e0e0; }
+.file-item:hover { background: #f5f5f5; }
+.file-item.recent { background: #e8f5e9; border: 1px solid #4CAF50; animation: highlight 2s ease-in-out; }
+.file-item.recent:hover { background: #c8e6c9; }
+@keyframes highlight {
+    0% { background: #a5d6a7; transform: scale(1.02); }
+    50% { background: #c8e6c9; }
+    100% { background: #e8f5e9; transform: scale(1); }
+}
+.new-badge { display: inline-block; margin-left: 8px; padding: 2px 6px; background: #4CAF50; color: white; border-radius: 3px; font-size: 10px; font-weight: bold; animation: pulse 1.5s infinite; }
+@keyframes pulse {
+    0% { opacity: 1; }
+    50% { opacity: 0.7; }
+    100% { opacity: 1; }
+}
+.file-icon { margin-right: 12px; font-size: 24px; min-width: 24px; }
+.file-info { flex: 1; min-width: 0; }
+.file-link { text-decoration: none; color: #333; display: block; font-size: 14px; white-space: nowrap; overflow: hidden; text-overflow: ellipsis; }
+.file-meta { display: flex; gap: 12px; margin-top: 2px; flex-wrap: wrap; }
+.file-size { color: #888; font-size: 12px; }
+.file-time { color: #999; font-size: 12px; }
+.file-hash { color: #6a9fb5; font-size: 11px; font-family: monospace; cursor: help; }
+.uploading-overlay { position: fixed; top: 0; left: 0; right: 0; bottom: 0; background: rgba(0,0,0,0.7); display: none; align-items: center; justify-content: center; z-index: 1000; }
+.uploading-overlay.show { display: flex; }
+.uploading-box { background: white; padding: 30px; border-radius: 8px; text-align: center; min-width: 280px; }
+.spinner { border: 3px solid #f3f3f3; border-top: 3px solid #4CAF50; border-radius: 50%; width: 40px; height: 40px; animation: spin 1s linear infinite; margin: 0 auto 20px; }
+.upload-progress { margin-top: 16px; }
+.progress-bar { width: 100%; height: 8px; background: #e0e0e0; border-radius: 4px; overflow: hidden; }
+.progress-fill { height: 100%; background: #4CAF50; transition: width 0.3s; border-radius: 4px; }
+.progress-text { margin-top: 8px; font-size: 14px; color: #666; }
+.upload-filename { margin-bottom: 16px; font-size: 14px; color: #333; font-weight: 500; max-width: 250px; overflow: hidden; text-overflow: ellipsis; white-space: nowrap; }
+@keyframes spin { 0% { transform: rotate(0deg); } 100% { transform: rotate(360deg); } }
+.delete-btn { padding: 4px 8px; background: #f44336; color: white; border: none; border-radius: 4px; cursor: pointer; font-size: 12px; margin-left: 8px; opacity: 0.9; }
+.delete-btn:hover { opacity: 1; }
+.delete-btn:active { transform: scale(0.95); }
+.dir .file-link { color: #2196F3; font-weight: 500; }
+.archive-bar { display: flex; gap: 12px; align-items: center; margin-top: 8px; font-size: 13px; }
+.archive-bar a { color: #2196F3; text-decoration: none; }
+.archive-bar button { padding: 4px 10px; background: #2196F3; color: white; border: none; border-radius: 4px; cursor: pointer; font-size: 13px; }
+.archive-bar button.danger { background: #f44336; }
+.archive-link { padding: 4px 8px; color: #2196F3; font-size: 12px; text-decoration: none; border: 1px solid #2196F3; border-radius: 4px; margin-left: 8px; }
+.select-box { margin-right: 10px; width: 16px; height: 16px; flex-shrink: 0; }
+.empty { text-align: center; padding: 40px; color: #999; }
+.pager { display: flex; justify-content: center; gap: 16px; padding: 12px; font-size: 14px; color: #666; }
+.pager a { color: #2196F3; text-decoration: none; }
+.search-input { width: 100%; margin-top: 10px; padding: 8px 12px; border: 1px solid #ddd; border-radius: 6px; font-size: 14px; }
+.search-panel { padding: 12px; }
+.search-summary { padding: 0 4px 8px; font-size: 13px; color: #666; }
+.search-results { list-style: none; }
+.file-folder { color: #2196F3; font-size: 12px; }
+
+@media (max-width: 600px) {
+    body { padding: 0; background: white; }
+    .container { border-radius: 0; box-shadow: none; }
+    .header { padding: 14px 16px; position: sticky; top: 0; background: white; z-index: 10; }
+    h1 { font-size: 18px; }
+    .upload-section { padding: 12px; }
+    .file-item { padding: 14px 12px; }
+    .file-icon { font-size: 20px; }
+}
+
+@media (min-width: 601px) {
+    .upload-zone { padding: 32px; }
+    .file-input-label .icon { font-size: 64px; }
+    .file-input-label .text { font-size: 16px; }
+}
+'''
+
+
+UI_SCRIPT = '''\
+function dragOverHandler(ev) {
+    ev.preventDefault();
+    ev.currentTarget.classList.add('dragover');
+}
+function dragLeaveHandler(ev) {
+    ev.currentTarget.classList.remove('dragover');
+}
+function dropHandler(ev) {
+    ev.preventDefault();
+    ev.currentTarget.classList.remove('dragover');
+    const files = ev.dataTransfer.files;
+    if (files.length > 0) {
+        document.getElementById('fileInput').files = files;
+        fileSelected(document.getElementById('fileInput'));
+    }
+}
+function fileSelected(input) {
+    if (input.files.length > 0) {
+        uploadFiles();
+    }
+}
+function cancelFile() {
+    document.getElementById('fileInput').value = '';
+    document.getElementById('selectedFile').classList.remove('show');
+}
+
+let uploadQueue = [];
+let currentUploadIndex = 0;
+
+// 큰 파일은 재개 가능한 청크 업로드 사용
+const CHUNKED_UPLOAD_THRESHOLD = 8 * 1024 * 1024;
+const PARALLEL_CHUNKS = 3;
+const CHUNK_RETRIES = 5;
+// 작은 파일은 여러 개를 한 요청으로 묶어 전송
+const BATCH_MAX_FILES = 100;
+const BATCH_MAX_BYTES = 32 * 1024 * 1024;
+
+let uploadRunning = false;
+let hashingDone = true;
+
+async function uploadFiles() {
+    const fileInput = document.getElementById('fileInput');
+    const selected = Array.from(fileInput.files);
+    uploadQueue = [];
+    currentUploadIndex = 0;
+
+    if (selected.length === 0) return;
+
+    // 즉시 업로드 준비 중 표시
+    showUploadPreparing(selected.length);
+
+    // 서버의 파일 해시 목록 가져오기
+    const response = await fetch('/api/files');
+    const serverFiles = await response.json();
+
+    // 해시는 워커 풀에서 병렬로 계산하고, 끝난 파일부터 바로 업로드 시작
+    hashingDone = false;
+    let linkedCount = 0;
+    let hashedCount = 0;
+    let hashedBytes = 0;
+    const totalBytes = selected.reduce((sum, file) => sum + file.size, 0);
+    async function prepare(file) {
+        let fileDone = 0;
+        const fileHash = await calculateFileHash(file, done => {
+            hashedBytes += done - fileDone;
+            fileDone = done;
+            updateHashProgress(hashedCount, selected.length, hashedBytes, totalBytes);
+        });
+        hashedBytes += file.size - fileDone;
+        hashedCount++;
+        updateHashProgress(hashedCount, selected.length, hashedBytes, totalBytes);
+
+        // 같은 이름의 파일이 있는지 확인
+        if (serverFiles[file.name]) {
+            if (serverFiles[file.name] === fileHash.substring(0, 16)) {
+                // 동일한 파일이면 건너뛰기
+                console.log(`스킵: ${file.name} (동일한 파일 존재)`);
+                return;
+            }
+            // 다른 해시면 파일명에 postfix 추가
+            const nameParts = file.name.split('.');
+            const ext = nameParts.length > 1 ? '.' + nameParts.pop() : '';
+            const baseName = nameParts.join('.');
+            const timestamp = new Date().getTime();
+            const newName = `${baseName}_${timestamp}${ext}`;
+            if (await precheckUpload(newName, fileHash)) {
+                linkedCount++;
+                return;
+            }
+            enqueueUpload(new File([file], newName, { type: file.type }));
+        } else if (await precheckUpload(file.name, fileHash)) {
+            linkedCount++;
+        } else {
+            enqueueUpload(file);
+        }
+    }
+    await Promise.all(selected.map(file => prepare(file).catch(e => {
+        console.error(`해시 계산 실패: ${file.name}`, e);
+    })));
+    hashingDone = true;
+
+    // 업로드가 아직 진행 중이면 마지막 업로드가 끝날 때 완료 처리됨
+    if (uploadRunning) return;
+
+    if (uploadQueue.length === 0 && linkedCount === 0) {
+        alert('모든 파일이 이미 존재합니다.');
+        // 업로드 오버레이 제거
+        const overlay = document.getElementById('uploadOverlay');
+        if (overlay) {
+            overlay.remove();
+        }
+        window.onbeforeunload = null; // 페이지 이탈 방지 해제
+        cancelFile();
+        return;
+    }
+
+    // 서버에 있던 내용으로 모두 생성되었거나 업로드가 이미 끝남
+    window.onbeforeunload = null;
+    finishUpload();
+}
+
+function enqueueUpload(file) {
+    uploadQueue.push(file);
+    if (!uploadRunning) {
+        uploadRunning = true;
+        uploadNextFile();
+    }
+}
+
+function finishUpload() {
+    if (!liveUpdates) {
+        window.location.href = '/';
+        return;
+    }
+    // 새 파일은 이벤트로 목록에 반영됨
+    const overlay = document.getElementById('uploadOverlay');
+    if (overlay) overlay.remove();
+    cancelFile();
+}
+
+async function uploadNextFile() {
+    if (currentUploadIndex >= uploadQueue.length) {
+        uploadRunning = false;
+        // 해시 계산 중인 파일이 남았으면 큐에 추가될 때 다시 시작
+        if (!hashingDone) {
+            showUploadPreparing(0);
+            return;
+        }
+        // 모든 파일 업로드 완료
+        window.onbeforeunload = null; // 페이지 이탈 방지 해제
+        finishUpload();
+        return;
+    }
+
+    const file = uploadQueue[currentUploadIndex];
+    if (file.size > CHUNKED_UPLOAD_THRESHOLD) {
+        submitChunkedUpload(file, currentUploadIndex, uploadQueue.length);
+        return;
+    }
+    const batch = [];
+    let batchBytes = 0;
+    for (let i = currentUploadIndex; i < uploadQueue.length && batch.length < BATCH_MAX_FILES; i++) {
+        const next = uploadQueue[i];
+        if (next.size > CHUNKED_UPLOAD_THRESHOLD) break;
+        if (batch.length && batchBytes + next.size > BATCH_MAX_BYTES) break;
+        batch.push(next);
+        batchBytes += next.size;
+    }
+    submitUploadForm(batch, currentUploadIndex, uploadQueue.length);
+}
+
+function formatBytes(bytes, decimals = 1) {
+    if (bytes === 0) return '0 B';
+    const k = 1024;
+    const dm = decimals < 0 ? 0 : decimals;
+    const sizes = ['B', 'KB', 'MB', 'GB'];
+    const i = Math.floor(Math.log(bytes) / Math.log(k));
+    return parseFloat((bytes / Math.pow(k, i)).toFixed(dm)) + ' ' + sizes[i];
+}
+
+function showUploadPreparing(totalFiles) {
+    let overlay = document.getElementById('uploadOverlay');
+    if (!overlay) {
+        overlay = document.createElement('div');
+        overlay.id = 'uploadOverlay';
+        overlay.className = 'uploading-overlay show';
+        document.body.appendChild(overlay);
+    }
+
+    overlay.innerHTML = `
+        <div class="uploading-box">
+            <div class="spinner"></div>
+            <div style="margin-bottom: 8px; color: #666;">${totalFiles ? `파일 ${totalFiles}개 준비 중...` : '남은 파일 준비 중...'}</div>
+            <div class="upload-progress">
+                <div class="progress-bar">
+                    <div class="progress-fill" id="hashFill" style="width: 0%"></div>
+                </div>
+                <div class="progress-text" id="hashText">파일 해시 계산 중...</div>
+            </div>
+        </div>
+    `;
+
+    // 페이지 이탈 방지
+    window.onbeforeunload = function(e) {
+        return '파일 업로드가 진행 중입니다. 정말 페이지를 떠나시겠습니까?';
+    };
+}
+
+function updateHashProgress(doneFiles, totalFiles, doneBytes, totalBytes) {
+    // 업로드가 시작되면 준비 오버레이가 사라지므로 있을 때만 갱신
+    const fill = document.getElementById('hashFill');
+    if (!fill) return;
+    fill.style.width = (totalBytes > 0 ? Math.round((doneBytes / totalBytes) * 100) : 100) + '%';
+    document.getElementById('hashText').textContent =
+        `파일 해시 계산 중... ${doneFiles} / ${totalFiles} (${formatBytes(doneBytes)} / ${formatBytes(totalBytes)})`;
+}
+
+function showUploadOverlay(file, index, total) {
+    // 로딩 오버레이 추가 또는 업데이트
+    let overlay = document.getElementById('uploadOverlay');
+    if (!overlay) {
+        overlay = document.createElement('div');
+        overlay.id = 'uploadOverlay';
+        overlay.className = 'uploading-overlay show';
+        document.body.appendChild(overlay);
+    }
+
+    overlay.innerHTML = `
+        <div class="uploading-box">
+            <div class="spinner"></div>
+            <div style="margin-bottom: 8px; color: #666;">파일 ${index + 1} / ${total}</div>
+            <div class="upload-filename">${file.name}</div>
+            <div class="upload-progress">
+                <div class="progress-bar">
+                    <div class="progress-fill" id="progressFill" style="width: 0%"></div>
+                </div>
+                <div class="progress-text" id="progressText">업로드 준비 중...</div>
+            </div>
+        </div>
+    `;
+
+    // 페이지 이탈 방지
+    window.onbeforeunload = function(e) {
+        return '파일 업로드가 진행 중입니다. 정말 페이지를 떠나시겠습니까?';
+    };
+    return overlay;
+}
+
+function updateUploadProgress(loadedBytes, totalBytes, startTime, startBytes = 0) {
+    const percentComplete = totalBytes > 0 ? Math.round((loadedBytes / totalBytes) * 100) : 100;
+    const loaded = formatBytes(loadedBytes);
+    const total = formatBytes(totalBytes);
+
+    // 속도 계산
+    const currentTime = Date.now();
+    const timeDiff = (currentTime - startTime) / 1000; // 초 단위
+    const speed = timeDiff > 0 ? (loadedBytes - startBytes) / timeDiff : 0;
+    const speedStr = formatBytes(speed) + '/s';
+
+    // 남은 시간 계산
+    const remaining = totalBytes - loadedBytes;
+    const eta = speed > 0 ? remaining / speed : 0;
+    let etaStr = '';
+    if (eta > 60) {
+        etaStr = ` (약 ${Math.ceil(eta / 60)}분)`;
+    } else if (eta > 0) {
+        etaStr = ` (약 ${Math.ceil(eta)}초)`;
+    }
+
+    document.getElementById('progressFill').style.width = percentComplete + '%';
+    document.getElementById('progressText').innerHTML = `
+        <div>${percentComplete}% - ${loaded} / ${total}</div>
+        <div style="font-size: 12px; color: #888; margin-top: 4px;">${speedStr}${etaStr}</div>
+    `;
+}
+
+function submitUploadForm(files, index, total) {
+    const label = files.length > 1 ? { name: `${files[0].name} 외 ${files.length - 1}개` } : files[0];
+    const overlay = showUploadOverlay(label, index, total);
+
+    // XMLHttpRequest로 업로드 진행률 추적
+    const xhr = new XMLHttpRequest();
+    const formData = new FormData();
+    files.forEach(file => formData.append('file', file));
+
+    let startTime = Date.now();
+
+    xhr.upload.addEventListener('progress', function(e) {
+        if (e.lengthComputable) {
+            updateUploadProgress(e.loaded, e.total, startTime);
+        }
+    });
+
+    xhr.addEventListener('load', function() {
+        if (xhr.status === 401) {
+            window.onbeforeunload = null;
+            alert('인증이 필요합니다. 페이지를 새로고침하세요.');
+            overlay.remove();
+            return;
+        }
+        // 서버가 파일별 결과를 돌려주므로 실패한 파일만 기록하고 다음 묶음으로 진행
+        let results = [];
+        try {
+            const reply = JSON.parse(xhr.responseText);
+            // 한도 초과로 본문을 받기 전에 거절되면 results 없이 error만 옴
+            results = reply.results || files.map(file => ({ name: file.name, error: reply.error }));
+        } catch (e) {
+            results = files.map(file => ({ name: file.name, error: `HTTP ${xhr.status}` }));
+        }
+        results.filter(result => result.error).forEach(result => {
+            console.error(`업로드 실패: ${result.name} (${result.error})`);
+        });
+        currentUploadIndex += files.length;
+        uploadNextFile();
+    });
+
+    xhr.addEventListener('error', function() {
+        console.error(`업로드 오류: ${files.map(file => file.name).join(', ')}`);
+        currentUploadIndex += files.length;
+        uploadNextFile();
+    });
+
+    xhr.open('POST', '/');
+    xhr.setRequestHeader('Accept', 'application/json');
+    xhr.send(formData);
+}
+
+function sleep(ms) {
+    return new Promise(resolve => setTimeout(resolve, ms));
+}
+
+function toHex(buffer) {
+    return Array.from(new Uint8Array(buffer)).map(b => b.toString(16).padStart(2, '0')).join('');
+}
+
+async function putChunk(sessionId, chunkIndex, blob) {
+    const headers = {};
+    if (window.crypto && crypto.subtle) {
+        headers['X-Chunk-SHA256'] = toHex(await crypto.subtle.digest('SHA-256', await blob.arrayBuffer()));
+    }
+    for (let attempt = 0; attempt < CHUNK_RETRIES; attempt++) {
+        try {
+            const res = await fetch(`/api/uploads/${sessionId}/${chunkIndex}`, { method: 'PUT', headers, body: blob });
+            if (res.ok) return;
+            if (res.status === 429) {
+                // 동시 전송 한도: 재시도 횟수를 쓰지 않고 Retry-After만큼 기다림
+                await sleep(1000 * (Number(res.headers.get('Retry-After')) || 1));
+                attempt--;
+                continue;
+            }
+            if ([401, 404, 413, 507].includes(res.status)) {
+                throw Object.assign(new Error(`청크 업로드 실패: ${res.status}`), { fatal: true });
+            }
+        } catch (e) {
+            if (e.fatal) throw e;
+        }
+        await sleep(1000 * Math.pow(2, attempt));
+    }
+    throw new Error(`청크 ${chunkIndex} 업로드 재시도 초과`);
+}
+
+async function openUploadSession(file) {
+    // 같은 파일의 이전 세션이 있으면 이어서 업로드
+    const key = `upload:${file.name}:${file.size}:${file.lastModified}`;
+    const savedId = localStorage.getItem(key);
+    if (savedId) {
+        const res = await fetch(`/api/uploads/${savedId}`);
+        if (res.ok) return { key, session: await res.json() };
+        localStorage.removeItem(key);
+    }
+    const res = await fetch('/api/uploads', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ filename: file.name, size: file.size })
+    });
+    if (!res.ok) throw new Error(`세션 생성 실패: ${res.status}`);
+    const session = await res.json();
+    localStorage.setItem(key, session.id);
+    return { key, session };
+}
+
+async function submitChunkedUpload(file, index, total) {
+    showUploadOverlay(file, index, total);
+    try {
+        const { key, session } = await openUploadSession(file);
+        const chunkSize = session.chunk_size;
+        const received = new Set(session.received);
+        const pending = [];
+        let uploadedBytes = 0;
+        for (let i = 0; i < session.chunk_count; i++) {
+            const size = Math.min(file.size, (i + 1) * chunkSize) - i * chunkSize;
+            if (received.has(i)) {
+                uploadedBytes += size;
+            } else {
+                pending.push(i);
+            }
+        }
+
+        const startTime = Date.now();
+        const startBytes = uploadedBytes;
+        updateUploadProgress(uploadedBytes, file.size, startTime, startBytes);
+        async function worker() {
+            while (pending.length > 0) {
+                const i = pending.shift();
+                const blob = file.slice(i * chunkSize, Math.min(file.size, (i + 1) * chunkSize));
+                await putChunk(session.id, i, blob);
+                uploadedBytes += blob.size;
+                updateUploadProgress(uploadedBytes, file.size, startTime, startBytes);
+            }
+        }
+        await Promise.all(Array.from({ length: PARALLEL_CHUNKS }, worker));
+
+        const res = await fetch(`/api/uploads/${session.id}/complete`, { method: 'POST' });
+        if (!res.ok) throw new Error(`업로드 완료 처리 실패: ${res.status}`);
+        localStorage.removeItem(key);
+    } catch (e) {
+        // 세션은 서버에 남아 있으므로 다시 선택하면 이어서 업로드됨
+        console.error(`업로드 실패: ${file.name}`, e);
+    }
+    currentUploadIndex++;
+    uploadNextFile();
+}
+
+async function precheckUpload(name, hash) {
+    // 같은 내용이 서버에 있으면 본문 전송 없이 파일 생성
+    try {
+        const res = await fetch(`/api/files/${encodeURIComponent(name)}?precheck`, {
+            method: 'PUT',
+            headers: { 'X-Content-SHA256': hash }
+        });
+        if (res.ok) console.log(`전송 생략: ${name} (서버에 동일한 내용 존재)`);
+        return res.ok;
+    } catch (e) {
+        return false;
+    }
+}
+
+// 파일 해시는 워커 풀에서 계산 (큰 파일도 조각 단위로 읽으므로 탭이 멈추지 않음)
+class HashPool {
+    constructor(url, size) {
+        this.url = url;
+        this.size = size;
+        this.idle = [];
+        this.spawned = 0;
+        this.waiting = [];
+        this.jobs = new Map();
+        this.nextId = 0;
+        this.broken = false;
+    }
+
+    hash(file, onProgress) {
+        return new Promise((resolve, reject) => {
+            this.waiting.push({ id: this.nextId++, file, onProgress, resolve, reject });
+            this.dispatch();
+        });
+    }
+
+    dispatch() {
+        while (this.waiting.length > 0) {
+            let worker = this.idle.pop();
+            if (!worker) {
+                if (this.spawned >= this.size) return;
+                worker = this.spawn();
+            }
+            const job = this.waiting.shift();
+            job.worker = worker;
+            this.jobs.set(job.id, job);
+            worker.postMessage({ id: job.id, file: job.file });
+        }
+    }
+
+    spawn() {
+        const worker = new Worker(this.url);
+        this.spawned++;
+        worker.onmessage = ev => {
+            const { id, hash, progress, error } = ev.data;
+            const job = this.jobs.get(id);
+            if (progress !== undefined) {
+                if (job.onProgress) job.onProgress(progress);
+                return;
+            }
+            this.jobs.delete(id);
+            this.idle.push(worker);
+            if (error) {
+                job.reject(new Error(error));
+            } else {
+                job.resolve(hash);
+            }
+            this.dispatch();
+        };
+        worker.onerror = () => {
+            // 워커를 쓸 수 없으면 남은 작업은 메인 스레드에서 계산
+            this.broken = true;
+            for (const job of [...this.jobs.values(), ...this.waiting]) {
+                job.reject(new Error('hash worker failed'));
+            }
+            this.jobs.clear();
+            this.waiting = [];
+        };
+        return worker;
+    }
+}
+
+const HASH_WORKERS = Math.min(4, Math.max(1, (navigator.hardwareConcurrency || 2) - 1));
+let hashPool = null;
+
+async function calculateFileHash(file, onProgress) {
+    if (window.Worker && !(hashPool && hashPool.broken)) {
+        if (!hashPool) hashPool = new HashPool(document.body.dataset.hashWorker, HASH_WORKERS);
+        try {
+            return await hashPool.hash(file, onProgress);
+        } catch (e) {
+            if (!hashPool.broken) throw e;
+        }
+    }
+    const buffer = await file.arrayBuffer();
+    return toHex(await crypto.subtle.digest('SHA-256', buffer));
+}
+
+// 파일 삭제 함수
+function deleteFile(filename) {
+    if (confirm('"' + filename + '" 파일을 삭제하시겠습니까?')) {
+        if (liveUpdates) {
+            // 목록은 이벤트로 갱신되므로 새로고침하지 않음
+            fetch('/?delete=' + encodeURIComponent(filename), { method: 'POST', redirect: 'manual' });
+            return;
+        }
+        const form = document.createElement('form');
+        form.method = 'POST';
+        form.action = '/?delete=' + encodeURIComponent(filename);
+        document.body.appendChild(form);
+        form.submit();
+    }
+}
+
+// 선택한 파일을 하나의 ZIP으로 받기
+function updateSelection() {
+    const count = document.querySelectorAll('.select-box:checked').length;
+    const button = document.getElementById('downloadSelected');
+    button.style.display = count ? '' : 'none';
+    button.textContent = `선택한 ${count}개 ZIP으로 받기`;
+    const deleteButton = document.getElementById('deleteSelected');
+    if (deleteButton) {
+        deleteButton.style.display = count ? '' : 'none';
+        deleteButton.textContent = `선택한 ${count}개 삭제`;
+    }
+}
+
+// 선택한 파일을 한 번의 요청으로 삭제
+async function deleteSelected() {
+    const files = Array.from(document.querySelectorAll('.select-box:checked')).map(box => box.value);
+    if (!files.length || !confirm(`선택한 파일 ${files.length}개를 삭제하시겠습니까?`)) return;
+    const res = await fetch('/api/delete', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ files }),
+    });
+    if (!res.ok) {
+        alert(`삭제 실패: HTTP ${res.status}`);
+        return;
+    }
+    const failed = (await res.json()).results.filter(result => result.error);
+    if (failed.length) {
+        alert('삭제하지 못한 파일:\\n' + failed.map(result => `${result.name} (${result.error})`).join('\\n'));
+    }
+    // 목록은 이벤트로 갱신되므로 실시간 연결이 없을 때만 새로고침
+    if (!liveUpdates) location.reload();
+}
+
+function downloadSelected() {
+    const form = document.createElement('form');
+    form.method = 'POST';
+    form.action = '/api/archive';
+    const fields = [['dir', document.body.dataset.dir], ['format', 'zip']];
+    document.querySelectorAll('.select-box:checked').forEach(box => fields.push(['file', box.value]));
+    for (const [name, value] of fields) {
+        const input = document.createElement('input');
+        input.type = 'hidden';
+        input.name = name;
+        input.value = value;
+        form.appendChild(input);
+    }
+    document.body.appendChild(form);
+    form.submit();
+    form.remove();
+}
+
+// 실시간 목록 갱신 (Server-Sent Events)
+const LISTING_CURSOR = document.body.dataset.cursor;
+let liveUpdates = false;
+
+function insertFileItem(list, item, sort) {
+    const key = sort.replace(/^-/, '');
+    const reverse = sort.startsWith('-');
+    const before = Array.from(list.querySelectorAll('li.file-item:not(.dir)')).find(li => {
+        let after;
+        if (key === 'name') after = li.dataset.name > item.dataset.name;
+        else if (key === 'size') after = Number(li.dataset.size) < Number(item.dataset.size);
+        else after = Number(li.dataset.mtime) < Number(item.dataset.mtime);
+        return reverse ? !after : after;
+    });
+    list.insertBefore(item, before || null);
+}
+
+function applyChange(change) {
+    const params = new URLSearchParams(location.search);
+    const firstPage = !Number(params.get('offset'));
+    const list = document.querySelector('.file-list');
+    const existing = Array.from(list.querySelectorAll('li.file-item:not(.dir)'))
+        .find(li => li.dataset.name === change.name);
+    if (existing) existing.remove();
+    if (change.op === 'delete' || !change.html) return;
+    if (!existing && !firstPage) return;
+    const template = document.createElement('template');
+    template.innerHTML = change.html.trim();
+    const empty = document.querySelector('.empty');
+    if (empty) empty.remove();
+    insertFileItem(list, template.content.firstElementChild, params.get('sort') || 'mtime');
+}
+
+function startLiveUpdates() {
+    if (!window.EventSource) return;
+    const source = new EventSource('/api/events?since=' + encodeURIComponent(LISTING_CURSOR));
+    source.addEventListener('open', () => { liveUpdates = true; });
+    source.addEventListener('error', () => { liveUpdates = false; });
+    // 서버가 재시작되었거나 이벤트가 너무 오래된 경우
+    source.addEventListener('reset', () => location.reload());
+    source.addEventListener('change', e => applyChange(JSON.parse(e.data)));
+}
+startLiveUpdates();
+
+// 하위 폴더까지 파일 이름 검색 (/api/search); 입력이 멈추면 요청하고 늦게 온 이전 응답은 버림
+const SEARCH_LIMIT = 200;
+let searchTimer = null;
+let searchSeq = 0;
+
+function searchChanged(value) {
+    clearTimeout(searchTimer);
+    searchTimer = setTimeout(() => runSearch(value.trim()), 250);
+}
+
+async function runSearch(query) {
+    const seq = ++searchSeq;
+    const panel = document.getElementById('searchPanel');
+    const filesSection = document.querySelector('.files-section');
+    if (!query) {
+        panel.style.display = 'none';
+        filesSection.style.display = '';
+        return;
+    }
+    const params = new URLSearchParams({q: query, dir: document.body.dataset.dir, limit: SEARCH_LIMIT});
+    let data;
+    try {
+        const res = await fetch('/api/search?' + params);
+        data = await res.json();
+        if (!res.ok) throw new Error(data.error || res.status);
+    } catch (e) {
+        data = {total: 0, results: [], error: e.message};
+    }
+    if (seq !== searchSeq) return;
+    document.getElementById('searchResults').replaceChildren(...data.results.map(renderSearchResult));
+    let summary = data.error ? '검색 실패: ' + data.error : `${data.total}개 일치`;
+    if (data.total > data.results.length) summary += ` (처음 ${data.results.length}개 표시)`;
+    if (data.complete === false) summary += ' · 색인 생성 중';
+    document.getElementById('searchSummary').textContent = summary;
+    panel.style.display = '';
+    filesSection.style.display = 'none';
+}
+
+function renderSearchResult(result) {
+    const url = '/' + result.path.split('/').map(encodeURIComponent).join('/');
+    const element = (tag, className, text) => {
+        const node = document.createElement(tag);
+        node.className = className;
+        if (text !== undefined) node.textContent = text;
+        return node;
+    };
+    const item = element('li', 'file-item');
+    item.onclick = () => { location.href = url; };
+    const info = element('div', 'file-info');
+    const link = element('a', 'file-link', result.name);
+    link.href = url;
+    link.onclick = e => e.stopPropagation();
+    const meta = element('div', 'file-meta');
+    meta.append(element('span', 'file-folder', '/' + result.path.slice(0, -result.name.length)),
+                element('span', 'file-size', formatBytes(result.size)),
+                element('span', 'file-time', new Date(result.mtime * 1000).toLocaleString()));
+    info.append(link, meta);
+    item.append(element('span', 'file-icon', '📄'), info);
+    return item;
+}
+'''
+
+
+UI_HASH_WORKER = '''\
+// 업로드 전 SHA-256 계산용 워커: 파일을 조각 단위로 읽어 크기와 관계없이 메모리 사용량을 일정하게 유지
+// (Web Crypto에는 점진적 해시가 없으므로 큰 파일은 아래 구현으로 계산)
+const HASH_READ_SIZE = 4 * 1024 * 1024;
+const SUBTLE_MAX_SIZE = 32 * 1024 * 1024;
+
+const K = new Int32Array([
+    0x428a2f98, 0x71374491, 0xb5c0fbcf, 0xe9b5dba5, 0x3956c25b, 0x59f111f1, 0x923f82a4, 0xab1c5ed5,
+    0xd807aa98, 0x12835b01, 0x243185be, 0x550c7dc3, 0x72be5d74, 0x80deb1fe, 0x9bdc06a7, 0xc19bf174,
+    0xe49b69c1, 0xefbe4786, 0x0fc19dc6, 0x240ca1cc, 0x2de92c6f, 0x4a7484aa, 0x5cb0a9dc, 0x76f988da,
+    0x983e5152, 0xa831c66d, 0xb00327c8, 0xbf597fc7, 0xc6e00bf3, 0xd5a79147, 0x06ca6351, 0x14292967,
+    0x27b70a85, 0x2e1b2138, 0x4d2c6dfc, 0x53380d13, 0x650a7354, 0x766a0abb, 0x81c2c92e, 0x92722c85,
+    0xa2bfe8a1, 0xa81a664b, 0xc24b8b70, 0xc76c51a3, 0xd192e819, 0xd6990624, 0xf40e3585, 0x106aa070,
+    0x19a4c116, 0x1e376c08, 0x2748774c, 0x34b0bcb5, 0x391c0cb3, 0x4ed8aa4a, 0x5b9cca4f, 0x682e6ff3,
+    0x748f82ee, 0x78a5636f, 0x84c87814, 0x8cc70208, 0x90befffa, 0xa4506ceb, 0xbef9a3f7, 0xc67178f2,
+]);
+
+class Sha256 {
+    constructor() {
+        this.state = new Int32Array([
+            0x6a09e667, 0xbb67ae85, 0x3c6ef372, 0xa54ff53a, 0x510e527f, 0x9b05688c, 0x1f83d9ab, 0x5be0cd19,
+        ]);
+        this.w = new Int32Array(64);
+        this.buffer = new Uint8Array(64);
+        this.buffered = 0;
+        this.length = 0;
+    }
+
+    update(data) {
+        let pos = 0;
+        this.length += data.length;
+        if (this.buffered) {
+            pos = Math.min(64 - this.buffered, data.length);
+            this.buffer.set(data.subarray(0, pos), this.buffered);
+            this.buffered += pos;
+            if (this.buffered < 64) return;
+            this.block(this.buffer, 0);
+            this.buffered = 0;
+        }
+        for (; pos + 64 <= data.length; pos += 64) {
+            this.block(data, pos);
+        }
+        if (pos < data.length) {
+            this.buffer.set(data.subarray(pos));
+            this.buffered = data.length - pos;
+        }
+    }
+
+    block(data, offset) {
+        const w = this.w;
+        for (let i = 0; i < 16; i++) {
+            const j = offset + i * 4;
+            w[i] = (data[j] << 24) | (data[j + 1] << 16) | (data[j + 2] << 8) | data[j + 3];
+        }
+        for (let i = 16; i < 64; i++) {
+            const x = w[i - 15], y = w[i - 2];
+            const s0 = ((x >>> 7) | (x << 25)) ^ ((x >>> 18) | (x << 14)) ^ (x >>> 3);
+            const s1 = ((y >>> 17) | (y << 15)) ^ ((y >>> 19) | (y << 13)) ^ (y >>> 10);
+            w[i] = (w[i - 16] + s0 + w[i - 7] + s1) | 0;
+        }
+        const s = this.state;
+        let a = s[0], b = s[1], c = s[2], d = s[3], e = s[4], f = s[5], g = s[6], h = s[7];
+        for (let i = 0; i < 64; i++) {
+            const S1 = ((e >>> 6) | (e << 26)) ^ ((e >>> 11) | (e << 21)) ^ ((e >>> 25) | (e << 7));
+            const t1 = (h + S1 + ((e & f) ^ (~e & g)) + K[i] + w[i]) | 0;
+            const S0 = ((a >>> 2) | (a << 30)) ^ ((a >>> 13) | (a << 19)) ^ ((a >>> 22) | (a << 10));
+            const t2 = (S0 + ((a & b) ^ (a & c) ^ (b & c))) | 0;
+            h = g; g = f; f = e; e = (d + t1) | 0;
+            d = c; c = b; b = a; a = (t1 + t2) | 0;
+        }
+        s[0] = (s[0] + a) | 0; s[1] = (s[1] + b) | 0; s[2] = (s[2] + c) | 0; s[3] = (s[3] + d) | 0;
+        s[4] = (s[4] + e) | 0; s[5] = (s[5] + f) | 0; s[6] = (s[6] + g) | 0; s[7] = (s[7] + h) | 0;
+    }
+
+    hexdigest() {
+        // 패딩: 0x80, 0으로 채운 뒤 마지막 8바이트에 비트 길이(빅엔디언)
+        const tail = new Uint8Array(this.buffered < 56 ? 64 : 128);
+        tail.set(this.buffer.subarray(0, this.buffered));
+        tail[this.buffered] = 0x80;
+        const view = new DataView(tail.buffer);
+        view.setUint32(tail.length - 8, Math.floor(this.length / 0x20000000));
+        view.setUint32(tail.length - 4, (this.length % 0x20000000) * 8);
+        for (let offset = 0; offset < tail.length; offset += 64) {
+            this.block(tail, offset);
+        }
+        return toHex(bigEndian(this.state));
+    }
+}
+
+function bigEndian(words) {
+    const out = new Uint8Array(words.length * 4);
+    const view = new DataView(out.buffer);
+    words.forEach((word, i) => view.setInt32(i * 4, word));
+    return out;
+}
+
+function toHex(bytes) {
+    return Array.from(bytes).map(b => b.toString(16).padStart(2, '0')).join('');
+}
+
+async function hashFile(id, file) {
+    if (self.crypto && crypto.subtle && file.size <= SUBTLE_MAX_SIZE) {
+        return toHex(new Uint8Array(await crypto.subtle.digest('SHA-256', await file.arrayBuffer())));
+    }
+    const sha = new Sha256();
+    const read = offset => file.slice(offset, offset + HASH_READ_SIZE).arrayBuffer();
+    // 다음 조각 읽기를 현재 조각 해시 계산과 겹쳐서 진행
+    let next = read(0);
+    for (let offset = 0; offset < file.size; offset += HASH_READ_SIZE) {
+        const chunk = new Uint8Array(await next);
+        if (offset + HASH_READ_SIZE < file.size) next = read(offset + HASH_READ_SIZE);
+        sha.update(chunk);
+        self.postMessage({ id, progress: offset + chunk.length });
+    }
+    return sha.hexdigest();
+}
+
+self.onmessage = async function(ev) {
+    const { id, file } = ev.data;
+    try {
+        self.postMessage({ id, hash: await hashFile(id, file) });
+    } catch (e) {
+        self.postMessage({ id, error: String(e) });
+    }
+};
+'''
+
+UI_ASSETS = StaticAssets()
+UI_ASSETS.add('style.css', UI_STYLE, 'text/css; charset=utf-8')
+UI_ASSETS.add('app.js', UI_SCRIPT, 'text/javascript; charset=utf-8')
+UI_ASSETS.add('hash-worker.js', UI_HASH_WORKER, 'text/javascript; charset=utf-8')
+
+
+class FileServerMixin:
+    """State and request logic shared by the threaded handler and the asyncio engine"""
+    
+    auth_key = ""
+    upload_dir = ""
+    hash_index = None
+    file_locks = PathLocks()
+    use_sendfile = hasattr(os, 'sendfile')
+    upload_sessions = None
+    changes = ChangeJournal()
+    blob_store = None
+    event_stream = None
+    search_index = None
+    transfer_limits = TransferLimits(os.curdir)
+    trusted_proxies = frozenset()
+    static_assets = UI_ASSETS
+    compression = True
+    compress_min_size = 1024
+    compression_cache = CompressionCache()
+    MAX_COMPRESS_FILE_SIZE = 8 * 1024 * 1024
+    keepalive_timeout = 15
+    max_keepalive_requests = 1000
+    SEARCH_LIMIT = 100
+    MAX_SEARCH_LIMIT = 1000
+    started = time.time()
+    metrics = METRICS
+    METRICS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+    
+    def check_auth(self, auth_header):
+        """Return the Basic auth token if it matches, else None"""
+        if auth_header is None or not auth_header.startswith('Basic '):
+            return None
+        token = auth_header.split()[1]
+        if token != self.auth_key:
+            return None
+        return token
+    
+    def collect_file_hashes(self):
+        """Map each top-level file name to the first 16 chars of its SHA-256"""
+        file_hashes = {}
+        for filename in os.listdir(os.getcwd()):
+            if os.path.isfile(filename):
+                file_hashes[filename] = self.hash_index.lookup(filename)[:16]
+        self.hash_index.save()
+        return file_hashes
+    
+    def file_hashes_response(self):
+        """Return (etag, cursor, payload) for /api/files, honoring ?since=<cursor>
+
+        Without ``since`` the payload is the plain name -> hash map. With it,
+        the payload is ``{"cursor", "full": false, "changes"}`` or, when the
+        cursor has been compacted away, ``{"cursor", "full": true, "files"}``.
+        The payload is None when If-None-Match already matches.
+        """
+        query = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
+        # 스냅샷 전에 커서를 읽어 그 사이의 변경은 다음 요청에서 다시 전달되게 한다
+        cursor = self.changes.cursor
+        etag = self.directory_etag(os.getcwd(), query.get('since', [None])[0])
+        if self.etag_matches(etag):
+            return etag, cursor, None
+        if 'since' not in query:
+            return etag, cursor, self.collect_file_hashes()
+        events, cursor = self.changes.since(query['since'][0])
+        if events is None:
+            return etag, cursor, {'cursor': cursor, 'full': True, 'files': self.collect_file_hashes()}
+        return etag, cursor, {'cursor': cursor, 'full': False, 'changes': events}
+    
+    def file_put_params(self):
+        """Parse PUT /api/files/<name>[?precheck] into (filename, sha256, precheck)
+
+        Raises ValueError for a bad filename or a malformed X-Content-SHA256.
+        """
+        path, _, query = self.path.partition('?')
+        filename = safe_filename(unquote(path[len('/api/files/'):]))
+        if not filename:
+            raise ValueError("Invalid filename")
+        digest = self.headers.get('X-Content-SHA256', '').strip().lower()
+        if digest and (len(digest) != 64 or not all(c in '0123456789abcdef' for c in digest)):
+            raise ValueError("Invalid X-Content-SHA256")
+        precheck = 'precheck' in urllib.parse.parse_qs(query, keep_blank_values=True)
+        if precheck and not digest:
+            raise ValueError("X-Content-SHA256 required for precheck")
+        return filename, digest, precheck
+
+    def link_known_content(self, filename, digest):
+        """Create filename from content the server already has; False if it has none
+
+        With a blob store the new name is just another hard link to the blob;
+        otherwise the existing file is copied locally, so no payload bytes
+        cross the network either way. A copy whose bytes no longer hash to
+        digest (the source changed meanwhile) is discarded and False returned.
+        """
+        target = os.path.join(os.getcwd(), filename)
+        with self.file_locks.hold(filename):
+            source = self.hash_index.find(digest)
+            if source is None:
+                return False
+            if os.path.abspath(source) == target:
+                return True
+            existed = os.path.exists(target)
+            tmp_dir = os.path.join(os.getcwd(), STATE_DIR, 'tmp')
+            os.makedirs(tmp_dir, exist_ok=True)
+            tmp_path = os.path.join(tmp_dir, f'copy-{os.urandom(8).hex()}.part')
+            try:
+                blob = self.blob_store.blob_path(digest) if self.blob_store is not None else None
+                if blob is not None and os.path.exists(blob):
+                    os.link(blob, tmp_path)
+                elif copy_file_hashed(source, tmp_path) != digest:
+                    # 원본은 이 이름의 잠금 밖이라 복사 중에 바뀔 수 있음
+                    os.remove(tmp_path)
+                    return False
+                place_file(tmp_path, target, digest, self.blob_store)
+            except BaseException:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+                raise
+            self.hash_index.put(target, digest)
+            self.changes.record('modify' if existed else 'add', filename, digest)
+        self.hash_index.save()
+        print(f"Deduplicated upload: {filename} (sha256 {digest[:16]})")
+        return True
+
+    def file_put_precheck(self, filename, digest, precheck):
+        """Answer a PUT /api/files request without its body when possible
+
+        Returns (code, payload) if the request is settled, or None when the
+        body has to be received.
+        """
+        if digest and self.link_known_content(filename, digest):
+            return 200, {'name': filename, 'sha256': digest, 'deduplicated': True}
+        if precheck:
+            return 404, {'error': 'Unknown content', 'sha256': digest}
+        return None
+
+    def finish_file_put(self, sink, digest):
+        """Verify and commit a received PUT /api/files body; return (code, payload)"""
+        if digest and sink.sha256.hexdigest() != digest:
+            sink.abort()
+            return 400, {'error': 'SHA-256 mismatch'}
+        filename, digest = commit_upload(sink, self.file_locks, self.changes)
+        self.hash_index.save()
+        print(f"Uploaded file: {filename} (sha256 {digest[:16]})")
+        return 201, {'name': filename, 'sha256': digest, 'deduplicated': False}
+
+    def events_cursor(self):
+        """Resume point for /api/events: Last-Event-ID, else ?since=, else now"""
+        cursor = self.headers.get('Last-Event-ID')
+        if not cursor:
+            query = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
+            cursor = query.get('since', [None])[0]
+        return cursor or self.changes.cursor
+
+    def change_events(self, cursor):
+        """SSE frames for journal events after cursor; returns (payload or None, new cursor)
+
+        A cursor the journal can no longer serve yields a single ``reset``
+        event telling the page to reload.
+        """
+        events, new_cursor = self.changes.since(cursor)
+        if events is None:
+            return f"id: {new_cursor}\nevent: reset\ndata: {{}}\n\n".encode(), new_cursor
+        frames = []
+        recent_threshold = time.time() - (5 * 60)
+        for event in events:
+            data = {'op': event['op'], 'name': event['name'], 'hash': event['hash']}
+            if event['op'] != 'delete':
+                path = os.getcwd()
+                try:
+                    st = os.stat(os.path.join(path, event['name']))
+                    if stat.S_ISREG(st.st_mode):
+                        data['html'] = self.render_file_item(path, event['name'], st, recent_threshold)
+                except OSError:
+                    pass
+            frames.append(f"id: {self.changes.epoch}.{event['seq']}\nevent: change\n"
+                          f"data: {json.dumps(data)}\n\n")
+        return ''.join(frames).encode('utf-8') or None, new_cursor
+
+    @staticmethod
+    def resolve_relpath(root, relpath):
+        """Join a client-supplied relative path onto root without escaping it"""
+        parts = [p for p in relpath.replace('\\', '/').split('/') if p not in ('', '.', '..')]
+        if parts and parts[0] == STATE_DIR:
+            raise FileNotFoundError(relpath)
+        return os.path.join(root, *parts)
+
+    def archive_request(self, params):
+        """Resolve /api/archive parameters into (format, download name, entries)
+
+        ``dir`` is a directory relative to the served root (default: the
+        root) and each ``file`` a file or subdirectory inside it; without any
+        ``file`` the whole directory is archived. Entries are ``(arcname,
+        path)`` pairs produced lazily while the archive streams.
+        """
+        fmt = params.get('format', ['zip'])[0]
+        if fmt not in ('zip', 'tar'):
+            raise ValueError("format must be zip or tar")
+        root = os.getcwd()
+        base = self.resolve_relpath(root, params.get('dir', [''])[0])
+        if not os.path.isdir(base):
+            raise FileNotFoundError(base)
+        label = os.path.basename(base) if base != root else 'files'
+        names = params.get('file', [])
+        if names:
+            targets = [(os.path.basename(self.resolve_relpath(base, name)),
+                        self.resolve_relpath(base, name)) for name in names]
+        else:
+            targets = [(label, base)]
+
+        def entries():
+            for arcname, target in targets:
+                if os.path.isfile(target):
+                    yield arcname, target
+                    continue
+                for dirpath, dirnames, filenames in os.walk(target):
+                    dirnames[:] = sorted(d for d in dirnames
+                                         if not (dirpath == root and d == STATE_DIR))
+                    for filename in sorted(filenames):
+                        full = os.path.join(dirpath, filename)
+                        rel = os.path.relpath(full, target).replace(os.sep, '/')
+                        yield posixpath.join(arcname, rel), full
+
+        return fmt, f'{label}.{fmt}', entries()
+
+    @staticmethod
+    def archive_headers(fmt, filename):
+        """Headers for a streamed archive download"""
+        return [('Content-Type', 'application/zip' if fmt == 'zip' else 'application/x-tar'),
+                ('Content-Disposition', f"attachment; filename*=UTF-8''{quote(filename)}"),
+                ('Cache-Control', 'no-store')]
+
+    def wants_json(self):
+        """True if the client asked for a JSON reply instead of a redirect"""
+        return 'application/json' in self.headers.get('Accept', '')
+
+    def upload_result(self, upload, error=None):
+        """(code, payload) with per-file results of a multipart upload"""
+        payload = {
+            'uploaded': len(upload.uploaded),
+            'failed': sum(1 for result in upload.results if 'error' in result),
+            'results': upload.results,
+        }
+        if error is None and not upload.results:
+            error = "No file field in form."
+        if error is not None:
+            payload['error'] = error
+            return 400, payload
+        return 200, payload
+
+    def batch_delete(self, body):
+        """Delete every name in {"files": [...]}; return (code, per-file results)"""
+        names = body.get('files') if isinstance(body, dict) else None
+        if not isinstance(names, list) or not all(isinstance(name, str) for name in names):
+            return 400, {'error': 'Expected {"files": [names]}'}
+        results = []
+        for name in names:
+            if safe_filename(name) != name:
+                results.append({'name': name, 'error': 'Invalid filename'})
+                continue
+            try:
+                deleted = self.delete_file(name)
+            except OSError as e:
+                results.append({'name': name, 'error': e.strerror or str(e)})
+                continue
+            results.append({'name': name, 'deleted': True} if deleted
+                           else {'name': name, 'error': 'Not found'})
+        self.hash_index.save()
+        return 200, {
+            'deleted': sum(1 for result in results if result.get('deleted')),
+            'failed': sum(1 for result in results if 'error' in result),
+            'results': results,
+        }
+
+    @staticmethod
+    def parse_time(value):
+        """Unix timestamp or ISO 8601 date/time"""
+        try:
+            return float(value)
+        except ValueError:
+            pass
+        try:
+            return datetime.fromisoformat(value).timestamp()
+        except ValueError:
+            raise ValueError(f"Invalid time: {value}")
+
+    def search_response(self):
+        """Return (code, payload) for /api/search?q=&ext=&min_size=&modified_after=..."""
+        if self.search_index is None:
+            return 404, {'error': 'Search is disabled'}
+        query = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
+
+        def param(name, convert=str):
+            value = query.get(name, [''])[0].strip()
+            if not value:
+                return None
+            try:
+                return convert(value)
+            except ValueError:
+                raise ValueError(f"Invalid {name}: {value}")
+
+        try:
+            match = param('match') or 'substring'
+            if match not in ('substring', 'prefix'):
+                raise ValueError("match must be substring or prefix")
+            sort = param('sort') or 'name'
+            if sort.lstrip('-') not in SearchIndex.SORTS:
+                raise ValueError(f"sort must be one of {', '.join(SearchIndex.SORTS)}")
+            limit = param('limit', int) or self.SEARCH_LIMIT
+            if not 0 < limit <= self.MAX_SEARCH_LIMIT:
+                raise ValueError(f"limit must be between 1 and {self.MAX_SEARCH_LIMIT}")
+            exts = [ext.strip().lstrip('.') for ext in (param('ext') or '').split(',') if ext.strip()]
+            text = param('q') or ''
+            total, results = self.search_index.search(
+                text, prefix=match == 'prefix', exts=exts,
+                min_size=param('min_size', int), max_size=param('max_size', int),
+                after=param('modified_after', self.parse_time),
+                before=param('modified_before', self.parse_time),
+                under=param('dir') or '', sort=sort, limit=limit)
+        except ValueError as e:
+            return 400, {'error': str(e)}
+        return 200, {
+            'total': total,
+            'complete': self.search_index.ready,
+            'results': [{'path': path, 'name': posixpath.basename(path), 'size': size, 'mtime': mtime}
+                        for path, size, mtime in results],
+        }
+
+    def dedup_stats(self):
+        """Blob store statistics for /api/dedup"""
+        if self.blob_store is None:
+            return {'enabled': False}
+        return self.blob_store.stats()
+    
+    def delete_file(self, filename):
+        """Delete a file in the served directory; return True if it was removed
+
+        Raises ValueError for anything but a bare filename, so neither
+        subdirectories nor the state directory can be reached.
+        """
+        if safe_filename(filename) != filename:
+            raise ValueError("Invalid filename")
+        filepath = os.path.join(os.getcwd(), filename)
+        with self.file_locks.hold(filename):
+            if not os.path.isfile(filepath):
+                return False
+            try:
+                st = os.stat(filepath)
+                os.remove(filepath)
+            except FileNotFoundError:
+                # 다른 요청이 먼저 삭제한 경우
+                return False
+            if self.blob_store is not None:
+                self.blob_store.release(st)
+            self.hash_index.discard(filepath)
+            self.changes.record('delete', filename)
+        print(f"Deleted file: {filename}")
+        return True
+    
+    def response_encoding(self):
+        """Content coding negotiated for this request, or None"""
+        if not self.compression:
+            return None
+        return negotiate_encoding(self.headers.get('Accept-Encoding'))
+
+    def encode_body(self, body):
+        """Return (body, encoding), compressing a complete body above the size threshold"""
+        encoding = self.response_encoding() if len(body) >= self.compress_min_size else None
+        if encoding is None:
+            return body, None
+        return compress_bytes(body, encoding), encoding
+
+    @staticmethod
+    def encoding_headers(encoding, etag=None):
+        """Vary/Content-Encoding headers, plus the ETag (weakened when compressed)"""
+        headers = [('Vary', 'Accept-Encoding')]
+        if encoding:
+            headers.append(('Content-Encoding', encoding))
+        if etag:
+            headers.append(('ETag', f'W/{etag}' if encoding and not etag.startswith('W/') else etag))
+        return headers
+
+    def compressed_file(self, path, st, etag, encoding):
+        """Compressed body of a file from the cache, or None if it changed meanwhile"""
+        key = (os.path.abspath(path), etag, encoding)
+        data = self.compression_cache.get(key)
+        if data is not None:
+            return data
+        with open(path, 'rb') as f:
+            if HashIndex.signature(os.fstat(f.fileno())) != HashIndex.signature(st):
+                return None
+            data = compress_bytes(f.read(), encoding)
+        self.compression_cache.put(key, data)
+        return data
+
+    def static_response(self):
+        """Return (code, headers, body) for a /static/ asset, picking the best encoding"""
+        asset = self.static_assets.get(self.path)
+        if asset is None:
+            return 404, [('Content-Type', 'text/plain; charset=utf-8'), ('Content-Length', '13')], b'404 Not Found'
+        content_type, version, variants = asset
+        accepted = accepted_encodings(self.headers.get('Accept-Encoding', ''))
+        encoding = next((e for e in ('br', 'gzip') if e in variants and e in accepted), 'identity')
+        etag = f'"{version}-{encoding}"'
+        headers = [('Cache-Control', f'public, max-age={StaticAssets.MAX_AGE}, immutable'),
+                   ('Vary', 'Accept-Encoding'), ('ETag', etag)]
+        if self.etag_matches(etag):
+            return 304, headers, b''
+        body = variants[encoding]
+        headers.append(('Content-Type', content_type))
+        if encoding != 'identity':
+            headers.append(('Content-Encoding', encoding))
+        headers.append(('Content-Length', str(len(body))))
+        return 200, headers, body
+    
+    def etag_matches(self, etag):
+        """True if If-None-Match names etag (weak comparison)"""
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match is None:
+            return False
+        tags = [t.strip().removeprefix('W/') for t in if_none_match.split(',')]
+        return '*' in tags or etag in tags
+    
+    def directory_etag(self, path, *extra):
+        """Cheap validator for a directory's contents
+
+        Built from the directory's own stat (which changes when entries are
+        added, removed or renamed) plus the change counter bumped by every
+        upload and delete, so it costs one stat instead of a scan.
+        """
+        st = os.stat(path)
+        parts = [st.st_ino, st.st_mtime_ns, self.changes.value, self.started, *extra]
+        return '"' + hashlib.sha1(repr(parts).encode()).hexdigest()[:24] + '"'
+    
+    def listing_etag(self, path, offset, limit, sort):
+        """Validator for a rendered listing page"""
+        extra = [offset, limit, sort]
+        # NEW 배지가 있는 동안은 분 단위로 태그를 바꿔 배지가 사라지게 한다
+        if os.stat(path).st_mtime > time.time() - 5 * 60:
+            extra.append(int(time.time() // 60))
+        return self.directory_etag(path, *extra)
+    
+    def metrics_route(self):
+        """Route label of the current request in /metrics"""
+        if not self.command:
+            return 'other'
+        path = self.path.split('?', 1)[0]
+        if path.startswith('/static/'):
+            return 'static'
+        if path == '/metrics':
+            return 'metrics'
+        if path in ('/api/files', '/api/archive', '/api/events', '/api/search'):
+            return path[1:].replace('/', '_')
+        if path == '/api/delete' or '?delete=' in self.path:
+            return 'delete'
+        if (self.command == 'POST' or path.startswith('/api/files/')
+                or self.is_upload_session_path()):
+            return 'upload'
+        if path.startswith('/api/'):
+            return 'api'
+        if self.command not in ('GET', 'HEAD'):
+            return 'other'
+        return 'listing' if path.endswith('/') else 'download'
+
+    def record_request(self, started):
+        """Count the request just answered in the per-route metrics"""
+        if self.status_code is not None:
+            self.metrics.request(self.metrics_route(), self.status_code,
+                                 time.perf_counter() - started)
+
+    def metrics_body(self):
+        """Return (body, encoding) for /metrics"""
+        return self.encode_body(self.metrics.render())
+
+    def client_ip(self):
+        """Address the per-client limits apply to
+
+        Behind a proxy listed in trusted_proxies this is the first address in
+        X-Forwarded-For, counting from the right, that is not a trusted proxy.
+        """
+        address = self.client_address[0]
+        if address not in self.trusted_proxies:
+            return address
+        hops = [hop.strip() for hop in self.headers.get('X-Forwarded-For', '').split(',')]
+        for hop in reversed([hop for hop in hops if hop]):
+            address = hop
+            if hop not in self.trusted_proxies:
+                break
+        return address
+
+    def admit_transfer(self, direction, length=0):
+        """Take a transfer slot for this client; raises AdmissionError"""
+        return self.transfer_limits.admit(self.client_ip(), direction, length)
+
+    @staticmethod
+    def refusal(error):
+        """(code, payload, headers) answering an AdmissionError"""
+        headers = [('Retry-After', str(error.retry_after))] if error.retry_after else []
+        return error.code, {'error': str(error)}, headers
+
+    def is_state_path(self):
+        """True if the request path, once decoded and normalized, points into STATE_DIR"""
+        root = os.getcwd()
+        relpath = os.path.relpath(translate_path(root, self.path), root)
+        return relpath.split(os.sep, 1)[0] == STATE_DIR
+
+    def is_upload_session_path(self):
+        path = self.path.split('?', 1)[0]
+        return path == '/api/uploads' or path.startswith('/api/uploads/')
+    
+    def upload_session_route(self):
+        """Split /api/uploads[/<id>[/<chunk>|/complete]] into its trailing parts"""
+        return [p for p in self.path.split('?', 1)[0].split('/')[3:] if p]
+    
+    def upload_session_action(self, parts, body=None):
+        """Run a non-streaming /api/uploads action and return (code, payload)"""
+        sessions = self.upload_sessions
+        try:
+            if self.command == 'POST' and not parts:
+                body = body or {}
+                if isinstance(body.get('size'), int):
+                    self.transfer_limits.check_upload(body['size'])
+                session = sessions.create(body.get('filename'), body.get('size'),
+                                          body.get('chunk_size'), body.get('sha256'))
+                return 201, sessions.status(session)
+            if self.command == 'GET' and len(parts) == 1:
+                return 200, sessions.status(sessions.get(parts[0]))
+            if self.command == 'POST' and len(parts) == 2 and parts[1] == 'complete':
+                filename, digest = sessions.finalize(parts[0])
+                print(f"Uploaded file: {filename} (sha256 {digest[:16]}, chunked)")
+                return 200, {'filename': filename, 'sha256': digest}
+            if self.command == 'DELETE' and len(parts) == 1:
+                sessions.abort(parts[0])
+                return 200, {'id': parts[0], 'aborted': True}
+        except KeyError:
+            return 404, {'error': 'Unknown upload session'}
+        except ValueError as e:
+            return 400, {'error': str(e)}
+        except AdmissionError as e:
+            return e.code, {'error': str(e)}
+        return 404, {'error': 'Not found'}
+    
+    def prepare_file_response(self, path, st):
+        """Work out status, headers and body segments for a file GET/HEAD
+
+        Honors If-None-Match/If-Modified-Since, Range and If-Range. Segments
+        are ``bytes`` to send verbatim or ``(offset, length)`` slices of the
+        file, so each engine only has to copy them out.
+        """
+        size = st.st_size
+        etag = make_etag(st)
+        last_modified = email.utils.formatdate(st.st_mtime, usegmt=True)
+        ctype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        # 전체 요청(Range 없음)만 압축; 부분 요청은 원본 바이트 기준
+        encoding = None
+        compressible = self.compression and is_compressible(path, ctype)
+        if (compressible and self.headers.get('Range') is None
+                and self.compress_min_size <= size <= self.MAX_COMPRESS_FILE_SIZE):
+            encoding = self.response_encoding()
+        headers = [('Last-Modified', last_modified), ('Accept-Ranges', 'bytes')]
+        if compressible:
+            headers += self.encoding_headers(encoding, etag)
+        else:
+            headers.append(('ETag', etag))
+
+        not_modified = [h for h in headers if h[0] != 'Content-Encoding']
+        if self.headers.get('If-None-Match') is not None:
+            if self.etag_matches(etag):
+                return 304, not_modified, []
+        elif self.headers.get('If-Modified-Since'):
+            try:
+                since = email.utils.parsedate_to_datetime(self.headers['If-Modified-Since'])
+                if since.tzinfo is not None and int(st.st_mtime) <= since.timestamp():
+                    return 304, not_modified, []
+            except (TypeError, ValueError, IndexError, OverflowError):
+                pass
+
+        ranges = parse_range_header(self.headers.get('Range'), size)
+        if_range = self.headers.get('If-Range')
+        if ranges is not None and if_range:
+            if_range = if_range.strip()
+            if if_range.startswith(('"', 'W/')):
+                valid = if_range == etag
+            else:
+                valid = if_range == last_modified
+            if not valid:
+                ranges = None
+
+        if ranges is None:
+            body = self.compressed_file(path, st, etag, encoding) if encoding else None
+            if body is not None:
+                headers += [('Content-type', ctype), ('Content-Length', str(len(body)))]
+                return 200, headers, [body]
+            if encoding:
+                headers = [h for h in headers if h[0] not in ('ETag', 'Content-Encoding')]
+                headers.append(('ETag', etag))
+            headers += [('Content-type', ctype), ('Content-Length', str(size))]
+            return 200, headers, [(0, size)]
+        if not ranges:
+            headers += [('Content-Range', f'bytes */{size}'), ('Content-Length', '0')]
+            return 416, headers, []
+        if len(ranges) == 1:
+            start, end = ranges[0]
+            headers += [('Content-type', ctype),
+                        ('Content-Range', f'bytes {start}-{end}/{size}'),
+                        ('Content-Length', str(end - start + 1))]
+            return 206, headers, [(start, end - start + 1)]
+
+        boundary = os.urandom(12).hex()
+        segments = []
+        for start, end in ranges:
+            segments.append((f'\r\n--{boundary}\r\n'
+                             f'Content-Type: {ctype}\r\n'
+                             f'Content-Range: bytes {start}-{end}/{size}\r\n\r\n').encode())
+            segments.append((start, end - start + 1))
+        segments.append(f'\r\n--{boundary}--\r\n'.encode())
+        length = sum(len(seg) if isinstance(seg, bytes) else seg[1] for seg in segments)
+        headers += [('Content-type', f'multipart/byteranges; boundary={boundary}'),
+                    ('Content-Length', str(length))]
+        return 206, headers, segments
+    
+    LISTING_PAGE_SIZE = 1000
+    LISTING_BATCH_SIZE = 200
+    LISTING_SORTS = ('mtime', 'name', 'size')
+    
+    def listing_params(self):
+        """Parse ?offset=&limit=&sort= for the listing page"""
+        query = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
+        
+        def int_param(name, default):
+            try:
+                return max(0, int(query[name][0]))
+            except (KeyError, ValueError):
+                return default
+        
+        sort = query.get('sort', ['mtime'])[0]
+        if sort.lstrip('-') not in self.LISTING_SORTS:
+            sort = 'mtime'
+        return int_param('offset', 0), int_param('limit', self.LISTING_PAGE_SIZE) or None, sort
+    
+    def scan_directory(self, path):
+        """Return (dir names, [(file name, stat)]) from a single scandir pass"""
+        dirs = []
+        files = []
+        with os.scandir(path) as it:
+            for entry in it:
+                if entry.name == STATE_DIR:
+                    continue
+                try:
+                    if entry.is_dir():
+                        dirs.append(entry.name)
+                    else:
+                        files.append((entry.name, entry.stat()))
+                except OSError:
+                    continue
+        return dirs, files
+    
+    def sort_files(self, files, sort):
+        """Sort files in place; newest, A-Z and largest first, '-' reverses"""
+        key = sort.lstrip('-')
+        if key == 'name':
+            files.sort(key=lambda item: item[0])
+        elif key == 'size':
+            files.sort(key=lambda item: item[1].st_size, reverse=True)
+        else:
+            files.sort(key=lambda item: item[1].st_mtime, reverse=True)
+        if sort.startswith('-'):
+            files.reverse()
+    
+    def render_dir_item(self, path, name):
+        """HTML for one directory entry"""
+        url = quote(name)
+        relpath = os.path.relpath(os.path.join(path, name), os.getcwd()).replace(os.sep, '/')
+        return f'''
+                <li class="file-item dir">
+                    <span class="file-icon" onclick="location.href='{url}'">📁</span>
+                    <div class="file-info" onclick="location.href='{url}'">
+                        <a href="{url}" class="file-link" onclick="event.stopPropagation()">{name}/</a>
+                    </div>
+                    <a class="archive-link" href="/api/archive?dir={quote(relpath)}" title="ZIP으로 받기">ZIP</a>
+                </li>
+            '''
+    
+    def render_file_item(self, path, name, st, recent_threshold):
+        """HTML for one file entry"""
+        url = quote(name)
+        full_path = os.path.join(path, name)
+        size_str = self.format_size(st.st_size)
+        icon = self.get_file_icon(name)
+        
+        mtime = st.st_mtime
+        time_str = datetime.fromtimestamp(mtime).strftime('%Y-%m-%d %H:%M')
+        
+        # File hash (first 16 chars of SHA256) from the hash index
+        file_hash = self.hash_index.lookup(full_path, st)[:16]
+
+        # Check if this is a recent file (uploaded within last 5 minutes)
+        is_recent = mtime > recent_threshold
+        recent_class = ' recent' if is_recent else ''
+        new_badge = ' <span class="new-badge">NEW</span>' if is_recent else ''
+
+        return f'''
+                <li class="file-item{recent_class}" data-name="{html.escape(name)}" data-hash="{file_hash}" data-mtime="{mtime}" data-size="{st.st_size}">
+                    <input type="checkbox" class="select-box" value="{html.escape(name)}" onclick="event.stopPropagation()" onchange="updateSelection()">
+                    <span class="file-icon" onclick="location.href='{url}'">{icon}</span>
+                    <div class="file-info" onclick="location.href='{url}'">
+                        <a href="{url}" class="file-link" onclick="event.stopPropagation()">{name}</a>{new_badge}
+                        <div class="file-meta">
+                            <span class="file-size">{size_str}</span>
+                            <span class="file-time">{time_str}</span>
+                            <span class="file-hash" title="해시: {file_hash}">🔒 {file_hash[:8]}...</span>
+                        </div>
+                    </div>
+                    <button class="delete-btn" onclick="deleteFile('{name}')">삭제</button>
+                </li>
+            '''
+    
+    def render_pager(self, offset, limit, sort, total):
+        """Previous/next links when the listing spans several pages"""
+        if limit is None or (offset == 0 and total <= limit):
+            return ''
+        links = []
+        if offset > 0:
+            query = urllib.parse.urlencode({'offset': max(0, offset - limit), 'limit': limit, 'sort': sort})
+            links.append(f'<a href="?{query}">← 이전</a>')
+        links.append(f'<span>{offset + 1}-{min(offset + limit, total)} / {total}</span>')
+        if offset + limit < total:
+            query = urllib.parse.urlencode({'offset': offset + limit, 'limit': limit, 'sort': sort})
+            links.append(f'<a href="?{query}">다음 →</a>')
+        return '<div class="pager">' + ' '.join(links) + '</div>'
+    
+    def generate_html(self, path, offset=0, limit=None, sort='mtime'):
+        """Generate the HTML page in pieces
+
+        The page head is yielded before the directory is scanned so the
+        first byte goes out immediately; items follow in batches.
+        """
+        cursor = self.changes.cursor
+        reldir = os.path.relpath(path, os.getcwd()).replace(os.sep, '/')
+        if reldir == '.':
+            reldir = ''
+        # 삭제 API는 서버 루트의 파일만 다루므로 루트 목록에서만 선택 삭제 버튼을 표시
+        delete_selected = ('<button id="deleteSelected" class="danger" onclick="deleteSelected()" '
+                           'style="display: none;"></button>' if not reldir else '')
+        yield f'''<!DOCTYPE html>
+<html lang="ko">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>File Server</title>
+    <link rel="stylesheet" href="{self.static_assets.url('style.css')}">
+</head>
+<body data-cursor="{cursor}" data-dir="{html.escape(reldir)}" data-hash-worker="{self.static_assets.url('hash-worker.js')}">
+    <div class="container">
+        <div class="header">
+            <h1>📁 File Server</h1>
+            <div class="archive-bar">
+                <a href="/api/archive?dir={quote(reldir)}">📦 전체 ZIP</a>
+                <button id="downloadSelected" onclick="downloadSelected()" style="display: none;"></button>
+                {delete_selected}
+            </div>
+            <input type="search" id="searchInput" class="search-input" placeholder="🔍 하위 폴더까지 파일 이름 검색" oninput="searchChanged(this.value)">
+        </div>
+        <div class="upload-section">
+            <form enctype="multipart/form-data" method="post" id="uploadForm">
+                <div class="upload-zone" onclick="document.getElementById('fileInput').click()" ondrop="dropHandler(event);" ondragover="dragOverHandler(event);" ondragleave="dragLeaveHandler(event);">
+                    <label class="file-input-label">
+                        <div class="icon">📤</div>
+                        <div class="text">클릭하거나 파일을 드래그하세요</div>
+                        <div class="sub">여러 파일 동시 선택 가능</div>
+                        <input type="file" name="file" id="fileInput" onchange="fileSelected(this)" multiple>
+                    </label>
+                </div>
+                <div class="selected-file" id="selectedFile" style="display: none;">
+                    <span class="selected-file-name" id="fileName"></span>
+                </div>
+            </form>
+        </div>
+        <div class="search-panel" id="searchPanel" style="display: none;">
+            <div class="search-summary" id="searchSummary"></div>
+            <ul class="search-results" id="searchResults"></ul>
+        </div>
+        <div class="files-section">
+            <ul class="file-list">'''
+        
+        try:
+            dirs, files = self.scan_directory(path)
+        except OSError:
+            dirs, files = [], []
+        
+        # Directories alphabetically first, then files in the requested order
+        dirs.sort()
+        self.sort_files(files, sort)
+        entries = [(name, None) for name in dirs] + files
+        total = len(entries)
+        page = entries[offset:offset + limit] if limit is not None else entries[offset:]
+        
+        # Check if file was uploaded in the last 5 minutes
+        recent_threshold = time.time() - (5 * 60)  # 5 minutes ago
+        
+        batch = []
+        for name, st in page:
+            if st is None:
+                batch.append(self.render_dir_item(path, name))
+            else:
+                batch.append(self.render_file_item(path, name, st, recent_threshold))
+            if len(batch) >= self.LISTING_BATCH_SIZE:
+                yield ''.join(batch)
+                batch = []
+        if batch:
+            yield ''.join(batch)
+        
+        if not total:
+            yield '<div class="empty">No files uploaded yet</div>'
+        
+        yield f'''
+            </ul>
+            {self.render_pager(offset, limit, sort, total)}
+        </div>
+    </div>
+    <script src="{self.static_assets.url('app.js')}"></script>
+</body>
+</html>'''
+    
+    def format_size(self, size):
+        """Format file size in human-readable format"""
+        if size < 1024:
+            return f"{size} B"
+        elif size < 1024 * 1024:
+            return f"{size/1024:.1f} KB"
+        else:
+            return f"{size/(1024*1024):.1f} MB"
+    
+    def get_file_icon(self, filename):
+        """Get appropriate icon for file type"""
+        name_lower = filename.lower()
+        if name_lower.endswith(IMAGE_EXTENSIONS):
+            return '🖼️'
+        elif name_lower.endswith(VIDEO_EXTENSIONS):
+            return '🎬'
+        elif name_lower.endswith('.pdf'):
+            return '📄'
+        elif name_lower.endswith(('.ppt', '.pptx')):
+            return '📊'
+        elif name_lower.endswith(('.doc', '.docx')):
+            return '📝'
+        elif name_lower.endswith(ARCHIVE_EXTENSIONS):
+            return '🗜️'
+        else:
+            return '📎'
+
+
+class MeteredFile:
+    """File object proxy that adds the bytes read or written to a metrics counter"""
+
+    def __init__(self, file, counter):
+        self.file = file
+        self.counter = counter
+
+    def read(self, *args):
+        data = self.file.read(*args)
+        METRICS.add(self.counter, len(data))
+        return data
+
+    def read1(self, *args):
+        data = self.file.read1(*args)
+        METRICS.add(self.counter, len(data))
+        return data
+
+    def readline(self, *args):
+        data = self.file.readline(*args)
+        METRICS.add(self.counter, len(data))
+        return data
+
+    def readinto(self, buffer):
+        count = self.file.readinto(buffer)
+        METRICS.add(self.counter, count or 0)
+        return count
+
+    def write(self, data):
+        METRICS.add(self.counter, len(data))
+        return self.file.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+
+class AuthUploadHandler(FileServerMixin, http.server.SimpleHTTPRequestHandler):
+    """HTTP request handler with upload and authentication support
+
+    Speaks HTTP/1.1: every response is framed by Content-Length or chunked
+    encoding, so the connection is reused until the client asks to close,
+    it stays idle for keepalive_timeout, or max_keepalive_requests is hit.
+    """
+    
+    protocol_version = 'HTTP/1.1'
+    # 헤더와 본문을 따로 쓰므로 Nagle이 켜져 있으면 연결 재사용 시 응답마다 지연 ACK(~40ms)를 기다림
+    disable_nagle_algorithm = True
+    # 대기 중인 연결에 워커를 넘기기 전에 유휴 연결을 기다려 주는 시간(초)
+    idle_grace = 1.0
+    UNAUTHORIZED_BODY = b'401 Unauthorized'
+    
+    def setup(self):
+        super().setup()
+        self.rfile = MeteredFile(self.rfile, 'received_bytes_total')
+        self.wfile = MeteredFile(self.wfile, 'sent_bytes_total')
+    
+    def handle(self):
+        """Serve requests on one connection until it should be closed"""
+        self.requests_handled = 0
+        self.close_connection = False
+        while not self.close_connection:
+            if not self.wait_for_request():
+                break
+            self.command = self.status_code = None
+            started = time.perf_counter()
+            self.handle_one_request()
+            # 어느 처리기든 본문을 읽지 않고 끝났으면 남은 바이트가 다음 요청으로 해석되지 않게 종료
+            if self.command and self.body_pending():
+                self.close_connection = True
+            self.record_request(started)
+            self.requests_handled += 1
+    
+    def wait_for_request(self):
+        """Wait for the next request on the connection; False to close it instead
+
+        Gives up after keepalive_timeout, and, once a request has been
+        served, early when the server is shutting down or when the
+        connection has been idle for idle_grace while other connections are
+        waiting for this worker.
+        """
+        started = time.monotonic()
+        deadline = started + self.keepalive_timeout
+        try:
+            # 파이프라이닝된 요청이 이미 버퍼에 있으면 바로 처리
+            self.connection.settimeout(0)
+            if self.rfile.peek(1):
+                return True
+            while True:
+                now = time.monotonic()
+                remaining = deadline - now
+                if remaining <= 0:
+                    return False
+                if self.requests_handled:
+                    if self.server.draining:
+                        return False
+                    # 응답 직후 바로 끊으면 이미 보낸 다음 요청이 유실되므로 잠시 기다린 뒤 양보
+                    if now - started >= self.idle_grace and self.server.has_waiting_connections():
+                        return False
+                self.connection.settimeout(min(remaining, self.idle_grace))
+                try:
+                    # 데이터 또는 EOF; EOF는 handle_one_request가 처리
+                    self.connection.recv(1, socket.MSG_PEEK)
+                    return True
+                except TimeoutError:
+                    continue
+        except OSError:
+            return False
+        finally:
+            try:
+                self.connection.settimeout(self.timeout)
+            except OSError:
+                pass
+    
+    def parse_request(self):
+        self.body_read = False
+        # 헤더를 끝까지 읽지 못하면 None으로 남아 이전 요청의 헤더를 보지 않음
+        self.headers = None
+        return super().parse_request()
+    
+    def body_pending(self):
+        """True if the request has a body, or header lines, that no handler has consumed"""
+        if self.headers is None:
+            return True
+        if self.body_read:
+            return False
+        return (self.headers.get('Content-Length', '0').strip() not in ('', '0')
+                or 'Transfer-Encoding' in self.headers)
+    
+    def send_response(self, code, message=None):
+        """Start a response and tell the client whether the connection stays open"""
+        self.status_code = code
+        super().send_response(code, message)
+        if (self.requests_handled + 1 >= self.max_keepalive_requests or self.server.draining
+                or self.server.has_waiting_connections()
+                or (self.command and self.body_pending())):
+            # 다른 연결이 워커를 기다리거나 읽지 않은 본문이 남아 있으면 이 응답에서 종료를 알림
+            self.close_connection = True
+        if self.close_connection:
+            self.send_header('Connection', 'close')
+        elif self.request_version != 'HTTP/1.1':
+            self.send_header('Connection', 'keep-alive')
+    
+    def send_error(self, code, message=None, explain=None):
+        """Send an error page; unlike the stock one, keep the connection when possible"""
+        try:
+            shortmsg, longmsg = self.responses[code]
+        except KeyError:
+            shortmsg, longmsg = '???', '???'
+        if message is None:
+            message = shortmsg
+        if explain is None:
+            explain = longmsg
+        self.log_error("code %d, message %s", code, message)
+        # 요청을 해석하지 못했거나 읽지 않은 본문이 남아 있으면
+        # 다음 요청과 구분할 수 없으므로 연결 종료
+        if not self.command or self.body_pending():
+            self.close_connection = True
+        body = (self.error_message_format % {
+            'code': code,
+            'message': html.escape(message, quote=False),
+            'explain': html.escape(explain, quote=False),
+        }).encode('UTF-8', 'replace')
+        self.send_response(code, message)
+        self.send_header('Content-Type', self.error_content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+    
+    def do_AUTHHEAD(self):
+        """Send authentication headers"""
+        if self.body_pending():
+            self.close_connection = True
+        self.send_response(401)
+        self.send_header('WWW-Authenticate', 'Basic realm="File Server"')
+        self.send_header('Content-type', 'text/html')
+        self.send_header('Content-Length', str(len(self.UNAUTHORIZED_BODY)))
+        self.end_headers()
+    
+    def authenticate(self):
+        """Check authentication"""
+        token = self.check_auth(self.headers.get('Authorization'))
+        if token is None:
+            self.do_AUTHHEAD()
+            if self.command != 'HEAD':
+                self.wfile.write(self.UNAUTHORIZED_BODY)
+            return False
+
+        # 인증 성공시 쿠키 설정
+        self.auth_cookie = f"auth={token}; Path=/; HttpOnly"
+        return True
+    
+    def list_directory(self, path):
+        """Stream the directory listing with upload form"""
+        if not self.authenticate():
+            return None
+        
+        if not os.path.isdir(path):
+            self.send_error(404, "Directory not found")
+            return None
+        offset, limit, sort = self.listing_params()
+        etag = self.listing_etag(path, offset, limit, sort)
+        if self.etag_matches(etag):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return None
+        
+        # Send response headers; HTTP/1.1 clients get chunked framing,
+        # otherwise the end of the body is marked by closing the connection
+        chunked = self.request_version == 'HTTP/1.1' and self.protocol_version == 'HTTP/1.1'
+        if not chunked:
+            self.close_connection = True
+        encoding = self.response_encoding()
+        self.send_response(200)
+        self.send_header("Content-type", "text/html; charset=utf-8")
+        for name, value in self.encoding_headers(encoding, etag):
+            self.send_header(name, value)
+        self.send_header("Cache-Control", "no-cache")
+        if hasattr(self, 'auth_cookie'):
+            self.send_header("Set-Cookie", self.auth_cookie)
+        if chunked:
+            self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        if self.command == 'HEAD':
+            return None
+        
+        # Stream HTML as it is generated
+        out = ChunkedWriter(self.wfile) if chunked else self.wfile
+        compressor = StreamCompressor(encoding) if encoding else None
+        for piece in self.generate_html(path, offset, limit, sort):
+            data = piece.encode('utf-8')
+            if compressor is not None:
+                data = compressor.compress(data)
+            if data:
+                out.write(data)
+        if compressor is not None:
+            out.write(compressor.finish())
+        if chunked:
+            out.close()
+        self.hash_index.save()
+        return None
+    
+    def do_GET(self):
+        """Handle GET requests"""
+        if self.path.startswith('/static/'):
+            return self.send_static()
+        if self.is_state_path():
+            if not self.authenticate():
+                return
+            self.send_error(404, "File not found")
+            return
+        if self.path.split('?', 1)[0] == '/':
+            return self.list_directory(os.getcwd())
+        elif self.path.split('?', 1)[0] == '/api/files':
+            return self.get_file_hashes()
+        elif self.path == '/api/dedup':
+            if not self.authenticate():
+                return
+            return self.send_json(200, self.dedup_stats())
+        elif self.path == '/metrics':
+            if not self.authenticate():
+                return
+            return self.send_metrics()
+        elif self.path == '/api/limits':
+            if not self.authenticate():
+                return
+            return self.send_json(200, self.transfer_limits.status())
+        elif self.path.split('?', 1)[0] == '/api/search':
+            if not self.authenticate():
+                return
+            return self.send_json(*self.search_response())
+        elif self.path.split('?', 1)[0] == '/api/events':
+            if not self.authenticate():
+                return
+            return self.handle_events()
+        elif self.path.split('?', 1)[0] == '/api/archive':
+            if not self.authenticate():
+                return
+            return self.send_archive(urllib.parse.urlsplit(self.path).query)
+        elif self.is_upload_session_path():
+            if not self.authenticate():
+                return
+            return self.handle_upload_session()
+        else:
+            if not self.authenticate():
+                return
+            self.transfer = None
+            try:
+                return http.server.SimpleHTTPRequestHandler.do_GET(self)
+            finally:
+                if self.transfer is not None:
+                    self.transfer.close()
+    
+    def do_PUT(self):
+        """Handle PUT requests (upload session chunks and single-file uploads)"""
+        if not self.authenticate():
+            return
+        if self.path.startswith('/api/files/'):
+            return self.handle_file_put()
+        if not self.is_upload_session_path():
+            self.send_error(405, "Method not allowed")
+            return
+        self.handle_upload_session()
+    
+    def handle_expect_100(self):
+        """Defer the interim 100 response to send_continue
+
+        The stock handler answers 100 right after the headers, before the
+        request could be answered without its body (hash precheck, size and
+        admission limits).
+        """
+        return True
+    
+    def send_continue(self):
+        """Send the interim 100 response if the client waits for one"""
+        if (self.headers.get('Expect', '').lower() == '100-continue'
+                and self.request_version == 'HTTP/1.1'):
+            self.wfile.write(b'HTTP/1.1 100 Continue\r\n\r\n')
+            self.wfile.flush()
+    
+    def handle_file_put(self):
+        """PUT /api/files/<name>: skip the body when X-Content-SHA256 is already stored"""
+        try:
+            filename, digest, precheck = self.file_put_params()
+        except ValueError as e:
+            self.close_connection = True
+            self.send_json(400, {'error': str(e)})
+            return
+        try:
+            length = int(self.headers.get('content-length', '0' if precheck else ''))
+        except ValueError:
+            self.send_error(411, "Length required")
+            return
+        result = self.file_put_precheck(filename, digest, precheck)
+        if result is not None:
+            # 본문을 받지 않았으므로 연결을 재사용하지 않음
+            if length:
+                self.close_connection = True
+            self.send_json(*result)
+            return
+        try:
+            transfer = self.admit_transfer('upload', length)
+        except AdmissionError as e:
+            self.refuse_transfer(e)
+            return
+        with transfer:
+            try:
+                sink = UploadSink(os.getcwd(), filename, self.hash_index, self.blob_store)
+            except OSError as e:
+                self.close_connection = True
+                self.send_json(500, {'error': f"Cannot store upload: {e.strerror or e}"})
+                return
+            self.send_continue()
+            self.body_read = True
+            remaining = length
+            try:
+                while remaining > 0:
+                    size = min(remaining, UPLOAD_CHUNK_SIZE)
+                    self.pace(transfer, size)
+                    chunk = self.rfile.read(size)
+                    if not chunk:
+                        raise ConnectionError("Client disconnected during upload")
+                    remaining -= len(chunk)
+                    sink.write(chunk)
+            except ConnectionError:
+                sink.abort()
+                self.close_connection = True
+                return
+            except BaseException:
+                sink.abort()
+                raise
+        self.send_json(*self.finish_file_put(sink, digest))
+    
+    def do_DELETE(self):
+        """Handle DELETE requests (abort an upload session)"""
+        if not self.authenticate():
+            return
+        if not self.is_upload_session_path():
+            self.send_error(405, "Method not allowed")
+            return
+        self.handle_upload_session()
+    
+    def send_static(self):
+        """Serve a versioned UI asset; no authentication, they hold no data"""
+        code, headers, body = self.static_response()
+        self.send_response(code)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+    
+    def send_archive(self, query):
+        """Stream a ZIP/tar of a directory or a selection of files"""
+        try:
+            fmt, filename, entries = self.archive_request(urllib.parse.parse_qs(query))
+        except ValueError as e:
+            self.send_error(400, str(e))
+            return
+        except OSError:
+            self.send_error(404, "Directory not found")
+            return
+        try:
+            transfer = self.admit_transfer('download')
+        except AdmissionError as e:
+            self.refuse_transfer(e)
+            return
+        with transfer:
+            chunked = self.request_version == 'HTTP/1.1' and self.protocol_version == 'HTTP/1.1'
+            if not chunked:
+                self.close_connection = True
+            self.send_response(200)
+            for name, value in self.archive_headers(fmt, filename):
+                self.send_header(name, value)
+            if chunked:
+                self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            out = ChunkedWriter(self.wfile) if chunked else self.wfile
+            for segment in ArchiveStream(entries, fmt):
+                if isinstance(segment, bytes):
+                    if segment:
+                        self.pace(transfer, len(segment))
+                        out.write(segment)
+                    continue
+                path, length = segment
+                if chunked:
+                    self.wfile.write(b'%x\r\n' % length)
+                self.copy_file_slice(path, length, transfer)
+                if chunked:
+                    self.wfile.write(b'\r\n')
+            if chunked:
+                out.close()
     
-    auth_key = ""
-    upload_dir = ""
+    def copy_file_slice(self, path, length, transfer):
+        """Send exactly length bytes of a file, zero-padded if it shrank meanwhile"""
+        sent = 0
+        try:
+            f = open(path, 'rb')
+        except OSError:
+            f = None
+        if f is not None:
+            with f:
+                if self.use_sendfile:
+                    self.wfile.flush()
+                    while sent < length:
+                        size = transfer.slice(length - sent)
+                        self.pace(transfer, size)
+                        count = self.connection.sendfile(f, sent, size)
+                        METRICS.add('sent_bytes_total', count)
+                        if not count:
+                            break
+                        sent += count
+                else:
+                    while sent < length:
+                        size = min(length - sent, UPLOAD_CHUNK_SIZE)
+                        self.pace(transfer, size)
+                        chunk = f.read(size)
+                        if not chunk:
+                            break
+                        self.wfile.write(chunk)
+                        sent += len(chunk)
+        while sent < length:
+            pad = min(length - sent, UPLOAD_CHUNK_SIZE)
+            self.wfile.write(b'\0' * pad)
+            sent += pad
     
-    def do_AUTHHEAD(self):
-        """Send authentication headers"""
-        self.send_response(401)
-        self.send_header('WWW-Authenticate', 'Basic realm="File Server"')
-        self.send_header('Content-type', 'text/html')
+    def handle_events(self):
+        """Open a Server-Sent Events stream and hand the socket to the broadcaster"""
+        cursor = self.events_cursor()
+        self.close_connection = True
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
         self.end_headers()
+        payload, cursor = self.change_events(cursor)
+        self.wfile.write(b'retry: 3000\n\n' + (payload or b''))
+        self.wfile.flush()
+        self.server.detach(self.request)
+        self.event_stream.add(self.request, cursor)
     
-    def authenticate(self):
-        """Check authentication"""
-        auth_header = self.headers.get('Authorization')
-        if auth_header is None or not auth_header.startswith('Basic '):
-            self.do_AUTHHEAD()
-            self.wfile.write(b'401 Unauthorized')
+    def send_metrics(self):
+        """Send the Prometheus metrics of every worker"""
+        body, encoding = self.metrics_body()
+        self.send_response(200)
+        self.send_header('Content-type', self.METRICS_CONTENT_TYPE)
+        for name, value in self.encoding_headers(encoding):
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def send_json(self, code, payload, headers=()):
+        """Send a JSON response"""
+        body, encoding = self.encode_body(json.dumps(payload).encode())
+        self.send_response(code)
+        self.send_header('Content-type', 'application/json')
+        for name, value in [*self.encoding_headers(encoding), *headers]:
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def refuse_transfer(self, error):
+        """Answer a transfer refused by the limits; an unread body ends the connection"""
+        if self.body_pending():
+            self.close_connection = True
+        self.send_json(*self.refusal(error))
+    
+    @staticmethod
+    def pace(transfer, amount):
+        """Sleep for as long as the transfer's rate limit asks for amount bytes"""
+        delay = transfer.throttle(amount)
+        if delay:
+            time.sleep(delay)
+    
+    def read_json_body(self, limit=64 * 1024):
+        """Read a small JSON request body"""
+        length = int(self.headers.get('content-length') or 0)
+        if length > limit:
+            raise ValueError("Request body too large")
+        self.send_continue()
+        self.body_read = True
+        try:
+            return json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            raise ValueError("Invalid JSON body")
+    
+    def handle_upload_session(self):
+        """Handle the resumable chunked upload API under /api/uploads"""
+        parts = self.upload_session_route()
+        if self.command == 'PUT' and len(parts) == 2:
+            return self.receive_chunk(parts[0], parts[1])
+        body = None
+        if self.command == 'POST' and not parts:
+            try:
+                body = self.read_json_body()
+            except ValueError as e:
+                self.close_connection = True
+                self.send_json(400, {'error': str(e)})
+                return
+        self.send_json(*self.upload_session_action(parts, body))
+    
+    def receive_chunk(self, session_id, index):
+        """Stream one chunk body to its offset in the session's data file"""
+        try:
+            length = int(self.headers.get('content-length', ''))
+        except ValueError:
+            self.send_error(411, "Length required")
+            return
+        try:
+            writer = self.upload_sessions.open_chunk(session_id, index, length)
+        except (KeyError, FileNotFoundError):
+            self.close_connection = True
+            self.send_json(404, {'error': 'Unknown upload session'})
+            return
+        except ValueError as e:
+            self.close_connection = True
+            self.send_json(400, {'error': str(e)})
+            return
+        except OSError as e:
+            self.close_connection = True
+            self.send_json(409, {'error': f"Cannot open upload session data: {e.strerror or e}"})
+            return
+        try:
+            transfer = self.admit_transfer('upload', length)
+        except AdmissionError as e:
+            writer.abort()
+            self.refuse_transfer(e)
+            return
+        try:
+            with transfer:
+                self.send_continue()
+                self.body_read = True
+                remaining = length
+                while remaining > 0:
+                    size = min(remaining, UPLOAD_CHUNK_SIZE)
+                    self.pace(transfer, size)
+                    chunk = self.rfile.read(size)
+                    if not chunk:
+                        raise ConnectionError("Client disconnected during chunk upload")
+                    remaining -= len(chunk)
+                    writer.write(chunk)
+        except BaseException:
+            writer.abort()
+            raise
+        try:
+            writer.commit(self.headers.get('X-Chunk-SHA256'))
+        except KeyError:
+            self.send_json(404, {'error': 'Unknown upload session'})
+            return
+        except ValueError as e:
+            self.send_json(400, {'error': str(e)})
+            return
+        self.send_json(200, self.upload_sessions.status(writer.session))
+    
+    def do_HEAD(self):
+        """Handle HEAD requests"""
+        if self.path.startswith('/static/'):
+            return self.send_static()
+        if not self.authenticate():
+            return
+        if self.is_state_path():
+            self.send_error(404, "File not found")
+            return
+        return http.server.SimpleHTTPRequestHandler.do_HEAD(self)
+    
+    def send_head(self):
+        """Send headers for a file with Range/ETag support; directories use the stock path"""
+        self.segments = None
+        path = self.translate_path(self.path)
+        if os.path.isdir(path) or path.endswith('/'):
+            return super().send_head()
+        try:
+            f = open(path, 'rb')
+        except OSError:
+            self.send_error(404, "File not found")
+            return None
+        try:
+            code, headers, self.segments = self.prepare_file_response(path, os.fstat(f.fileno()))
+            if self.command == 'GET' and code in (200, 206):
+                try:
+                    self.transfer = self.admit_transfer('download')
+                except AdmissionError as e:
+                    f.close()
+                    self.refuse_transfer(e)
+                    return None
+            self.send_response(code)
+            for name, value in headers:
+                self.send_header(name, value)
+            self.end_headers()
+        except BaseException:
+            f.close()
+            raise
+        if code not in (200, 206):
+            f.close()
+            return None
+        return f
+    
+    def copyfile(self, source, outputfile):
+        """Copy the segments chosen by send_head
+
+        File slices go through socket.sendfile (zero-copy os.sendfile, with
+        its own send() fallback for TLS sockets) when writing to the client
+        socket; other outputs get a plain read/write loop.
+        """
+        if self.segments is None:
+            return super().copyfile(source, outputfile)
+        zero_copy = self.use_sendfile and outputfile is self.wfile
+        transfer = self.transfer
+        for segment in self.segments:
+            if isinstance(segment, bytes):
+                self.pace(transfer, len(segment))
+                outputfile.write(segment)
+                continue
+            offset, length = segment
+            if zero_copy and length:
+                outputfile.flush()
+                while length > 0:
+                    size = transfer.slice(length)
+                    self.pace(transfer, size)
+                    sent = self.connection.sendfile(source, offset, size)
+                    METRICS.add('sent_bytes_total', sent)
+                    if not sent:
+                        break
+                    offset += sent
+                    length -= sent
+                continue
+            source.seek(offset)
+            while length > 0:
+                size = min(length, UPLOAD_CHUNK_SIZE)
+                self.pace(transfer, size)
+                chunk = source.read(size)
+                if not chunk:
+                    break
+                outputfile.write(chunk)
+                length -= len(chunk)
+    
+    def get_file_hashes(self):
+        """Return JSON with file hashes, or changes since a cursor"""
+        if not self.authenticate():
+            return
+        
+        etag, cursor, payload = self.file_hashes_response()
+        if payload is None:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        
+        body, encoding = self.encode_body(json.dumps(payload).encode())
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        for name, value in self.encoding_headers(encoding, etag):
+            self.send_header(name, value)
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('X-Files-Cursor', cursor)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def do_POST(self):
+        """Handle POST requests (upload and delete)"""
+        if not self.authenticate():
+            return
+        
+        if self.is_upload_session_path():
+            return self.handle_upload_session()
+        
+        if self.path == '/api/delete':
+            try:
+                body = self.read_json_body(limit=4 * 1024 * 1024)
+            except ValueError as e:
+                self.close_connection = True
+                self.send_json(400, {'error': str(e)})
+                return
+            self.send_json(*self.batch_delete(body))
+            return
+        
+        if self.path.split('?', 1)[0] == '/api/archive':
+            try:
+                length = int(self.headers.get('content-length') or 0)
+            except ValueError:
+                length = -1
+            if length < 0:
+                self.send_error(411, "Length required")
+                return
+            if length > 1024 * 1024:
+                self.send_error(413, "Request body too large")
+                return
+            self.send_continue()
+            self.body_read = True
+            return self.send_archive(self.rfile.read(length).decode('utf-8', 'replace'))
+        
+        # Handle delete request
+        if '?delete=' in self.path:
+            filename = unquote(self.path.split('?delete=')[1])
+            try:
+                self.delete_file(filename)
+            except ValueError as e:
+                self.send_error(400, str(e))
+                return
+            except Exception as e:
+                self.send_error(500, f"Error deleting file: {e}")
+                return
+            self.send_response(303)
+            self.send_header('Location', '/')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        
+        # Handle file upload
+        ctype, pdict = parse_header(self.headers.get('content-type', ''))
+        if ctype != 'multipart/form-data' or not pdict.get('boundary'):
+            self.send_error(400, "Bad request: not multipart/form-data")
+            return
+        
+        try:
+            length = int(self.headers.get('content-length', ''))
+        except ValueError:
+            self.send_error(411, "Length required")
+            return
+        
+        try:
+            transfer = self.admit_transfer('upload', length)
+        except AdmissionError as e:
+            self.refuse_transfer(e)
+            return
+        
+        try:
+            with transfer:
+                upload = MultipartUpload(pdict['boundary'], os.getcwd(), self.hash_index,
+                                         self.file_locks, self.changes, self.blob_store)
+                self.receive_multipart(upload, length, transfer)
+        except ValueError as e:
+            self.close_connection = True
+            if self.wants_json():
+                self.send_json(*self.upload_result(upload, f"Bad request: {e}"))
+            else:
+                self.send_error(400, f"Bad request: {e}")
+            return
+        except ConnectionError:
+            self.close_connection = True
+            return
+        
+        for filename, digest in upload.uploaded:
+            print(f"Uploaded file: {filename} (sha256 {digest[:16]})")
+        
+        # API 클라이언트에는 파일별 결과를 JSON으로 응답
+        if self.wants_json():
+            self.send_json(*self.upload_result(upload))
+            return
+        
+        if not upload.uploaded:
+            self.send_error(400, "No file field in form.")
+            return
+        
+        self.send_response(303)
+        self.send_header('Location', '/')
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+    
+    def receive_multipart(self, upload, length, transfer):
+        """Stream the multipart body into upload, which collects per-file results"""
+        self.send_continue()
+        self.body_read = True
+        remaining = length
+        try:
+            while remaining > 0 and not upload.finished:
+                size = min(remaining, UPLOAD_CHUNK_SIZE)
+                self.pace(transfer, size)
+                chunk = self.rfile.read(size)
+                if not chunk:
+                    raise ConnectionError("Client disconnected during upload")
+                remaining -= len(chunk)
+                upload.feed(chunk)
+            if not upload.finished:
+                raise ValueError("Truncated multipart body")
+            # 마지막 경계 이후 남은 바이트(epilogue)는 버린다
+            while remaining > 0:
+                chunk = self.rfile.read(min(remaining, UPLOAD_CHUNK_SIZE))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+        except BaseException:
+            upload.abort()
+            raise
+
+
+def translate_path(root, path):
+    """Map a URL path onto the filesystem under root, like SimpleHTTPRequestHandler"""
+    path = path.split('?', 1)[0].split('#', 1)[0]
+    trailing_slash = path.rstrip().endswith('/')
+    try:
+        path = unquote(path, errors='surrogatepass')
+    except UnicodeDecodeError:
+        path = unquote(path)
+    path = posixpath.normpath(path)
+    result = root
+    for word in filter(None, path.split('/')):
+        if os.path.dirname(word) or word in (os.curdir, os.pardir):
+            continue
+        result = os.path.join(result, word)
+    if trailing_slash:
+        result += '/'
+    return result
+
+
+class MeteredStreamReader:
+    """asyncio StreamReader proxy that counts received bytes in the metrics"""
+
+    def __init__(self, reader):
+        self.reader = reader
+
+    async def read(self, n=-1):
+        data = await self.reader.read(n)
+        METRICS.add('received_bytes_total', len(data))
+        return data
+
+    async def readexactly(self, n):
+        data = await self.reader.readexactly(n)
+        METRICS.add('received_bytes_total', len(data))
+        return data
+
+    async def readuntil(self, separator=b'\n'):
+        data = await self.reader.readuntil(separator)
+        METRICS.add('received_bytes_total', len(data))
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self.reader, name)
+
+
+class MeteredStreamWriter:
+    """asyncio StreamWriter proxy that counts sent bytes in the metrics"""
+
+    def __init__(self, writer):
+        self.writer = writer
+
+    def write(self, data):
+        METRICS.add('sent_bytes_total', len(data))
+        self.writer.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self.writer, name)
+
+
+class AsyncConnection(FileServerMixin):
+    """One client connection served by the asyncio engine
+
+    Socket I/O is non-blocking; anything that touches the disk (stat, open,
+    read, write, hashing, listing) runs in the loop's default executor.
+    """
+
+    READ_CHUNK_SIZE = 256 * 1024
+    draining = False
+
+    def __init__(self, reader, writer):
+        self.reader = MeteredStreamReader(reader)
+        self.writer = MeteredStreamWriter(writer)
+        self.client_address = writer.get_extra_info('peername') or ('-', 0)
+        self.keep_alive = False
+        self.idle = True
+        self.chunked = None
+
+    async def run_blocking(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    async def serve(self):
+        """Read and answer requests until the client goes away"""
+        try:
+            for served in range(self.max_keepalive_requests):
+                if served and self.draining:
+                    break
+                self.idle = True
+                try:
+                    head = await asyncio.wait_for(self.reader.readuntil(b'\r\n\r\n'),
+                                                  self.keepalive_timeout)
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError,
+                        asyncio.TimeoutError, ConnectionError):
+                    break
+                self.idle = False
+                self.command = self.status_code = None
+                started = time.perf_counter()
+                if not self.parse_request(head):
+                    await self.send_error(400, "Bad request")
+                    self.record_request(started)
+                    break
+                if served + 1 >= self.max_keepalive_requests or self.draining:
+                    self.keep_alive = False
+                try:
+                    await self.dispatch()
+                except ConnectionError:
+                    break
+                self.record_request(started)
+                if not self.keep_alive:
+                    break
+        finally:
+            self.writer.close()
+
+    def parse_request(self, head):
+        """Parse the request line and headers"""
+        request_line, _, header_block = head.partition(b'\r\n')
+        try:
+            self.command, self.path, self.request_version = \
+                request_line.decode('latin-1').split()
+        except ValueError:
             return False
+        self.chunked = None
+        self.headers = email.parser.BytesParser(_class=http.client.HTTPMessage).parsebytes(header_block)
+        connection = self.headers.get('Connection', '').lower()
+        if self.request_version == 'HTTP/1.1':
+            self.keep_alive = connection != 'close'
+        else:
+            self.keep_alive = connection == 'keep-alive'
+        return True
+
+    async def send_response(self, code, headers=(), body=b''):
+        """Write the status line and headers, plus body if given
+
+        Content-Length defaults to ``len(body)``; callers streaming a body
+        themselves pass their own Content-Length or the stream_framing() headers.
+        """
+        self.status_code = code
+        lines = [f"HTTP/1.1 {code} {http.HTTPStatus(code).phrase}"]
+        for name, value in headers:
+            lines.append(f"{name}: {value}")
+        framed = (self.chunked is not None
+                  or any(name.lower() in ('content-length', 'transfer-encoding') for name, _ in headers))
+        if code != 304 and not framed:
+            lines.append(f"Content-Length: {len(body)}")
+        lines.append("Connection: " + ("keep-alive" if self.keep_alive else "close"))
+        self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1', 'replace'))
+        if body and self.command != 'HEAD':
+            self.writer.write(body)
+        await self.writer.drain()
+        print(f'{self.writer.get_extra_info("peername", ("-",))[0]} - - '
+              f'"{self.command} {self.path} {self.request_version}" {code} -')
+
+    def stream_framing(self):
+        """Headers for a body streamed with write_chunk: chunked, or close-delimited for HTTP/1.0"""
+        self.chunked = self.request_version == 'HTTP/1.1'
+        if not self.chunked:
+            # HTTP/1.0 클라이언트는 chunked를 모르므로 연결을 닫아 본문 끝을 알림
+            self.keep_alive = False
+            return []
+        return [('Transfer-Encoding', 'chunked')]
+
+    def write_chunk(self, data):
+        """Write one piece of a streamed body"""
+        if self.chunked:
+            self.writer.write(b'%x\r\n%s\r\n' % (len(data), data))
+        else:
+            self.writer.write(data)
+
+    def end_chunks(self):
+        """Finish a streamed body"""
+        if self.chunked:
+            self.writer.write(b'0\r\n\r\n')
+
+    async def send_error(self, code, message=None):
+        body = f"{code} {message or http.HTTPStatus(code).phrase}".encode('utf-8')
+        await self.send_response(code, [('Content-type', 'text/plain; charset=utf-8')], body)
+
+    async def discard_body(self):
+        """Skip an unread request body so the connection stays in sync"""
+        try:
+            remaining = int(self.headers.get('Content-Length', 0))
+        except ValueError:
+            self.keep_alive = False
+            return
+        while remaining > 0:
+            chunk = await self.reader.read(min(remaining, self.READ_CHUNK_SIZE))
+            if not chunk:
+                raise ConnectionError("Client disconnected")
+            remaining -= len(chunk)
+
+    async def authenticate(self):
+        """Answer 401 unless the request carries valid credentials"""
+        token = self.check_auth(self.headers.get('Authorization'))
+        if token is None:
+            await self.send_response(401, [('WWW-Authenticate', 'Basic realm="File Server"'),
+                                           ('Content-type', 'text/html')], b'401 Unauthorized')
+            return None
+        return token
+
+    async def dispatch(self):
+        """Route a parsed request"""
+        if self.command not in ('GET', 'HEAD', 'POST', 'PUT', 'DELETE'):
+            await self.discard_body()
+            await self.send_error(501, "Unsupported method")
+            return
+        if self.command in ('GET', 'HEAD') and self.path.startswith('/static/'):
+            await self.discard_body()
+            await self.send_response(*self.static_response())
+            return
+        token = self.check_auth(self.headers.get('Authorization'))
+        if token is None:
+            if self.headers.get('Content-Length', '0') != '0':
+                self.keep_alive = False
+            await self.authenticate()
+            return
+        if self.is_upload_session_path():
+            await self.handle_upload_session()
+            return
+        if self.path.split('?', 1)[0] == '/api/archive' and self.command in ('GET', 'HEAD', 'POST'):
+            if self.command == 'POST':
+                try:
+                    length = int(self.headers.get('Content-Length') or 0)
+                except ValueError:
+                    length = -1
+                if not 0 <= length <= 1024 * 1024:
+                    self.keep_alive = False
+                    await self.send_error(413, "Request body too large")
+                    return
+                query = (await self.reader.readexactly(length)).decode('utf-8', 'replace')
+            else:
+                await self.discard_body()
+                query = urllib.parse.urlsplit(self.path).query
+            await self.send_archive(query)
+            return
+        if self.command == 'POST' and self.path == '/api/delete':
+            try:
+                body = await self.read_json_body(limit=4 * 1024 * 1024)
+            except ValueError as e:
+                self.keep_alive = False
+                await self.send_json(400, {'error': str(e)})
+                return
+            await self.send_json(*await self.run_blocking(self.batch_delete, body))
+            return
+        if self.command == 'POST':
+            await self.handle_post()
+            return
+        if self.command == 'PUT' and self.path.startswith('/api/files/'):
+            await self.handle_file_put()
+            return
+        await self.discard_body()
+        if self.command in ('PUT', 'DELETE'):
+            await self.send_error(405, "Method not allowed")
+        elif self.is_state_path():
+            await self.send_error(404, "File not found")
+        elif self.path == '/api/dedup':
+            await self.send_json(200, await self.run_blocking(self.dedup_stats))
+        elif self.path == '/api/limits':
+            await self.send_json(200, await self.run_blocking(self.transfer_limits.status))
+        elif self.path == '/metrics':
+            body, encoding = await self.run_blocking(self.metrics_body)
+            await self.send_response(200, [('Content-type', self.METRICS_CONTENT_TYPE),
+                                           *self.encoding_headers(encoding)], body)
+        elif self.path.split('?', 1)[0] == '/api/events':
+            await self.send_events()
+        elif self.path.split('?', 1)[0] == '/api/search':
+            await self.send_json(*await self.run_blocking(self.search_response))
+        elif self.path.split('?', 1)[0] == '/api/files':
+            etag, cursor, payload = await self.run_blocking(self.file_hashes_response)
+            if payload is None:
+                await self.send_response(304, [('ETag', etag)])
+                return
+            body, encoding = await self.run_blocking(self.encode_body, json.dumps(payload).encode())
+            await self.send_response(200, [('Content-type', 'application/json'),
+                                           *self.encoding_headers(encoding, etag),
+                                           ('Cache-Control', 'no-cache'), ('X-Files-Cursor', cursor)],
+                                     body)
+        else:
+            await self.handle_get(token)
+
+    async def send_json(self, code, payload, headers=()):
+        body = json.dumps(payload).encode()
+        encoding = None
+        if len(body) >= self.compress_min_size:
+            body, encoding = await self.run_blocking(self.encode_body, body)
+        await self.send_response(code, [('Content-type', 'application/json'),
+                                        *self.encoding_headers(encoding), *headers], body)
+
+    @staticmethod
+    async def pace(transfer, amount):
+        """Sleep for as long as the transfer's rate limit asks for amount bytes"""
+        delay = transfer.throttle(amount)
+        if delay:
+            await asyncio.sleep(delay)
+
+    async def handle_upload_session(self):
+        """Handle the resumable chunked upload API under /api/uploads"""
+        parts = self.upload_session_route()
+        if self.command == 'PUT' and len(parts) == 2:
+            await self.receive_chunk(parts[0], parts[1])
+            return
+        body = None
+        if self.command == 'POST' and not parts:
+            try:
+                body = await self.read_json_body()
+            except ValueError as e:
+                self.keep_alive = False
+                await self.send_json(400, {'error': str(e)})
+                return
+        else:
+            await self.discard_body()
+        await self.send_json(*await self.run_blocking(self.upload_session_action, parts, body))
+
+    async def read_json_body(self, limit=64 * 1024):
+        """Read a small JSON request body"""
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+        except ValueError:
+            raise ValueError("Invalid Content-Length")
+        if length > limit:
+            raise ValueError("Request body too large")
+        try:
+            data = await self.reader.readexactly(length)
+        except asyncio.IncompleteReadError:
+            raise ConnectionError("Client disconnected")
+        try:
+            return json.loads(data or b'{}')
+        except ValueError:
+            raise ValueError("Invalid JSON body")
+
+    async def receive_chunk(self, session_id, index):
+        """Stream one chunk body to its offset in the session's data file"""
+        try:
+            length = int(self.headers.get('Content-Length', ''))
+        except ValueError:
+            self.keep_alive = False
+            await self.send_error(411, "Length required")
+            return
+        try:
+            writer = await self.run_blocking(self.upload_sessions.open_chunk, session_id, index, length)
+        except (KeyError, ValueError, OSError) as e:
+            self.keep_alive = False
+            if isinstance(e, (KeyError, FileNotFoundError)):
+                await self.send_json(404, {'error': 'Unknown upload session'})
+            elif isinstance(e, ValueError):
+                await self.send_json(400, {'error': str(e)})
+            else:
+                await self.send_json(409, {'error': f"Cannot open upload session data: {e.strerror or e}"})
+            return
+        try:
+            transfer = await self.run_blocking(self.admit_transfer, 'upload', length)
+        except AdmissionError as e:
+            writer.abort()
+            self.keep_alive = False
+            await self.send_json(*self.refusal(e))
+            return
+        if self.headers.get('Expect', '').lower() == '100-continue':
+            self.writer.write(b'HTTP/1.1 100 Continue\r\n\r\n')
+        remaining = length
+        try:
+            with transfer:
+                while remaining > 0:
+                    chunk = await self.reader.read(min(remaining, self.READ_CHUNK_SIZE))
+                    if not chunk:
+                        raise ConnectionError("Client disconnected during chunk upload")
+                    remaining -= len(chunk)
+                    await self.run_blocking(writer.write, chunk)
+                    if remaining:
+                        # 마지막 조각 뒤에는 기다리지 않고 바로 응답
+                        await self.pace(transfer, len(chunk))
+            await self.run_blocking(writer.commit, self.headers.get('X-Chunk-SHA256'))
+        except KeyError:
+            await self.send_json(404, {'error': 'Unknown upload session'})
+            return
+        except ValueError as e:
+            await self.send_json(400, {'error': str(e)})
+            return
+        except BaseException:
+            writer.abort()
+            raise
+        await self.send_json(200, self.upload_sessions.status(writer.session))
+
+    async def handle_get(self, token):
+        """Serve a directory listing or a file"""
+        path = translate_path(os.getcwd(), self.path)
+        if os.path.isdir(path):
+            url_path = self.path.split('?', 1)[0]
+            if not url_path.endswith('/'):
+                await self.send_response(301, [('Location', url_path + '/')])
+                return
+            for index in ('index.html', 'index.htm'):
+                if os.path.isfile(os.path.join(path, index)):
+                    path = os.path.join(path, index)
+                    break
+            else:
+                await self.send_listing(path, token)
+                return
+        await self.send_file(path)
+
+    async def send_listing(self, path, token):
+        """Stream the listing page with chunked transfer encoding (close-delimited for HTTP/1.0)"""
+        offset, limit, sort = self.listing_params()
+        try:
+            etag = await self.run_blocking(self.listing_etag, path, offset, limit, sort)
+        except OSError:
+            await self.send_error(404, "Directory not found")
+            return
+        if self.etag_matches(etag):
+            await self.send_response(304, [('ETag', etag)])
+            return
+        encoding = self.response_encoding()
+        await self.send_response(200, [('Content-type', 'text/html; charset=utf-8'),
+                                       *self.encoding_headers(encoding, etag),
+                                       ('Cache-Control', 'no-cache'),
+                                       ('Set-Cookie', f"auth={token}; Path=/; HttpOnly"),
+                                       *self.stream_framing()])
+        if self.command == 'HEAD':
+            return
+        pieces = self.generate_html(path, offset, limit, sort)
+        compressor = StreamCompressor(encoding) if encoding else None
+
+        def next_piece():
+            piece = next(pieces, None)
+            if piece is None:
+                return None
+            data = piece.encode('utf-8')
+            return compressor.compress(data) if compressor is not None else data
+
+        while True:
+            data = await self.run_blocking(next_piece)
+            if data is None:
+                break
+            if data:
+                self.write_chunk(data)
+                await self.writer.drain()
+        if compressor is not None:
+            data = compressor.finish()
+            if data:
+                self.write_chunk(data)
+        self.end_chunks()
+        await self.writer.drain()
+        await self.run_blocking(self.hash_index.save)
+
+    async def send_file(self, path):
+        """Stream a file (or the requested ranges) from the executor in bounded chunks"""
+        if path.endswith('/'):
+            await self.send_error(404, "File not found")
+            return
+        try:
+            f = await self.run_blocking(open, path, 'rb')
+        except OSError:
+            await self.send_error(404, "File not found")
+            return
+        try:
+            code, headers, segments = await self.run_blocking(
+                self.prepare_file_response, path, os.fstat(f.fileno()))
+            if self.command == 'HEAD' or code not in (200, 206):
+                await self.send_response(code, headers)
+                return
+            try:
+                transfer = self.admit_transfer('download')
+            except AdmissionError as e:
+                await self.send_json(*self.refusal(e))
+                return
+            with transfer:
+                await self.send_response(code, headers)
+                await self.send_segments(f, segments, transfer)
+        finally:
+            f.close()
+
+    async def send_segments(self, f, segments, transfer):
+        """Write the body segments chosen by prepare_file_response"""
+        loop = asyncio.get_running_loop()
+        for segment in segments:
+            if isinstance(segment, bytes):
+                await self.pace(transfer, len(segment))
+                self.writer.write(segment)
+                continue
+            offset, length = segment
+            if self.use_sendfile and length:
+                # os.sendfile on plain sockets, chunked read/write fallback otherwise
+                await self.writer.drain()
+                while length > 0:
+                    size = transfer.slice(length)
+                    await self.pace(transfer, size)
+                    sent = await loop.sendfile(self.writer.transport, f, offset, size)
+                    METRICS.add('sent_bytes_total', sent)
+                    if not sent:
+                        break
+                    offset += sent
+                    length -= sent
+                continue
+            await self.run_blocking(f.seek, offset)
+            while length > 0:
+                size = min(length, self.READ_CHUNK_SIZE)
+                await self.pace(transfer, size)
+                chunk = await self.run_blocking(f.read, size)
+                if not chunk:
+                    break
+                self.writer.write(chunk)
+                length -= len(chunk)
+                await self.writer.drain()
+        await self.writer.drain()
+
+    async def send_archive(self, query):
+        """Stream a ZIP/tar with chunked framing, file bodies via loop.sendfile"""
+        try:
+            fmt, filename, entries = await self.run_blocking(
+                self.archive_request, urllib.parse.parse_qs(query))
+        except ValueError as e:
+            await self.send_error(400, str(e))
+            return
+        except OSError:
+            await self.send_error(404, "Directory not found")
+            return
+        if self.command == 'HEAD':
+            await self.send_response(200, [*self.archive_headers(fmt, filename),
+                                           *self.stream_framing()])
+            return
+        try:
+            transfer = self.admit_transfer('download')
+        except AdmissionError as e:
+            await self.send_json(*self.refusal(e))
+            return
+        with transfer:
+            await self.send_response(200, [*self.archive_headers(fmt, filename),
+                                           *self.stream_framing()])
+            await self.send_archive_body(entries, fmt, transfer)
+
+    async def send_archive_body(self, entries, fmt, transfer):
+        """Write the archive as chunks, file bodies sliced to the rate limit"""
+        loop = asyncio.get_running_loop()
+        segments = iter(ArchiveStream(entries, fmt))
+        while True:
+            segment = await self.run_blocking(next, segments, None)
+            if segment is None:
+                break
+            if isinstance(segment, bytes):
+                if segment:
+                    await self.pace(transfer, len(segment))
+                    self.write_chunk(segment)
+                    await self.writer.drain()
+                continue
+            path, length = segment
+            if self.chunked:
+                self.writer.write(b'%x\r\n' % length)
+            sent = 0
+            try:
+                f = await self.run_blocking(open, path, 'rb')
+            except OSError:
+                f = None
+            if f is not None:
+                try:
+                    if self.use_sendfile:
+                        await self.writer.drain()
+                        while sent < length:
+                            size = transfer.slice(length - sent)
+                            await self.pace(transfer, size)
+                            count = await loop.sendfile(self.writer.transport, f, sent, size)
+                            METRICS.add('sent_bytes_total', count)
+                            if not count:
+                                break
+                            sent += count
+                    else:
+                        while sent < length:
+                            size = min(length - sent, self.READ_CHUNK_SIZE)
+                            await self.pace(transfer, size)
+                            chunk = await self.run_blocking(f.read, size)
+                            if not chunk:
+                                break
+                            self.writer.write(chunk)
+                            sent += len(chunk)
+                            await self.writer.drain()
+                finally:
+                    f.close()
+            # 전송 중 파일이 줄어들었으면 0으로 채워 아카이브 형식을 유지
+            while sent < length:
+                pad = min(length - sent, self.READ_CHUNK_SIZE)
+                self.writer.write(b'\0' * pad)
+                sent += pad
+                await self.writer.drain()
+            if self.chunked:
+                self.writer.write(b'\r\n')
+        self.end_chunks()
+        await self.writer.drain()
+
+    async def send_events(self):
+        """Server-Sent Events stream of listing changes, until the client goes away"""
+        cursor = self.events_cursor()
+        self.keep_alive = False
+        await self.send_response(200, [('Content-Type', 'text/event-stream'),
+                                       ('Cache-Control', 'no-cache'),
+                                       *self.stream_framing()])
+        payload, cursor = await self.run_blocking(self.change_events, cursor)
+        data = b'retry: 3000\n\n' + (payload or b'')
+        while True:
+            self.write_chunk(data)
+            await self.writer.drain()
+            await self.changes.wait_async(int(cursor.rpartition('.')[2]), EventBroadcaster.HEARTBEAT)
+            payload, cursor = await self.run_blocking(self.change_events, cursor)
+            data = payload or b': ping\n\n'
+
+    async def handle_file_put(self):
+        """PUT /api/files/<name>: skip the body when X-Content-SHA256 is already stored"""
+        try:
+            filename, digest, precheck = self.file_put_params()
+        except ValueError as e:
+            self.keep_alive = False
+            await self.send_json(400, {'error': str(e)})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', '0' if precheck else ''))
+        except ValueError:
+            self.keep_alive = False
+            await self.send_error(411, "Length required")
+            return
+        result = await self.run_blocking(self.file_put_precheck, filename, digest, precheck)
+        if result is not None:
+            # 본문을 받지 않았으므로 연결을 재사용하지 않음
+            if length:
+                self.keep_alive = False
+            await self.send_json(*result)
+            return
+        try:
+            transfer = await self.run_blocking(self.admit_transfer, 'upload', length)
+        except AdmissionError as e:
+            self.keep_alive = False
+            await self.send_json(*self.refusal(e))
+            return
+        with transfer:
+            try:
+                sink = await self.run_blocking(UploadSink, os.getcwd(), filename, self.hash_index,
+                                               self.blob_store)
+            except OSError as e:
+                self.keep_alive = False
+                await self.send_json(500, {'error': f"Cannot store upload: {e.strerror or e}"})
+                return
+            if self.headers.get('Expect', '').lower() == '100-continue':
+                self.writer.write(b'HTTP/1.1 100 Continue\r\n\r\n')
+                await self.writer.drain()
+            remaining = length
+            try:
+                while remaining > 0:
+                    chunk = await self.reader.read(min(remaining, self.READ_CHUNK_SIZE))
+                    if not chunk:
+                        raise ConnectionError("Client disconnected during upload")
+                    remaining -= len(chunk)
+                    await self.run_blocking(sink.write, chunk)
+                    if remaining:
+                        # 마지막 조각 뒤에는 기다리지 않고 바로 응답
+                        await self.pace(transfer, len(chunk))
+            except BaseException:
+                await self.run_blocking(sink.abort)
+                raise
+        await self.send_json(*await self.run_blocking(self.finish_file_put, sink, digest))
+
+    async def handle_post(self):
+        """Handle upload and ?delete= requests"""
+        if '?delete=' in self.path:
+            await self.discard_body()
+            filename = unquote(self.path.split('?delete=')[1])
+            try:
+                await self.run_blocking(self.delete_file, filename)
+            except ValueError as e:
+                await self.send_error(400, str(e))
+                return
+            except Exception as e:
+                await self.send_error(500, f"Error deleting file: {e}")
+                return
+            await self.send_response(303, [('Location', '/')])
+            return
+
+        ctype, pdict = parse_header(self.headers.get('content-type', ''))
+        try:
+            length = int(self.headers.get('content-length', ''))
+        except ValueError:
+            self.keep_alive = False
+            await self.send_error(411, "Length required")
+            return
+        if ctype != 'multipart/form-data' or not pdict.get('boundary'):
+            await self.discard_body()
+            await self.send_error(400, "Bad request: not multipart/form-data")
+            return
+        try:
+            transfer = await self.run_blocking(self.admit_transfer, 'upload', length)
+        except AdmissionError as e:
+            self.keep_alive = False
+            await self.send_json(*self.refusal(e))
+            return
+        with transfer:
+            await self.receive_multipart(pdict['boundary'], length, transfer)
+
+    async def receive_multipart(self, boundary, length, transfer):
+        """Stream a multipart upload body and answer with the per-file results"""
+        if self.headers.get('Expect', '').lower() == '100-continue':
+            self.writer.write(b'HTTP/1.1 100 Continue\r\n\r\n')
+            await self.writer.drain()
+
+        upload = MultipartUpload(boundary, os.getcwd(), self.hash_index,
+                                 self.file_locks, self.changes, self.blob_store)
+        remaining = length
+        try:
+            while remaining > 0 and not upload.finished:
+                # 작은 패킷을 모아 executor 호출 횟수를 줄인다
+                buffered = []
+                size = 0
+                while remaining > 0 and size < self.READ_CHUNK_SIZE:
+                    chunk = await self.reader.read(min(remaining, self.READ_CHUNK_SIZE - size))
+                    if not chunk:
+                        raise ConnectionError("Client disconnected during upload")
+                    buffered.append(chunk)
+                    size += len(chunk)
+                    remaining -= len(chunk)
+                await self.run_blocking(upload.feed, b''.join(buffered))
+                if remaining:
+                    await self.pace(transfer, size)
+            if not upload.finished:
+                raise ValueError("Truncated multipart body")
+            while remaining > 0:
+                chunk = await self.reader.read(min(remaining, self.READ_CHUNK_SIZE))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+        except ValueError as e:
+            await self.run_blocking(upload.abort)
+            self.keep_alive = False
+            if self.wants_json():
+                await self.send_json(*self.upload_result(upload, f"Bad request: {e}"))
+            else:
+                await self.send_error(400, f"Bad request: {e}")
+            return
+        except BaseException:
+            await self.run_blocking(upload.abort)
+            raise
+
+        for filename, digest in upload.uploaded:
+            print(f"Uploaded file: {filename} (sha256 {digest[:16]})")
+        if self.wants_json():
+            await self.send_json(*self.upload_result(upload))
+            return
+        if not upload.uploaded:
+            await self.send_error(400, "No file field in form.")
+            return
+        await self.send_response(303, [('Location', '/')])
+
+
+async def serve_async(port, workers, reuse_port=False, shutdown_timeout=None):
+    """Run the asyncio engine until cancelled
+
+    With shutdown_timeout set, SIGTERM/SIGINT instead stop accepting,
+    close idle keep-alive connections and give requests in progress up to
+    shutdown_timeout seconds to finish.
+    """
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(concurrent.futures.ThreadPoolExecutor(max_workers=workers))
+    connections = {}
+
+    METRICS.collectors.append(lambda: [('active_connections', (), len(connections))])
 
-        token = auth_header.split()[1]
-        if token != self.auth_key:
-            self.do_AUTHHEAD()
-            self.wfile.write(b'401 Unauthorized')
-            return False
+    async def on_connect(reader, writer):
+        connection = AsyncConnection(reader, writer)
+        task = asyncio.current_task()
+        connections[task] = connection
+        try:
+            await connection.serve()
+        except asyncio.CancelledError:
+            # 종료 시 취소된 연결: 스트림 콜백이 트레이스백을 남기지 않도록 여기서 삼킴
+            writer.close()
+        finally:
+            connections.pop(task, None)
 
-        # 인증 성공시 쿠키 설정
-        self.auth_cookie = f"auth={token}; Path=/; HttpOnly"
-        return True
-    
-    def list_directory(self, path):
-        """Generate directory listing with upload form"""
-        if not self.authenticate():
-            return None
-        
+    server = await asyncio.start_server(on_connect, host='', port=port, reuse_address=True,
+                                        reuse_port=reuse_port, backlog=1024)
+    if shutdown_timeout is None:
+        async with server:
+            await server.serve_forever()
+        return
+
+    stop = asyncio.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, stop.set)
+    await stop.wait()
+    server.close()
+    AsyncConnection.draining = True
+    for task, connection in list(connections.items()):
+        if connection.idle:
+            task.cancel()
+    if connections:
+        _, pending = await asyncio.wait(list(connections), timeout=shutdown_timeout)
+        for task in pending:
+            task.cancel()
+    await server.wait_closed()
+
+
+class DetachableServerMixin:
+    """Lets a handler keep its socket open after the request (used by /api/events)"""
+
+    def __init__(self, *args, **kwargs):
+        self.detached = set()
+        super().__init__(*args, **kwargs)
+
+    def detach(self, request):
+        """Leave request open when the handler returns; the caller now owns it"""
+        self.detached.add(request)
+
+    def shutdown_request(self, request):
+        if request in self.detached:
+            self.detached.discard(request)
+            return
+        super().shutdown_request(request)
+
+
+class GracefulServerMixin:
+    """Counts open connections so shutdown can wait for them to finish
+
+    A connection is counted from verify_request (right after accept) until
+    shutdown_request, which covers connections still queued for a worker.
+    While ``draining``, handlers stop keeping connections alive.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.active = 0
+        self.active_changed = threading.Condition()
+        self.draining = False
+        super().__init__(*args, **kwargs)
+
+    def collect_metrics(self):
+        """Open connections for /metrics"""
+        return [('active_connections', (), self.active)]
+
+    def verify_request(self, request, client_address):
+        with self.active_changed:
+            self.active += 1
+        return super().verify_request(request, client_address)
+
+    def shutdown_request(self, request):
+        try:
+            super().shutdown_request(request)
+        finally:
+            with self.active_changed:
+                self.active -= 1
+                self.active_changed.notify_all()
+
+    def drain(self, timeout):
+        """Stop keep-alive and wait up to timeout for open connections; True if all finished"""
+        self.draining = True
+        with self.active_changed:
+            return self.active_changed.wait_for(lambda: self.active <= 0, timeout)
+
+
+class SingleServer(GracefulServerMixin, DetachableServerMixin, socketserver.TCPServer):
+    """One request at a time"""
+
+    allow_reuse_address = True
+
+    def has_waiting_connections(self):
+        """True if a client is waiting in the listen backlog"""
+        readable, _, _ = select.select([self.socket], [], [], 0)
+        return bool(readable)
+
+
+class ThreadedServer(GracefulServerMixin, DetachableServerMixin, socketserver.ThreadingTCPServer):
+    """One thread per connection"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def has_waiting_connections(self):
+        return False
+
+
+class WorkerPoolServer(GracefulServerMixin, DetachableServerMixin, socketserver.TCPServer):
+    """Serve connections from a fixed pool of worker threads
+
+    Accepted connections wait in a bounded queue; when it is full the
+    connection is answered with 503 immediately instead of piling up.
+    """
+
+    allow_reuse_address = True
+    request_queue_size = 128
+
+    def __init__(self, server_address, handler_class, workers=16, queue_size=64):
+        self.pending = queue.Queue(maxsize=queue_size)
+        self.workers = []
+        super().__init__(server_address, handler_class)
+        for i in range(workers):
+            thread = threading.Thread(target=self.worker, name=f'worker-{i}', daemon=True)
+            thread.start()
+            self.workers.append(thread)
+
+    def worker(self):
+        """Handle queued connections until a None sentinel arrives"""
+        while True:
+            item = self.pending.get()
+            if item is None:
+                break
+            request, client_address = item
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    def has_waiting_connections(self):
+        """True if accepted connections are queued for a worker"""
+        return not self.pending.empty()
+
+    def process_request(self, request, client_address):
+        try:
+            self.pending.put_nowait((request, client_address))
+        except queue.Full:
+            self.reject_request(request)
+            self.shutdown_request(request)
+
+    def reject_request(self, request):
+        """Answer 503 without reading the request"""
+        METRICS.add('rejected_connections_total')
+        body = b'503 Service Unavailable: server busy, retry later'
+        response = (b'HTTP/1.0 503 Service Unavailable\r\n'
+                    b'Content-Type: text/plain\r\n'
+                    b'Retry-After: 1\r\n'
+                    b'Connection: close\r\n'
+                    b'Content-Length: ' + str(len(body)).encode() + b'\r\n\r\n' + body)
         try:
-            file_list = os.listdir(path)
+            request.settimeout(1)
+            request.sendall(response)
         except OSError:
-            self.send_error(404, "Directory not found")
-            return None
-        
-        # Send response headers
-        self.send_response(200)
-        self.send_header("Content-type", "text/html; charset=utf-8")
-        if hasattr(self, 'auth_cookie'):
-            self.send_header("Set-Cookie", self.auth_cookie)
-        self.end_headers()
-        
-        # Generate HTML
-        html = self.generate_html(path, file_list)
-        self.wfile.write(html.encode('utf-8'))
-        return None
-    
-    def generate_html(self, path, file_list):
-        """Generate the HTML page"""
-        # Separate directories and files with modification time
-        dirs = []
-        files_with_time = []
-        for name in file_list:
-            full_path = os.path.join(path, name)
-            if os.path.isdir(full_path):
-                dirs.append(name)
-            else:
-                mtime = os.path.getmtime(full_path)
-                files_with_time.append((name, mtime))
+            pass
 
-        # Sort directories alphabetically
-        dirs.sort()
+    def server_close(self):
+        super().server_close()
+        for _ in self.workers:
+            try:
+                self.pending.put_nowait(None)
+            except queue.Full:
+                break
 
-        # Sort files by modification time (newest first)
-        files_with_time.sort(key=lambda x: x[1], reverse=True)
 
-        # Get the most recent file (if any)
-        most_recent_file = files_with_time[0][0] if files_with_time else None
+def make_server(args, reuse_port=False):
+    """Create the TCP server for the selected concurrency mode"""
+    address = ("", args.port)
+    kwargs = {}
+    if args.mode == 'pool':
+        server_class = WorkerPoolServer
+        kwargs = {'workers': args.workers, 'queue_size': args.queue_size}
+    elif args.mode == 'threaded':
+        server_class = ThreadedServer
+    else:
+        server_class = SingleServer
+    if reuse_port:
+        # 워커 프로세스마다 같은 포트에 따로 바인드하고 커널이 연결을 나눠 줌
+        server_class.allow_reuse_port = True
+    return server_class(address, AuthUploadHandler, **kwargs)
 
-        # Check if file was uploaded in the last 5 minutes
-        recent_threshold = time.time() - (5 * 60)  # 5 minutes ago
 
-        # Build file items HTML
-        items_html = ""
+class Supervisor:
+    """Runs --processes copies of the server and keeps them running
 
-        # Add directories first
-        for name in dirs:
-            url = quote(name)
-            items_html += f'''
-                <li class="file-item dir">
-                    <span class="file-icon" onclick="location.href='{url}'">📁</span>
-                    <div class="file-info" onclick="location.href='{url}'">
-                        <a href="{url}" class="file-link" onclick="event.stopPropagation()">{name}/</a>
-                    </div>
-                </li>
-            '''
+    Each worker is a forked process that binds the port itself with
+    SO_REUSEPORT, so the kernel spreads new connections across them. A
+    worker that exits is restarted, after RESTART_DELAY if it died right
+    after starting. SIGTERM/SIGINT are passed on to the workers, which
+    finish their requests in progress; a second signal kills them.
+    """
 
-        # Add files (sorted by modification time, newest first)
-        for name, mtime in files_with_time:
-            url = quote(name)
-            full_path = os.path.join(path, name)
-            size = os.path.getsize(full_path)
-            size_str = self.format_size(size)
-            icon = self.get_file_icon(name)
-            
-            # Get file modification time and hash
-            mtime = os.path.getmtime(full_path)
-            time_str = datetime.fromtimestamp(mtime).strftime('%Y-%m-%d %H:%M')
-            
-            # Calculate file hash (first 16 chars of SHA256)
-            with open(full_path, 'rb') as f:
-                file_hash = hashlib.sha256(f.read()).hexdigest()[:16]
-
-            # Check if this is a recent file (uploaded within last 5 minutes)
-            is_recent = mtime > recent_threshold
-            recent_class = ' recent' if is_recent else ''
-            new_badge = ' <span class="new-badge">NEW</span>' if is_recent else ''
-
-            items_html += f'''
-                <li class="file-item{recent_class}" data-hash="{file_hash}" data-mtime="{mtime}">
-                    <span class="file-icon" onclick="location.href='{url}'">{icon}</span>
-                    <div class="file-info" onclick="location.href='{url}'">
-                        <a href="{url}" class="file-link" onclick="event.stopPropagation()">{name}</a>{new_badge}
-                        <div class="file-meta">
-                            <span class="file-size">{size_str}</span>
-                            <span class="file-time">{time_str}</span>
-                            <span class="file-hash" title="해시: {file_hash}">🔒 {file_hash[:8]}...</span>
-                        </div>
-                    </div>
-                    <button class="delete-btn" onclick="deleteFile('{name}')">삭제</button>
-                </li>
-            '''
-        
-        if not dirs and not files_with_time:
-            items_html = '<div class="empty">No files uploaded yet</div>'
-        
-        return f'''<!DOCTYPE html>
-<html lang="ko">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>File Server</title>
-    <style>
-        * {{ margin: 0; padding: 0; box-sizing: border-box; -webkit-tap-highlight-color: transparent; }}
-        body {{ font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', sans-serif; background: #f5f5f5; padding: 10px; }}
-        .container {{ max-width: 900px; margin: 0 auto; background: white; border-radius: 8px; box-shadow: 0 2px 8px rgba(0,0,0,0.1); }}
-        .header {{ padding: 16px 20px; border-bottom: 1px solid #e0e0e0; }}
-        h1 {{ font-size: 20px; color: #333; }}
-        
-        .upload-section {{ padding: 16px; background: #fafafa; border-bottom: 1px solid #e0e0e0; }}
-        .upload-zone {{ border: 2px dashed #4CAF50; border-radius: 8px; padding: 24px; text-align: center; background: white; transition: all 0.3s; cursor: pointer; }}
-        .upload-zone.dragover {{ background: #e8f5e9; border-color: #2e7d32; }}
-        .upload-zone:hover {{ background: #f1f8f4; }}
-        .file-input-label {{ display: block; cursor: pointer; }}
-        .file-input-label .icon {{ font-size: 48px; margin-bottom: 12px; }}
-        .file-input-label .text {{ color: #666; font-size: 14px; }}
-        .file-input-label .sub {{ color: #999; font-size: 12px; margin-top: 4px; }}
-        input[type="file"] {{ display: none; }}
-        
-        .selected-file {{ margin-top: 12px; padding: 12px; background: #e8f5e9; border-radius: 4px; display: none; align-items: center; gap: 10px; }}
-        .selected-file.show {{ display: flex; }}
-        .selected-file-name {{ flex: 1; font-size: 14px; color: #2e7d32; word-break: break-all; }}
-        .upload-btn {{ padding: 8px 20px; background: #4CAF50; color: white; border: none; border-radius: 4px; cursor: pointer; font-size: 14px; font-weight: 500; }}
-        .upload-btn:active {{ transform: scale(0.98); }}
-        .cancel-btn {{ padding: 8px 16px; background: #f44336; color: white; border: none; border-radius: 4px; cursor: pointer; font-size: 14px; }}
-        
-        .files-section {{ padding: 12px; }}
-        .file-list {{ list-style: none; }}
-        .file-item {{ display: flex; align-items: center; padding: 12px; border-radius: 6px; margin-bottom: 4px; transition: all 0.3s; cursor: pointer; position: relative; }}
-        .file-item:active {{ background: #e0e0e0; }}
-        .file-item:hover {{ background: #f5f5f5; }}
-        .file-item.recent {{ background: #e8f5e9; border: 1px solid #4CAF50; animation: highlight 2s ease-in-out; }}
-        .file-item.recent:hover {{ background: #c8e6c9; }}
-        @keyframes highlight {{
-            0% {{ background: #a5d6a7; transform: scale(1.02); }}
-            50% {{ background: #c8e6c9; }}
-            100% {{ background: #e8f5e9; transform: scale(1); }}
-        }}
-        .new-badge {{ display: inline-block; margin-left: 8px; padding: 2px 6px; background: #4CAF50; color: white; border-radius: 3px; font-size: 10px; font-weight: bold; animation: pulse 1.5s infinite; }}
-        @keyframes pulse {{
-            0% {{ opacity: 1; }}
-            50% {{ opacity: 0.7; }}
-            100% {{ opacity: 1; }}
-        }}
-        .file-icon {{ margin-right: 12px; font-size: 24px; min-width: 24px; }}
-        .file-info {{ flex: 1; min-width: 0; }}
-        .file-link {{ text-decoration: none; color: #333; display: block; font-size: 14px; white-space: nowrap; overflow: hidden; text-overflow: ellipsis; }}
-        .file-meta {{ display: flex; gap: 12px; margin-top: 2px; flex-wrap: wrap; }}
-        .file-size {{ color: #888; font-size: 12px; }}
-        .file-time {{ color: #999; font-size: 12px; }}
-        .file-hash {{ color: #6a9fb5; font-size: 11px; font-family: monospace; cursor: help; }}
-        .uploading-overlay {{ position: fixed; top: 0; left: 0; right: 0; bottom: 0; background: rgba(0,0,0,0.7); display: none; align-items: center; justify-content: center; z-index: 1000; }}
-        .uploading-overlay.show {{ display: flex; }}
-        .uploading-box {{ background: white; padding: 30px; border-radius: 8px; text-align: center; min-width: 280px; }}
-        .spinner {{ border: 3px solid #f3f3f3; border-top: 3px solid #4CAF50; border-radius: 50%; width: 40px; height: 40px; animation: spin 1s linear infinite; margin: 0 auto 20px; }}
-        .upload-progress {{ margin-top: 16px; }}
-        .progress-bar {{ width: 100%; height: 8px; background: #e0e0e0; border-radius: 4px; overflow: hidden; }}
-        .progress-fill {{ height: 100%; background: #4CAF50; transition: width 0.3s; border-radius: 4px; }}
-        .progress-text {{ margin-top: 8px; font-size: 14px; color: #666; }}
-        .upload-filename {{ margin-bottom: 16px; font-size: 14px; color: #333; font-weight: 500; max-width: 250px; overflow: hidden; text-overflow: ellipsis; white-space: nowrap; }}
-        @keyframes spin {{ 0% {{ transform: rotate(0deg); }} 100% {{ transform: rotate(360deg); }} }}
-        .delete-btn {{ padding: 4px 8px; background: #f44336; color: white; border: none; border-radius: 4px; cursor: pointer; font-size: 12px; margin-left: 8px; opacity: 0.9; }}
-        .delete-btn:hover {{ opacity: 1; }}
-        .delete-btn:active {{ transform: scale(0.95); }}
-        .dir .file-link {{ color: #2196F3; font-weight: 500; }}
-        .empty {{ text-align: center; padding: 40px; color: #999; }}
-        
-        @media (max-width: 600px) {{
-            body {{ padding: 0; background: white; }}
-            .container {{ border-radius: 0; box-shadow: none; }}
-            .header {{ padding: 14px 16px; position: sticky; top: 0; background: white; z-index: 10; }}
-            h1 {{ font-size: 18px; }}
-            .upload-section {{ padding: 12px; }}
-            .file-item {{ padding: 14px 12px; }}
-            .file-icon {{ font-size: 20px; }}
-        }}
-        
-        @media (min-width: 601px) {{
-            .upload-zone {{ padding: 32px; }}
-            .file-input-label .icon {{ font-size: 64px; }}
-            .file-input-label .text {{ font-size: 16px; }}
-        }}
-    </style>
-</head>
-<body>
-    <div class="container">
-        <div class="header">
-            <h1>📁 File Server</h1>
-        </div>
-        <div class="upload-section">
-            <form enctype="multipart/form-data" method="post" id="uploadForm">
-                <div class="upload-zone" onclick="document.getElementById('fileInput').click()" ondrop="dropHandler(event);" ondragover="dragOverHandler(event);" ondragleave="dragLeaveHandler(event);">
-                    <label class="file-input-label">
-                        <div class="icon">📤</div>
-                        <div class="text">클릭하거나 파일을 드래그하세요</div>
-                        <div class="sub">여러 파일 동시 선택 가능</div>
-                        <input type="file" name="file" id="fileInput" onchange="fileSelected(this)" multiple>
-                    </label>
-                </div>
-                <div class="selected-file" id="selectedFile" style="display: none;">
-                    <span class="selected-file-name" id="fileName"></span>
-                </div>
-            </form>
-        </div>
-        <div class="files-section">
-            <ul class="file-list">
-                {items_html}
-            </ul>
-        </div>
-    </div>
-    <script>
-        function dragOverHandler(ev) {{
-            ev.preventDefault();
-            ev.currentTarget.classList.add('dragover');
-        }}
-        function dragLeaveHandler(ev) {{
-            ev.currentTarget.classList.remove('dragover');
-        }}
-        function dropHandler(ev) {{
-            ev.preventDefault();
-            ev.currentTarget.classList.remove('dragover');
-            const files = ev.dataTransfer.files;
-            if (files.length > 0) {{
-                document.getElementById('fileInput').files = files;
-                fileSelected(document.getElementById('fileInput'));
-            }}
-        }}
-        function fileSelected(input) {{
-            if (input.files.length > 0) {{
-                uploadFiles();
-            }}
-        }}
-        function cancelFile() {{
-            document.getElementById('fileInput').value = '';
-            document.getElementById('selectedFile').classList.remove('show');
-        }}
-        
-        let uploadQueue = [];
-        let currentUploadIndex = 0;
-
-        async function uploadFiles() {{
-            const fileInput = document.getElementById('fileInput');
-            uploadQueue = Array.from(fileInput.files);
-            currentUploadIndex = 0;
-
-            if (uploadQueue.length === 0) return;
-
-            // 즉시 업로드 준비 중 표시
-            showUploadPreparing(uploadQueue.length);
-
-            // 서버의 파일 해시 목록 가져오기
-            const response = await fetch('/api/files');
-            const serverFiles = await response.json();
-
-            // 모든 파일 처리
-            const filesToUpload = [];
-            for (let i = 0; i < uploadQueue.length; i++) {{
-                const file = uploadQueue[i];
-                const fileHash = await calculateFileHash(file);
-
-                // 같은 이름의 파일이 있는지 확인
-                if (serverFiles[file.name]) {{
-                    if (serverFiles[file.name] === fileHash.substring(0, 16)) {{
-                        // 동일한 파일이면 건너뛰기
-                        console.log(`스킵: ${{file.name}} (동일한 파일 존재)`);
-                        continue;
-                    }} else {{
-                        // 다른 해시면 파일명에 postfix 추가
-                        const nameParts = file.name.split('.');
-                        const ext = nameParts.length > 1 ? '.' + nameParts.pop() : '';
-                        const baseName = nameParts.join('.');
-                        const timestamp = new Date().getTime();
-                        const newName = `${{baseName}}_${{timestamp}}${{ext}}`;
-                        const newFile = new File([file], newName, {{ type: file.type }});
-                        filesToUpload.push(newFile);
-                    }}
-                }} else {{
-                    filesToUpload.push(file);
-                }}
-            }}
-
-            if (filesToUpload.length === 0) {{
-                alert('모든 파일이 이미 존재합니다.');
-                // 업로드 오버레이 제거
-                const overlay = document.getElementById('uploadOverlay');
-                if (overlay) {{
-                    overlay.remove();
-                }}
-                window.onbeforeunload = null; // 페이지 이탈 방지 해제
-                cancelFile();
-                return;
-            }}
+    RESTART_DELAY = 1.0
 
-            uploadQueue = filesToUpload;
-            uploadNextFile();
-        }}
+    def __init__(self, processes, target):
+        self.processes = processes
+        self.target = target
+        self.children = {}
+        self.started = {}
+        self.stopping = False
 
-        async function uploadNextFile() {{
-            if (currentUploadIndex >= uploadQueue.length) {{
-                // 모든 파일 업로드 완료
-                window.onbeforeunload = null; // 페이지 이탈 방지 해제
-                window.location.href = '/';
-                return;
-            }}
+    def spawn(self, slot):
+        """Fork a worker that runs target(slot) and exits"""
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                signal.signal(signal.SIGINT, signal.SIG_DFL)
+                self.target(slot)
+                code = 0
+            except BaseException:
+                traceback.print_exc()
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(code)
+        self.children[pid] = slot
+        self.started[slot] = time.monotonic()
 
-            const file = uploadQueue[currentUploadIndex];
-            submitUploadForm(file, currentUploadIndex, uploadQueue.length);
-        }}
-        
-        function formatBytes(bytes, decimals = 1) {{
-            if (bytes === 0) return '0 B';
-            const k = 1024;
-            const dm = decimals < 0 ? 0 : decimals;
-            const sizes = ['B', 'KB', 'MB', 'GB'];
-            const i = Math.floor(Math.log(bytes) / Math.log(k));
-            return parseFloat((bytes / Math.pow(k, i)).toFixed(dm)) + ' ' + sizes[i];
-        }}
-
-        function showUploadPreparing(totalFiles) {{
-            let overlay = document.getElementById('uploadOverlay');
-            if (!overlay) {{
-                overlay = document.createElement('div');
-                overlay.id = 'uploadOverlay';
-                overlay.className = 'uploading-overlay show';
-                document.body.appendChild(overlay);
-            }}
-
-            overlay.innerHTML = `
-                <div class="uploading-box">
-                    <div class="spinner"></div>
-                    <div style="margin-bottom: 8px; color: #666;">파일 ${{totalFiles}}개 준비 중...</div>
-                    <div class="upload-progress">
-                        <div class="progress-bar">
-                            <div class="progress-fill" style="width: 0%"></div>
-                        </div>
-                        <div class="progress-text">파일 해시 계산 중...</div>
-                    </div>
-                </div>
-            `;
-
-            // 페이지 이탈 방지
-            window.onbeforeunload = function(e) {{
-                return '파일 업로드가 진행 중입니다. 정말 페이지를 떠나시겠습니까?';
-            }};
-        }}
-
-        function submitUploadForm(file, index, total) {{
-            // 로딩 오버레이 추가 또는 업데이트
-            let overlay = document.getElementById('uploadOverlay');
-            if (!overlay) {{
-                overlay = document.createElement('div');
-                overlay.id = 'uploadOverlay';
-                overlay.className = 'uploading-overlay show';
-                document.body.appendChild(overlay);
-            }}
-
-            overlay.innerHTML = `
-                <div class="uploading-box">
-                    <div class="spinner"></div>
-                    <div style="margin-bottom: 8px; color: #666;">파일 ${{index + 1}} / ${{total}}</div>
-                    <div class="upload-filename">${{file.name}}</div>
-                    <div class="upload-progress">
-                        <div class="progress-bar">
-                            <div class="progress-fill" id="progressFill" style="width: 0%"></div>
-                        </div>
-                        <div class="progress-text" id="progressText">업로드 준비 중...</div>
-                    </div>
-                </div>
-            `;
-
-            // 페이지 이탈 방지
-            window.onbeforeunload = function(e) {{
-                return '파일 업로드가 진행 중입니다. 정말 페이지를 떠나시겠습니까?';
-            }};
-
-            // XMLHttpRequest로 업로드 진행률 추적
-            const xhr = new XMLHttpRequest();
-            const formData = new FormData();
-            formData.append('file', file);
-
-            let startTime = Date.now();
-            let lastLoaded = 0;
-
-            xhr.upload.addEventListener('progress', function(e) {{
-                if (e.lengthComputable) {{
-                    const percentComplete = Math.round((e.loaded / e.total) * 100);
-                    const loaded = formatBytes(e.loaded);
-                    const total = formatBytes(e.total);
-
-                    // 속도 계산
-                    const currentTime = Date.now();
-                    const timeDiff = (currentTime - startTime) / 1000; // 초 단위
-                    const speed = timeDiff > 0 ? e.loaded / timeDiff : 0;
-                    const speedStr = formatBytes(speed) + '/s';
-
-                    // 남은 시간 계산
-                    const remaining = e.total - e.loaded;
-                    const eta = speed > 0 ? remaining / speed : 0;
-                    let etaStr = '';
-                    if (eta > 60) {{
-                        etaStr = ` (약 ${{Math.ceil(eta / 60)}}분)`;
-                    }} else if (eta > 0) {{
-                        etaStr = ` (약 ${{Math.ceil(eta)}}초)`;
-                    }}
-
-                    document.getElementById('progressFill').style.width = percentComplete + '%';
-                    document.getElementById('progressText').innerHTML = `
-                        <div>${{percentComplete}}% - ${{loaded}} / ${{total}}</div>
-                        <div style="font-size: 12px; color: #888; margin-top: 4px;">${{speedStr}}${{etaStr}}</div>
-                    `;
-                }}
-            }});
-
-            xhr.addEventListener('load', function() {{
-                if (xhr.status === 303 || xhr.status === 200) {{
-                    currentUploadIndex++;
-                    uploadNextFile();
-                }} else if (xhr.status === 401) {{
-                    window.onbeforeunload = null;
-                    alert('인증이 필요합니다. 페이지를 새로고침하세요.');
-                    overlay.remove();
-                }} else {{
-                    // 오류 발생시 다음 파일로 진행
-                    console.error(`업로드 실패: ${{file.name}}`);
-                    currentUploadIndex++;
-                    uploadNextFile();
-                }}
-            }});
-
-            xhr.addEventListener('error', function() {{
-                console.error(`업로드 오류: ${{file.name}}`);
-                currentUploadIndex++;
-                uploadNextFile();
-            }});
-
-            xhr.open('POST', '/');
-            xhr.send(formData);
-        }}
-        
-        async function calculateFileHash(file) {{
-            const buffer = await file.arrayBuffer();
-            const hashBuffer = await crypto.subtle.digest('SHA-256', buffer);
-            const hashArray = Array.from(new Uint8Array(hashBuffer));
-            const hashHex = hashArray.map(b => b.toString(16).padStart(2, '0')).join('');
-            return hashHex;
-        }}
-        
-        // 파일 삭제 함수
-        function deleteFile(filename) {{
-            if (confirm('"' + filename + '" 파일을 삭제하시겠습니까?')) {{
-                const form = document.createElement('form');
-                form.method = 'POST';
-                form.action = '/?delete=' + encodeURIComponent(filename);
-                document.body.appendChild(form);
-                form.submit();
-            }}
-        }}
-    </script>
-</body>
-</html>'''
+    def stop(self, signum, frame):
+        sig = signal.SIGKILL if self.stopping else signal.SIGTERM
+        self.stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, sig)
+            except ProcessLookupError:
+                pass
+
+    def run(self):
+        """Start every worker, then restart the ones that exit until told to stop"""
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        for slot in range(self.processes):
+            self.spawn(slot)
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            slot = self.children.pop(pid, None)
+            if slot is None or self.stopping:
+                continue
+            print(f"Worker {slot} (pid {pid}) exited with status "
+                  f"{os.waitstatus_to_exitcode(status)}, restarting")
+            if time.monotonic() - self.started[slot] < self.RESTART_DELAY:
+                time.sleep(self.RESTART_DELAY)
+            if not self.stopping:
+                self.spawn(slot)
+        print("\nServer stopped.")
+
+
+def run_server(args, slot=None):
+    """Set up the server state and serve until stopped
+
+    slot is None for a single-process server. Under --processes it is the
+    worker's index: the workers share the hash index, change journal,
+    upload sessions and blob store through STATE_DIR, and only worker 0
+    warms up the index, watches the directory and collects old uploads.
+    """
+    prefork = slot is not None
+    leader = slot in (None, 0)
+    if prefork:
+        FileServerMixin.changes = SharedChangeJournal(os.path.join(STATE_DIR, 'changes.log'))
+        FileServerMixin.changes.start()
     
-    def format_size(self, size):
-        """Format file size in human-readable format"""
-        if size < 1024:
-            return f"{size} B"
-        elif size < 1024 * 1024:
-            return f"{size/1024:.1f} KB"
-        else:
-            return f"{size/(1024*1024):.1f} MB"
+    # Load the persistent hash index and warm it up in the background
+    hash_index = HashIndex(args.index_file, max_entries=args.index_max_entries, shared=prefork)
+    FileServerMixin.hash_index = hash_index
+    METRICS.collectors.append(hash_index.collect_metrics)
+    METRICS.collectors.append(FileServerMixin.transfer_limits.collect_metrics)
+    if prefork:
+        # 어느 워커가 /metrics 요청을 받아도 모든 워커의 값을 보고하도록 주기적으로 내보냄
+        METRICS.start_export(os.path.join(STATE_DIR, 'metrics'), slot)
+    if leader and not args.no_warm_up:
+        hash_index.warm_up(os.getcwd())
     
-    def get_file_icon(self, filename):
-        """Get appropriate icon for file type"""
-        name_lower = filename.lower()
-        if name_lower.endswith(('.jpg', '.jpeg', '.png', '.gif', '.svg')):
-            return '🖼️'
-        elif name_lower.endswith(('.mp4', '.avi', '.mov', '.mkv')):
-            return '🎬'
-        elif name_lower.endswith('.pdf'):
-            return '📄'
-        elif name_lower.endswith(('.ppt', '.pptx')):
-            return '📊'
-        elif name_lower.endswith(('.doc', '.docx')):
-            return '📝'
-        elif name_lower.endswith(('.zip', '.tar', '.gz', '.rar')):
-            return '🗜️'
-        else:
-            return '📎'
+    # Optional content-addressed dedup store
+    if args.dedup:
+        FileServerMixin.blob_store = BlobStore(os.getcwd(), shared=prefork)
     
-    def do_GET(self):
-        """Handle GET requests"""
-        if self.path == '/':
-            return self.list_directory(os.getcwd())
-        elif self.path == '/api/files':
-            return self.get_file_hashes()
-        else:
-            if not self.authenticate():
-                return
-            return http.server.SimpleHTTPRequestHandler.do_GET(self)
+    # Resumable chunked upload sessions
+    upload_sessions = UploadSessions(os.getcwd(), hash_index, FileServerMixin.file_locks,
+                                     ttl=args.upload_session_ttl * 3600,
+                                     journal=FileServerMixin.changes,
+                                     blob_store=FileServerMixin.blob_store,
+                                     shared=prefork)
+    FileServerMixin.upload_sessions = upload_sessions
+    if leader:
+        upload_sessions.start_gc()
     
-    def get_file_hashes(self):
-        """Return JSON with file hashes"""
-        if not self.authenticate():
-            return
-        
-        file_hashes = {}
-        for filename in os.listdir(os.getcwd()):
-            if os.path.isfile(filename):
-                with open(filename, 'rb') as f:
-                    file_hash = hashlib.sha256(f.read()).hexdigest()[:16]
-                    file_hashes[filename] = file_hash
-        
-        self.send_response(200)
-        self.send_header('Content-type', 'application/json')
-        self.end_headers()
-        self.wfile.write(json.dumps(file_hashes).encode())
+    # Live listing updates: external changes feed the journal, /api/events pushes it
+    FileServerMixin.event_stream = EventBroadcaster(FileServerMixin.changes,
+                                                    FileServerMixin().change_events)
+    if leader and not args.no_watch:
+        watcher = DirectoryWatcher(os.getcwd(), hash_index, FileServerMixin.changes,
+                                   FileServerMixin.file_locks, interval=args.watch_interval)
+        watcher.start()
+        print(f"Watching {os.getcwd()} for changes ({watcher.backend})")
     
-    def do_POST(self):
-        """Handle POST requests (upload and delete)"""
-        if not self.authenticate():
-            return
-        
-        # Handle delete request
-        if '?delete=' in self.path:
-            filename = unquote(self.path.split('?delete=')[1])
-            filepath = os.path.join(os.getcwd(), filename)
-            if os.path.exists(filepath) and os.path.isfile(filepath):
+    # Filename index of the whole tree for /api/search; every worker keeps its own
+    if not args.no_search:
+        FileServerMixin.search_index = SearchIndex(os.getcwd())
+        FileServerMixin.search_index.start(verbose=leader)
+    
+    if args.mode == 'async':
+        if not prefork:
+            print(f"Serving HTTP on 0.0.0.0 port {args.port} (dir: {os.getcwd()}, mode: async)...")
+            print(f"Access at: http://localhost:{args.port}")
+        try:
+            asyncio.run(serve_async(args.port, args.workers, reuse_port=prefork,
+                                    shutdown_timeout=args.shutdown_timeout if prefork else None))
+        except KeyboardInterrupt:
+            print("\nServer stopped.")
+        finally:
+            hash_index.save(force=True)
+        return
+    
+    # Start server with SO_REUSEADDR option
+    with make_server(args, reuse_port=prefork) as httpd:
+        METRICS.collectors.append(httpd.collect_metrics)
+        if prefork:
+            # serve_forever를 멈추는 shutdown()은 다른 스레드에서 호출해야 함
+            def stop(signum, frame):
+                threading.Thread(target=httpd.shutdown, daemon=True).start()
+            signal.signal(signal.SIGTERM, stop)
+            signal.signal(signal.SIGINT, stop)
+        else:
+            print(f"Serving HTTP on 0.0.0.0 port {args.port} (dir: {os.getcwd()}, mode: {args.mode})...")
+            print(f"Access at: http://localhost:{args.port}")
+        try:
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            print("\nServer stopped.")
+        finally:
+            httpd.server_close()
+            if prefork and not httpd.drain(args.shutdown_timeout):
+                print(f"Worker {slot}: {httpd.active} connections still open after "
+                      f"{args.shutdown_timeout:g}s, closing them")
+            hash_index.save(force=True)
+
+
+class SyncClient:
+    """Push the top-level files of a local directory to a server through its API
+
+    Remote state comes from /api/files, whose 16-character SHA-256 prefixes
+    are compared with the local files, so only new or changed files are
+    sent, each as PUT /api/files/<name> over a pool of keep-alive
+    connections. A body-less ?precheck PUT goes first and lets the server
+    link content it already holds, so renamed or copied files cost no
+    upload.
+    """
+
+    RETRIES = 5
+
+    def __init__(self, url, user, password, connections=4, timeout=60):
+        parts = urllib.parse.urlsplit(url)
+        if parts.scheme not in ('http', 'https') or not parts.hostname:
+            raise ValueError(f"Unsupported URL: {url}")
+        self.url = url
+        self.connection_class = (http.client.HTTPSConnection if parts.scheme == 'https'
+                                 else http.client.HTTPConnection)
+        self.address = (parts.hostname, parts.port)
+        self.auth = 'Basic ' + base64.b64encode(f"{user}:{password}".encode()).decode()
+        self.connections = connections
+        self.timeout = timeout
+        self.local = threading.local()
+        self.opened = []
+        self.lock = threading.Lock()
+
+    def connection(self):
+        """This thread's keep-alive connection; http.client reopens it if the server closed it"""
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = self.local.conn = self.connection_class(*self.address, timeout=self.timeout,
+                                                           blocksize=UPLOAD_CHUNK_SIZE)
+            with self.lock:
+                self.opened.append(conn)
+        return conn
+
+    def request(self, method, path, body=None, headers=None):
+        """Send a request and return (status, response body)
+
+        Retries on a dropped connection (e.g. a keep-alive connection the
+        server timed out) and on 429 after its Retry-After.
+        """
+        headers = {'Authorization': self.auth, **(headers or {})}
+        for attempt in range(self.RETRIES):
+            conn = self.connection()
+            if body is not None and hasattr(body, 'seek'):
+                body.seek(0)
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                data = response.read()
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                if attempt == self.RETRIES - 1:
+                    raise
+                # 첫 재시도는 끊긴 keep-alive 연결일 수 있으므로 바로 다시 연결
+                time.sleep(attempt * 0.5)
+                continue
+            if response.status == 429 and attempt < self.RETRIES - 1:
+                time.sleep(float(response.getheader('Retry-After') or 1))
+                continue
+            if response.getheader('Content-Encoding') == 'gzip':
+                data = gzip.decompress(data)
+            return response.status, data
+
+    @staticmethod
+    def error(status, data):
+        """Best description of a failed response"""
+        try:
+            return f"HTTP {status}: {json.loads(data)['error']}"
+        except (ValueError, KeyError, TypeError):
+            return f"HTTP {status}"
+
+    def remote_files(self):
+        """Map each top-level file on the server to its SHA-256 prefix"""
+        status, data = self.request('GET', '/api/files', headers={'Accept-Encoding': 'gzip'})
+        if status != 200:
+            raise RuntimeError(f"GET /api/files failed: {self.error(status, data)}")
+        return json.loads(data)
+
+    def upload(self, name, path, digest):
+        """Send one file unless the server can link its content; return (outcome, bytes sent)"""
+        target = '/api/files/' + quote(name)
+        headers = {'X-Content-SHA256': digest}
+        status, data = self.request('PUT', target + '?precheck', headers=headers)
+        if status == 200:
+            return 'linked', 0
+        if status != 404:
+            raise RuntimeError(self.error(status, data))
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            status, data = self.request('PUT', target, body=f,
+                                        headers={**headers, 'Content-Length': str(size)})
+        if status not in (200, 201):
+            raise RuntimeError(self.error(status, data))
+        return 'uploaded', size
+
+    def push(self, name, path, remote_prefix, dry_run):
+        """Hash one local file and upload it if the server's copy differs"""
+        digest = sha256_file(path)
+        if remote_prefix == digest[:16]:
+            return 'unchanged', 0
+        if dry_run:
+            return 'would upload', 0
+        return self.upload(name, path, digest)
+
+    def delete(self, names):
+        """Remove names from the server with one /api/delete request; return the failures"""
+        status, data = self.request('POST', '/api/delete', body=json.dumps({'files': names}).encode(),
+                                    headers={'Content-Type': 'application/json'})
+        if status != 200:
+            raise RuntimeError(self.error(status, data))
+        return [(r['name'], r['error']) for r in json.loads(data)['results'] if 'error' in r]
+
+    def sync(self, directory, delete=False, dry_run=False):
+        """Bring the server's top level in line with directory; return the number of failures"""
+        started = time.perf_counter()
+        remote = self.remote_files()
+        local = {}
+        for name in sorted(os.listdir(directory)):
+            path = os.path.join(directory, name)
+            if safe_filename(name) == name and os.path.isfile(path):
+                local[name] = path
+
+        counts = dict.fromkeys(('uploaded', 'linked', 'unchanged', 'deleted', 'failed'), 0)
+        sent = 0
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.connections) as pool:
+            futures = {pool.submit(self.push, name, path, remote.get(name), dry_run): name
+                       for name, path in local.items()}
+            for future in concurrent.futures.as_completed(futures):
+                name = futures[future]
                 try:
-                    os.remove(filepath)
-                    print(f"Deleted file: {filename}")
-                except Exception as e:
-                    self.send_error(500, f"Error deleting file: {e}")
-                    return
-            self.send_response(303)
-            self.send_header('Location', '/')
-            self.end_headers()
-            return
-        
-        # Handle file upload
-        ctype, pdict = cgi.parse_header(self.headers.get('content-type'))
-        if ctype != 'multipart/form-data':
-            self.send_error(400, "Bad request: not multipart/form-data")
-            return
-        
-        pdict['boundary'] = pdict['boundary'].encode('utf-8')
-        form = cgi.FieldStorage(
-            fp=self.rfile,
-            headers=self.headers,
-            environ={'REQUEST_METHOD': 'POST'},
-            keep_blank_values=True
-        )
-        
-        if 'file' not in form:
-            self.send_error(400, "No file field in form.")
-            return
-        
-        field = form['file']
-        if not field.filename:
-            self.send_error(400, "Empty filename.")
-            return
-        
-        filename = os.path.basename(field.filename)
-        filepath = os.path.join(os.getcwd(), filename)
-        
-        with open(filepath, 'wb') as f:
-            f.write(field.file.read())
-        
-        print(f"Uploaded file: {filename}")
-        
-        self.send_response(303)
-        self.send_header('Location', '/')
-        self.end_headers()
+                    outcome, size = future.result()
+                except (OSError, RuntimeError, http.client.HTTPException) as e:
+                    print(f"Failed: {name} ({e})")
+                    counts['failed'] += 1
+                    continue
+                if outcome != 'unchanged':
+                    print(f"{outcome.capitalize()}: {name}")
+                counts[outcome] = counts.get(outcome, 0) + 1
+                sent += size
+
+        extras = sorted(set(remote) - set(local))
+        if delete and extras:
+            if dry_run:
+                for name in extras:
+                    print(f"Would delete: {name}")
+            else:
+                try:
+                    failures = dict(self.delete(extras))
+                except (OSError, RuntimeError, http.client.HTTPException) as e:
+                    failures = dict.fromkeys(extras, str(e))
+                for name in extras:
+                    if name in failures:
+                        print(f"Failed to delete: {name} ({failures[name]})")
+                    else:
+                        print(f"Deleted: {name}")
+                counts['deleted'] += len(extras) - len(failures)
+                counts['failed'] += len(failures)
+        for conn in self.opened:
+            conn.close()
+
+        elapsed = time.perf_counter() - started
+        summary = ', '.join(f"{n} {outcome}" for outcome, n in counts.items() if n or outcome == 'failed')
+        print(f"Synced {directory} to {self.url}: {summary}")
+        print(f"Sent {sent / 1024 / 1024:.1f} MiB in {elapsed:.1f}s "
+              f"({sent / 1024 / 1024 / max(elapsed, 1e-6):.1f} MiB/s, "
+              f"{self.connections} connections)")
+        if extras and not delete:
+            print(f"{len(extras)} files on the server are not in {directory} (use --delete to remove them)")
+        return counts['failed']
+
+
+def sync_main(argv):
+    """Entry point of the sync subcommand"""
+    parser = argparse.ArgumentParser(
+        prog=f'{os.path.basename(sys.argv[0])} sync',
+        description='Upload the files of a local directory that a running server does not have '
+                    'yet. Only top-level files are synced, like the upload API.')
+    parser.add_argument('local_dir', help='Directory whose files are pushed')
+    parser.add_argument('url', help='Server URL, e.g. http://localhost:7113')
+    parser.add_argument('-u', '--user', default='admin', help='Username for authentication (default: admin)')
+    parser.add_argument('--password', default=os.environ.get('FILE_SERVER_PASSWORD'),
+                        help='Password for authentication (default: $FILE_SERVER_PASSWORD, '
+                             'else prompt)')
+    parser.add_argument('-j', '--connections', type=int, default=4,
+                        help='Parallel keep-alive connections (default: 4)')
+    parser.add_argument('--delete', action='store_true',
+                        help='Delete files on the server that are not in local_dir')
+    parser.add_argument('-n', '--dry-run', action='store_true',
+                        help='Only report what would be uploaded or deleted')
+    parser.add_argument('--timeout', type=float, default=60,
+                        help='Socket timeout in seconds (default: 60)')
+    args = parser.parse_args(argv)
+    if not os.path.isdir(args.local_dir):
+        parser.error(f"not a directory: {args.local_dir}")
+    password = args.password
+    if password is None:
+        password = getpass.getpass(f"Password for user '{args.user}': ")
+    try:
+        client = SyncClient(args.url, args.user, password, max(1, args.connections), args.timeout)
+    except ValueError as e:
+        parser.error(str(e))
+    try:
+        failed = client.sync(args.local_dir, delete=args.delete, dry_run=args.dry_run)
+    except (OSError, RuntimeError, ValueError, http.client.HTTPException) as e:
+        print(f"Sync failed: {e}")
+        return 1
+    return 1 if failed else 0
 
 
 def main():
     """Main function"""
-    parser = argparse.ArgumentParser(description='Simple file server with upload/delete capabilities')
+    if sys.argv[1:2] == ['sync']:
+        sys.exit(sync_main(sys.argv[2:]))
+    parser = argparse.ArgumentParser(description='Simple file server with upload/delete capabilities',
+                                     epilog='Run "%(prog)s sync -h" for the directory sync client.')
     parser.add_argument('-p', '--port', type=int, default=7113, help='Port to serve on (default: 7113)')
     parser.add_argument('-d', '--directory', default='./uploads', help='Directory to serve (default: ./uploads)')
     parser.add_argument('-u', '--user', default='admin', help='Username for authentication (default: admin)')
     parser.add_argument('--password', help='Password for authentication (will prompt if not provided)')
+    parser.add_argument('--index-file', default=os.path.join(STATE_DIR, 'hash-index.json'),
+                        help='Hash index file, relative to the served directory '
+                             f'(default: {STATE_DIR}/hash-index.json)')
+    parser.add_argument('--index-max-entries', type=int, default=100000,
+                        help='Maximum number of cached file hashes (default: 100000)')
+    parser.add_argument('--no-warm-up', action='store_true',
+                        help='Do not hash existing files in the background at startup')
+    parser.add_argument('--mode', choices=['pool', 'threaded', 'single', 'async'], default='pool',
+                        help='Concurrency mode: bounded worker pool, thread per connection, '
+                             'one request at a time, or the asyncio engine (default: pool)')
+    parser.add_argument('-w', '--workers', type=int, default=16,
+                        help='Worker threads in pool mode, or disk I/O threads in async mode '
+                             '(default: 16)')
+    parser.add_argument('--queue-size', type=int, default=64,
+                        help='Connections waiting for a worker before answering 503 (default: 64)')
+    parser.add_argument('--max-upload-size', type=float,
+                        help='Largest upload in MiB; bigger ones get 413 before their body is read '
+                             '(default: no limit)')
+    parser.add_argument('--min-free-space', type=float, default=0,
+                        help='Free disk space in MiB that uploads must leave; ones that would not '
+                             'fit get 507 (default: 0)')
+    parser.add_argument('--max-transfers-per-client', type=int, default=0,
+                        help='Concurrent uploads and downloads per client address before answering '
+                             '429 (default: 0, no limit)')
+    parser.add_argument('--upload-rate', type=float,
+                        help='Upload rate limit per client in MiB/s. Outside --mode async a '
+                             'throttled transfer keeps its worker thread while it waits '
+                             '(default: no limit)')
+    parser.add_argument('--download-rate', type=float,
+                        help='Download rate limit per client in MiB/s. Outside --mode async a '
+                             'throttled transfer keeps its worker thread while it waits, so '
+                             '--workers slow downloads fill the pool (default: no limit)')
+    parser.add_argument('--trusted-proxy', action='append', default=[], metavar='ADDRESS',
+                        help='Proxy address whose X-Forwarded-For names the client for the '
+                             'per-client limits; may be repeated (default: none)')
+    parser.add_argument('--upload-session-ttl', type=float, default=24,
+                        help='Hours before an abandoned chunked upload is removed (default: 24)')
+    parser.add_argument('--no-compression', action='store_true',
+                        help='Never compress responses, even when the client accepts gzip/zstd')
+    parser.add_argument('--compress-min-size', type=int, default=1024,
+                        help='Smallest body in bytes worth compressing (default: 1024)')
+    parser.add_argument('--compress-cache-size', type=int, default=32,
+                        help='Memory in MiB for cached compressed downloads (default: 32)')
+    parser.add_argument('--no-watch', action='store_true',
+                        help='Do not watch the directory for changes made by other processes')
+    parser.add_argument('--watch-interval', type=float, default=2.0,
+                        help='Polling interval in seconds when inotify is unavailable (default: 2)')
+    parser.add_argument('--no-search', action='store_true',
+                        help='Do not keep the in-memory filename index behind /api/search')
+    parser.add_argument('--dedup', action='store_true',
+                        help='Store uploads in a content-addressed blob store and hard-link '
+                             'filenames to it, so identical content is kept once. Names with '
+                             'the same content share one inode: they keep the mtime of the '
+                             'first upload of that content, and editing one in place changes '
+                             'all of them')
+    parser.add_argument('--no-sendfile', action='store_true',
+                        help='Copy downloads through user space instead of os.sendfile')
+    parser.add_argument('--keepalive-timeout', type=float, default=15,
+                        help='Seconds an idle keep-alive connection is held open (default: 15)')
+    parser.add_argument('--max-requests', type=int, default=1000,
+                        help='Requests served on one connection before it is closed (default: 1000)')
+    parser.add_argument('--processes', type=int, default=1,
+                        help='Server processes sharing the port via SO_REUSEPORT; crashed ones '
+                             'are restarted (default: 1)')
+    parser.add_argument('--shutdown-timeout', type=float, default=30,
+                        help='Seconds each process gives requests in progress to finish on '
+                             'SIGTERM with --processes (default: 30)')
     
     args = parser.parse_args()
+    if args.processes > 1 and (not hasattr(os, 'fork') or fcntl is None
+                               or not hasattr(socket, 'SO_REUSEPORT')):
+        parser.error("--processes needs fork(), flock() and SO_REUSEPORT")
     
     # Get password
     if args.password:
@@ -652,20 +6609,33 @@ def main():
     
     # Set up authentication
     auth_string = f"{args.user}:{password}"
-    AuthUploadHandler.auth_key = base64.b64encode(auth_string.encode()).decode()
-    AuthUploadHandler.upload_dir = args.directory
+    FileServerMixin.auth_key = base64.b64encode(auth_string.encode()).decode()
+    FileServerMixin.upload_dir = args.directory
+    if args.no_sendfile:
+        FileServerMixin.use_sendfile = False
+    FileServerMixin.compression = not args.no_compression
+    FileServerMixin.keepalive_timeout = args.keepalive_timeout
+    FileServerMixin.max_keepalive_requests = max(1, args.max_requests)
+    FileServerMixin.compress_min_size = args.compress_min_size
+    FileServerMixin.compression_cache = CompressionCache(args.compress_cache_size * 1024 * 1024)
+    def mib(value):
+        return int(value * 1024 * 1024) if value else None
+    FileServerMixin.transfer_limits = TransferLimits(
+        os.getcwd(), max_upload_size=mib(args.max_upload_size),
+        min_free_space=mib(args.min_free_space) or 0,
+        max_per_client=args.max_transfers_per_client or None,
+        upload_rate=mib(args.upload_rate), download_rate=mib(args.download_rate))
+    FileServerMixin.trusted_proxies = frozenset(args.trusted_proxy)
     
-    # Start server with SO_REUSEADDR option
-    socketserver.TCPServer.allow_reuse_address = True
-    with socketserver.TCPServer(("", args.port), AuthUploadHandler) as httpd:
-        print(f"Serving HTTP on 0.0.0.0 port {args.port} (dir: {os.getcwd()})...")
+    if args.processes > 1:
+        SharedChangeJournal.reset(os.path.join(STATE_DIR, 'changes.log'))
+        shutil.rmtree(os.path.join(STATE_DIR, 'metrics'), ignore_errors=True)
+        print(f"Serving HTTP on 0.0.0.0 port {args.port} (dir: {os.getcwd()}, mode: {args.mode}, "
+              f"processes: {args.processes})...")
         print(f"Access at: http://localhost:{args.port}")
-        try:
-            httpd.serve_forever()
-        except KeyboardInterrupt:
-            print("\nServer stopped.")
-        finally:
-            httpd.server_close()
+        Supervisor(args.processes, lambda slot: run_server(args, slot)).run()
+        return
+    run_server(args)
 
 
 if __name__ == '__main__':